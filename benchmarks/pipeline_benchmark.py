@@ -0,0 +1,273 @@
+"""
+旅行证照片处理 - 处理流程基准测试
+在不同分辨率（默认2/12/24/48百万像素）的人像上分别测量ImageProcessor各阶段的耗时（p50/p95）、峰值RSS和内存分配
+
+没有给出照片目录时生成合成人像（肤色椭圆脸、眼睛、头发和肩膀），检测不到人脸时按合成时的位置手动指定人脸，
+保证裁剪和绘制阶段在所有分辨率上都能运行。
+
+用法:
+    python -m benchmarks.pipeline_benchmark [--sizes 2,12,24,48] [--repeat 5] [--output pipeline.json]
+    python -m benchmarks.pipeline_benchmark --corpus 照片目录 --stages detect_face,auto_crop_id_photo
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from src.core.image_processor import ImageProcessor
+from src.core.tile_cache import tile_cache
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png", "*.bmp")
+
+# 人像宽高比（3:4竖幅）
+ASPECT = 3 / 4
+
+# 排版阶段只依赖裁剪后的证件照，与原图分辨率无关
+LAYOUT_STAGES = ("create_print_layout", "create_custom_print_layout", "create_mixed_print_layout")
+PHOTO_STAGES = ("detect_face", "auto_crop_id_photo", "manual_crop_id_photo", "remove_background_grabcut",
+                "draw_face_ellipses")
+
+
+def portrait_size(megapixels):
+    """给定百万像素数的3:4竖幅尺寸"""
+    width = int(round((megapixels * 1e6 * ASPECT) ** 0.5))
+    return width, int(round(width / ASPECT))
+
+
+def synthetic_portrait(width, height, seed=0):
+    """生成合成人像，返回(PIL图像, (人脸中心, 人脸大小))
+
+    先在1200像素宽的画布上绘制再放大，最后加上全分辨率噪声，使压缩和滤波的代价接近真实照片。
+    """
+    base_width = 1200
+    base_height = int(round(base_width * height / width))
+    scale = width / base_width
+    canvas = np.empty((base_height, base_width, 3), dtype=np.uint8)
+    canvas[:] = np.linspace(200, 150, base_height, dtype=np.uint8)[:, None, None]
+
+    center_x, center_y = base_width // 2, int(base_height * 0.42)
+    face_w, face_h = int(base_width * 0.30), int(base_width * 0.40)
+    # 肩膀、头发、脸、眉毛、眼睛、鼻子、嘴（RGB）
+    cv2.ellipse(canvas, (center_x, base_height), (int(base_width * 0.45), int(base_height * 0.25)), 0, 0, 360,
+                (40, 50, 90), -1)
+    cv2.ellipse(canvas, (center_x, center_y - face_h // 8), (face_w * 6 // 10, face_h * 6 // 10), 0, 0, 360,
+                (50, 35, 25), -1)
+    cv2.ellipse(canvas, (center_x, center_y), (face_w // 2, face_h // 2), 0, 0, 360, (225, 185, 160), -1)
+    for side in (-1, 1):
+        eye_x = center_x + side * face_w // 5
+        eye_y = center_y - face_h // 10
+        cv2.line(canvas, (eye_x - face_w // 10, eye_y - face_h // 10), (eye_x + face_w // 10, eye_y - face_h // 10),
+                 (60, 40, 30), max(2, face_h // 40))
+        cv2.ellipse(canvas, (eye_x, eye_y), (face_w // 12, face_h // 28), 0, 0, 360, (250, 250, 250), -1)
+        cv2.circle(canvas, (eye_x, eye_y), face_h // 32, (40, 30, 25), -1)
+    cv2.line(canvas, (center_x, center_y - face_h // 20), (center_x - face_w // 20, center_y + face_h // 10),
+             (190, 140, 120), max(2, face_h // 60))
+    cv2.ellipse(canvas, (center_x, center_y + face_h // 5), (face_w // 6, face_h // 20), 0, 0, 180,
+                (170, 80, 80), max(2, face_h // 50))
+
+    pixels = cv2.resize(canvas, (width, height), interpolation=cv2.INTER_CUBIC)
+    noise = np.random.default_rng(seed).integers(-6, 7, (height, width, 3), dtype=np.int16)
+    cv2.add(pixels, noise, dst=pixels, dtype=cv2.CV_8U)
+
+    face = ((int(center_x * scale), int(center_y * scale)), (int(face_w * scale), int(face_h * scale)))
+    return Image.fromarray(pixels), face
+
+
+def load_corpus(folder):
+    """读取目录中的照片（只取第一张作为各分辨率的源图）"""
+    files = sorted(f for pattern in IMAGE_PATTERNS for f in glob.glob(os.path.join(folder, pattern)))
+    if not files:
+        raise SystemExit(f"目录中没有图片: {folder}")
+    with Image.open(files[0]) as image:
+        return files[0], image.convert("RGB")
+
+
+def corpus_image(source, width, height, seed):
+    """返回给定尺寸的测试人像和预估人脸"""
+    if source is None:
+        return synthetic_portrait(width, height, seed)
+
+    # 按源图比例缩放到目标像素数，不改变宽高比
+    scale = (width * height / (source.width * source.height)) ** 0.5
+    image = source.resize((max(1, int(source.width * scale)), max(1, int(source.height * scale))), Image.LANCZOS)
+    face_size = (image.width // 3, image.width * 2 // 5)
+    return image, ((image.width // 2, int(image.height * 0.42)), face_size)
+
+
+def reset_peak_rss():
+    """重置进程的峰值RSS（Linux的/proc/self/clear_refs），不支持时返回False"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    """当前进程的峰值RSS（MB）"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss在Linux上以KB、在macOS上以字节为单位，且无法重置
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q))
+
+
+def run_stage(func, repeat, warmup):
+    """测量一个阶段：先预热，再计时repeat次，最后单独运行一次统计内存分配（tracemalloc会拖慢计时）"""
+    for _ in range(warmup):
+        func()
+
+    rss_reset = reset_peak_rss()
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start_time) * 1000)
+    rss = peak_rss_mb()
+
+    tracemalloc.start()
+    func()
+    _, allocated_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "p50_ms": round(percentile(times, 50), 2),
+        "p95_ms": round(percentile(times, 95), 2),
+        "min_ms": round(min(times), 2),
+        "peak_rss_mb": round(rss, 1),
+        "peak_rss_exact": rss_reset,
+        "alloc_peak_mb": round(allocated_peak / (1024 * 1024), 2),
+        "samples_ms": [round(t, 2) for t in times],
+    }
+
+
+def photo_stages(image, face):
+    """原图阶段：名称 -> 无参数调用"""
+    detected = ImageProcessor.detect_face(image)
+    face_position, face_size = detected or face
+    return {
+        "detect_face": lambda: ImageProcessor.detect_face(image),
+        "auto_crop_id_photo": lambda: ImageProcessor.auto_crop_id_photo(image),
+        "manual_crop_id_photo": lambda: ImageProcessor.manual_crop_id_photo(image, face_position, face_size),
+        "remove_background_grabcut": lambda: ImageProcessor.remove_background_grabcut(image, progress_callback=lambda _: None),
+        "draw_face_ellipses": lambda: ImageProcessor.draw_face_ellipses(image, face_position, face_size),
+    }, detected is not None
+
+
+def layout_stages(photo):
+    """排版阶段；每次先清空排版照片缓存，测量的是第一次生成排版的代价"""
+    def cold(func, *args):
+        def run():
+            tile_cache.clear()
+            return func(photo, *args)
+        return run
+
+    return {
+        "create_print_layout": cold(ImageProcessor.create_print_layout),
+        "create_custom_print_layout": cold(ImageProcessor.create_custom_print_layout,
+                                           {"rows": 4, "columns": 3, "spacing": 10, "dpi": 300}),
+        "create_mixed_print_layout": cold(ImageProcessor.create_mixed_print_layout,
+                                          {"small_count": 4, "large_count": 2, "spacing": 10, "dpi": 300}),
+    }
+
+
+def print_row(label, stage, result):
+    print(f"{label:<14}{stage:<30}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+          f"{result['peak_rss_mb']:>11.0f}{result['alloc_peak_mb']:>11.1f}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="处理流程基准测试")
+    parser.add_argument("--corpus", default=None, help="照片目录（取第一张缩放到各分辨率），默认生成合成人像")
+    parser.add_argument("--sizes", default="2,12,24,48", help="分辨率列表（百万像素，逗号分隔）")
+    parser.add_argument("--repeat", type=int, default=5, help="每个阶段计时次数")
+    parser.add_argument("--warmup", type=int, default=1, help="每个阶段计时前的预热次数")
+    parser.add_argument("--stages", default=None,
+                        help=f"只测量这些阶段（逗号分隔），可选: {', '.join(PHOTO_STAGES + LAYOUT_STAGES)}")
+    parser.add_argument("--seed", type=int, default=0, help="合成人像的噪声种子")
+    parser.add_argument("--output", default=None, help="结果JSON路径")
+    args = parser.parse_args()
+
+    sizes = [float(size) for size in args.sizes.split(",") if size]
+    selected = set(args.stages.split(",")) if args.stages else set(PHOTO_STAGES + LAYOUT_STAGES)
+    unknown = selected - set(PHOTO_STAGES + LAYOUT_STAGES)
+    if unknown:
+        parser.error(f"未知阶段: {', '.join(sorted(unknown))}")
+
+    corpus_path, source = load_corpus(args.corpus) if args.corpus else (None, None)
+    if not reset_peak_rss():
+        print("注意: 无法重置峰值RSS，各阶段的峰值RSS为进程启动以来的最大值")
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "opencv": cv2.__version__,
+        "corpus": corpus_path or "synthetic",
+        "repeat": args.repeat,
+        "stages": [],
+    }
+
+    print(f"{'分辨率':<14}{'阶段':<30}{'p50 ms':>10}{'p95 ms':>10}{'峰值RSS MB':>11}{'分配峰值MB':>11}")
+    cropped = None
+    for megapixels in sizes:
+        width, height = portrait_size(megapixels)
+        if source is not None:
+            # 源图按自身比例缩放，尺寸以实际结果为准
+            image, face = corpus_image(source, width, height, args.seed)
+        else:
+            image, face = synthetic_portrait(width, height, args.seed)
+        label = f"{megapixels:g}MP"
+        stages, detected = photo_stages(image, face)
+        if not detected:
+            print(f"{label}: 未检测到人脸，手动裁剪和绘制使用预估的人脸位置")
+
+        for stage, func in stages.items():
+            if stage not in selected:
+                continue
+            result = run_stage(func, args.repeat, args.warmup)
+            result.update(stage=stage, megapixels=megapixels, size=list(image.size), face_detected=detected)
+            results["stages"].append(result)
+            print_row(label, stage, result)
+
+        if cropped is None:
+            cropped = ImageProcessor.manual_crop_id_photo(image, *(ImageProcessor.detect_face(image) or face))
+        del image, stages
+
+    # 排版只测一次（输入是裁剪后的证件照）
+    if cropped is not None:
+        for stage, func in layout_stages(cropped).items():
+            if stage not in selected:
+                continue
+            result = run_stage(func, args.repeat, args.warmup)
+            result.update(stage=stage, megapixels=None, size=list(cropped.size))
+            results["stages"].append(result)
+            print_row("证件照", stage, result)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
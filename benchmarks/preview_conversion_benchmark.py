@@ -0,0 +1,78 @@
+"""
+旅行证照片处理 - 预览转换基准测试
+比较"保存临时PNG再由QPixmap读取"与直接内存转换显示处理结果的耗时
+
+用法:
+    python -m benchmarks.preview_conversion_benchmark [--repeat 5] [--temp-dir temp]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+from PySide6.QtGui import QGuiApplication, QPixmap
+
+from src.utils.qt_image import pil_to_qpixmap
+
+# (名称, 宽, 高)：单张证件照、常见输入照片、A4排版（300/600 DPI）
+SIZES = (
+    ("证件照", 390, 567),
+    ("输入照片", 1200, 1800),
+    ("A4 300DPI", 2480, 3507),
+    ("A4 600DPI", 4961, 7016),
+)
+
+
+def timed(func, repeat):
+    """运行repeat次，返回(最后一次结果, 最短耗时毫秒)"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start_time)
+    return result, best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预览转换基准测试")
+    parser.add_argument("--repeat", type=int, default=5, help="每种方式重复次数")
+    parser.add_argument("--temp-dir", default="temp", help="临时文件目录")
+    args = parser.parse_args()
+
+    app = QGuiApplication.instance() or QGuiApplication(sys.argv)
+    os.makedirs(args.temp_dir, exist_ok=True)
+    temp_path = os.path.join(args.temp_dir, "preview_benchmark.png")
+    rng = np.random.default_rng(0)
+
+    print(f"{'尺寸':<12}{'像素':>12}{'模式':>6}{'临时文件ms':>12}{'直接转换ms':>12}{'加速':>8}")
+    for name, width, height in SIZES:
+        for mode, channels in (("RGB", 3), ("RGBA", 4)):
+            # 平滑渐变加噪声，PNG压缩量接近真实照片
+            gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+            noise = rng.integers(0, 16, (height, width, channels), dtype=np.uint8)
+            data = (np.broadcast_to(gradient, (height, width, channels)) + noise).clip(0, 255).astype(np.uint8)
+            image = Image.fromarray(data, mode)
+
+            def via_file():
+                image.save(temp_path, "PNG")
+                return QPixmap(temp_path)
+
+            file_pixmap, file_ms = timed(via_file, args.repeat)
+            direct_pixmap, direct_ms = timed(lambda: pil_to_qpixmap(image), args.repeat)
+
+            if file_pixmap.size() != direct_pixmap.size():
+                print(f"{name}: 两种方式得到的尺寸不一致")
+
+            print(f"{name:<12}{f'{width}x{height}':>12}{mode:>6}{file_ms:>12.1f}{direct_ms:>12.1f}"
+                  f"{file_ms / direct_ms:>7.1f}x")
+
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    del app
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+旅行证照片处理 - 低分辨率分割基准测试
+比较rembg全分辨率分割与代理图分割+导向上采样的耗时、内存和边缘质量
+
+用法:
+    python -m benchmarks.rembg_proxy_benchmark 照片目录 [--proxy-size 1024] [--model u2net]
+"""
+import argparse
+import glob
+import os
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from PIL import Image
+import rembg
+
+from src.core.rembg_sessions import session_pool, DEFAULT_MODEL
+from src.core.mask_utils import DEFAULT_PROXY_SIZE, downscale_to_proxy, guided_upsample_mask
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png", "*.bmp")
+
+
+def edge_band(mask, width=5):
+    """参考蒙版边缘附近的像素区域"""
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * width + 1, 2 * width + 1))
+    return cv2.morphologyEx(mask, cv2.MORPH_GRADIENT, kernel) > 0
+
+
+def run_full(image, session):
+    """当前做法：在原分辨率上分割"""
+    return np.asarray(rembg.remove(image, session=session, only_mask=True).convert("L"))
+
+
+def run_proxy(image, session, proxy_size):
+    """代理图分割 + 导向滤波上采样"""
+    proxy_image, _ = downscale_to_proxy(image, proxy_size)
+    proxy_mask = np.asarray(rembg.remove(proxy_image, session=session, only_mask=True).convert("L"))
+    guide = cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2GRAY)
+    return guided_upsample_mask(proxy_mask, guide)
+
+
+def measure(func, *args):
+    """返回(结果, 耗时秒, Python侧峰值内存MB)"""
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start_time
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="rembg低分辨率分割基准测试")
+    parser.add_argument("folder", help="照片目录")
+    parser.add_argument("--proxy-size", type=int, default=DEFAULT_PROXY_SIZE, help="代理图长边")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="rembg模型名称")
+    args = parser.parse_args()
+
+    files = sorted(f for pattern in IMAGE_PATTERNS for f in glob.glob(os.path.join(args.folder, pattern)))
+    if not files:
+        print(f"目录中没有图片: {args.folder}")
+        return
+
+    session = session_pool.warm_up(args.model)
+
+    print(f"{'文件':<30}{'尺寸':>12}{'全分辨率s':>10}{'代理s':>8}{'全分辨率MB':>11}{'代理MB':>8}{'MAE':>7}{'边缘MAE':>9}")
+    for path in files:
+        image = Image.open(path).convert("RGB")
+
+        full_mask, full_time, full_mem = measure(run_full, image, session)
+        proxy_mask, proxy_time, proxy_mem = measure(run_proxy, image, session, args.proxy_size)
+
+        diff = np.abs(full_mask.astype(np.int16) - proxy_mask.astype(np.int16))
+        band = edge_band(full_mask)
+        edge_mae = diff[band].mean() if band.any() else 0.0
+
+        size = f"{image.width}x{image.height}"
+        print(f"{os.path.basename(path)[:29]:<30}{size:>12}{full_time:>10.2f}{proxy_time:>8.2f}"
+              f"{full_mem:>11.1f}{proxy_mem:>8.1f}{diff.mean():>7.2f}{edge_mae:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
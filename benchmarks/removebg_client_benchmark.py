@@ -0,0 +1,101 @@
+"""
+旅行证照片处理 - Remove.bg客户端基准测试
+用本地模拟服务比较"每张照片一次requests.post"与复用连接的RemoveBgClient的耗时、新建连接数和失败数
+
+用法:
+    python -m benchmarks.removebg_client_benchmark [--count 50] [--threads 1,4] [--latency 0.05] [--fail-rate 0.1]
+    python -m benchmarks.removebg_client_benchmark --endpoint https://... --api-key KEY --count 3   # 真实服务
+"""
+import argparse
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.removebg_mock_server import MockRemoveBgServer
+from src.core.removebg_client import RemoveBgClient, RemoveBgError
+
+
+def sample_png(width, height):
+    """生成测试用的PNG字节"""
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def bare_post(endpoint, image_bytes, api_key):
+    """原来的做法：每次新建连接，没有重试"""
+    import requests
+
+    response = requests.post(endpoint, files={"image_file": image_bytes}, data={"size": "auto"},
+                             headers={"X-Api-Key": api_key}, timeout=(10, 60))
+    if response.status_code != requests.codes.ok:
+        raise RemoveBgError(f"API错误: {response.status_code}", response.status_code)
+    return response.content
+
+
+def run(func, count, threads):
+    """并发调用func count次，返回(总耗时秒, 每次耗时ms列表, 失败次数)"""
+    def timed(_):
+        start_time = time.perf_counter()
+        try:
+            func()
+            return (time.perf_counter() - start_time) * 1000, None
+        except RemoveBgError as e:
+            return (time.perf_counter() - start_time) * 1000, e
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(timed, range(count)))
+    elapsed = time.perf_counter() - start_time
+    return elapsed, [ms for ms, _ in results], sum(1 for _, error in results if error is not None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove.bg客户端基准测试")
+    parser.add_argument("--count", type=int, default=50, help="每种方式的请求数")
+    parser.add_argument("--threads", default="1,4", help="并发线程数列表（逗号分隔）")
+    parser.add_argument("--size", type=int, default=600, help="测试图片边长（像素）")
+    parser.add_argument("--latency", type=float, default=0.02, help="模拟服务的处理延迟（秒）")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="模拟服务返回503的概率")
+    parser.add_argument("--endpoint", default=None, help="使用给定地址而不启动模拟服务")
+    parser.add_argument("--api-key", default="test-key", help="API密钥")
+    args = parser.parse_args()
+
+    image_bytes = sample_png(args.size, args.size)
+    server = None
+    endpoint = args.endpoint
+    if endpoint is None:
+        server = MockRemoveBgServer(latency=args.latency, fail_rate=args.fail_rate).start()
+        endpoint = server.url
+    print(f"服务: {endpoint}，图片 {len(image_bytes) / 1024:.0f} KB，每种方式{args.count}次请求")
+
+    print(f"{'方式':<16}{'线程':>6}{'总耗时s':>10}{'p50 ms':>10}{'p95 ms':>10}{'新连接':>8}{'重试':>6}{'失败':>6}")
+    try:
+        for threads in (int(value) for value in args.threads.split(",") if value):
+            client = RemoveBgClient(endpoint, pool_size=threads, backoff_base=0.05, backoff_max=1.0)
+            cases = (
+                ("requests.post", lambda: bare_post(endpoint, image_bytes, args.api_key), None),
+                ("RemoveBgClient", lambda: client.remove_background(image_bytes, args.api_key), client),
+            )
+            for name, func, used_client in cases:
+                connections_before = server.stats["connections"] if server else 0
+                elapsed, times, failures = run(func, args.count, threads)
+                connections = server.stats["connections"] - connections_before if server else "-"
+                retries = used_client.retries if used_client else 0
+                p95 = float(np.percentile(times, 95))
+                print(f"{name:<16}{threads:>6}{elapsed:>10.2f}{statistics.median(times):>10.1f}{p95:>10.1f}"
+                      f"{connections:>8}{retries:>6}{failures:>6}")
+            client.close()
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
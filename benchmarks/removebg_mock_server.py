@@ -0,0 +1,209 @@
+"""
+旅行证照片处理 - Remove.bg模拟服务
+在本地模拟Remove.bg的/v1.0/removebg接口，用于测试和负载基准测试，不消耗API额度
+
+返回与上传图片同尺寸的RGBA PNG，透明通道为居中的椭圆（前景）；可以模拟延迟、限流（429+Retry-After）和服务端错误（503）。
+
+用法:
+    python -m benchmarks.removebg_mock_server [--port 8765] [--latency 0.2] [--fail-rate 0.1] [--rate-limit 5]
+    REMOVEBG_ENDPOINT=http://127.0.0.1:8765/v1.0/removebg python main.py
+"""
+import argparse
+import io
+import json
+import random
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+from PIL import Image
+
+ENDPOINT_PATH = "/v1.0/removebg"
+
+
+def parse_multipart(content_type, body):
+    """解析multipart/form-data，返回{字段名: 字节}"""
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body)
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        if name:
+            fields[name] = part.get_payload(decode=True) or b""
+    return fields
+
+
+def cutout(image_bytes):
+    """生成与输入同尺寸的RGBA PNG，中间的椭圆为前景"""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        rgb = np.asarray(image.convert("RGB"))
+    height, width = rgb.shape[:2]
+    alpha = np.zeros((height, width), dtype=np.uint8)
+    cv2.ellipse(alpha, (width // 2, height // 2), (width * 2 // 5, height * 9 // 20), 0, 0, 360, 255, -1)
+    output = io.BytesIO()
+    Image.fromarray(np.dstack([rgb, alpha]), "RGBA").save(output, "PNG", compress_level=1)
+    return output.getvalue()
+
+
+class MockRemoveBgServer:
+    """模拟服务
+
+    参数:
+        host, port: 监听地址，port为0时自动选择空闲端口
+        latency: 每个请求的处理延迟（秒）
+        fail_rate: 返回503的概率
+        rate_limit: 每秒最多处理的请求数，超出时返回429和Retry-After，None表示不限
+        api_key: 要求的API密钥，None表示接受任意密钥
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, fail_rate=0.0, rate_limit=None, api_key=None):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.rate_limit = rate_limit
+        self.api_key = api_key
+
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._random = random.Random(0)
+        self.stats = {"connections": 0, "requests": 0, "ok": 0, "rate_limited": 0, "failed": 0}
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{ENDPOINT_PATH}"
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _decide(self):
+        """决定本次请求的结果：ok、rate_limited或failed"""
+        with self._lock:
+            if self.rate_limit:
+                now = time.monotonic()
+                if now - self._window_start >= 1.0:
+                    self._window_start = now
+                    self._window_count = 0
+                if self._window_count >= self.rate_limit:
+                    return "rate_limited"
+                self._window_count += 1
+            if self.fail_rate and self._random.random() < self.fail_rate:
+                return "failed"
+        return "ok"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1才能保持长连接
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                server._count("connections")
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_body(self, status, body, content_type, headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_error_json(self, status, title, headers=None):
+                body = json.dumps({"errors": [{"title": title}]}).encode()
+                self.send_body(status, body, "application/json", headers)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                server._count("requests")
+                if self.path != ENDPOINT_PATH:
+                    self.send_error_json(404, "Not found")
+                    return
+                if server.api_key and self.headers.get("X-Api-Key") != server.api_key:
+                    self.send_error_json(403, "Forbidden: invalid API key")
+                    return
+
+                if server.latency:
+                    time.sleep(server.latency)
+
+                outcome = server._decide()
+                if outcome == "rate_limited":
+                    server._count("rate_limited")
+                    self.send_error_json(429, "Rate limit exceeded", {"Retry-After": "1"})
+                    return
+                if outcome == "failed":
+                    server._count("failed")
+                    self.send_error_json(503, "Service temporarily unavailable")
+                    return
+
+                fields = parse_multipart(self.headers.get("Content-Type", ""), body)
+                if "image_file" not in fields:
+                    self.send_error_json(400, "No image given")
+                    return
+                try:
+                    result = cutout(fields["image_file"])
+                except Exception as e:
+                    self.send_error_json(400, f"Failed to read image: {e}")
+                    return
+                server._count("ok")
+                self.send_body(200, result, "image/png")
+
+        return Handler
+
+    def start(self):
+        """在后台线程中运行，返回self"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="removebg-mock", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove.bg模拟服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的处理延迟（秒）")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="返回503的概率")
+    parser.add_argument("--rate-limit", type=int, default=None, help="每秒最多处理的请求数，超出返回429")
+    parser.add_argument("--api-key", default=None, help="要求的API密钥（默认接受任意密钥）")
+    args = parser.parse_args()
+
+    server = MockRemoveBgServer(args.host, args.port, args.latency, args.fail_rate, args.rate_limit, args.api_key)
+    print(f"模拟服务已启动: {server.url}")
+    print(f"使用: REMOVEBG_ENDPOINT={server.url} python main.py")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"统计: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
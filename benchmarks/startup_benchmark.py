@@ -0,0 +1,199 @@
+"""
+旅行证照片处理 - 启动基准测试
+在离屏Qt平台上测量从启动到主窗口首次绘制的各阶段耗时，保存为JSON并与基线比较
+
+每次测量都在新的子进程中进行（模块导入只有第一次才有代价），取多次的中位数。
+
+用法:
+    python -m benchmarks.startup_benchmark [--repeat 5] [--output startup.json]
+    python -m benchmarks.startup_benchmark --save-baseline benchmarks/startup_baseline.json
+    python -m benchmarks.startup_benchmark --baseline benchmarks/startup_baseline.json [--tolerance 0.2]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+# 指标名称和说明，按启动顺序排列
+METRICS = (
+    ("import_ms", "导入界面模块"),
+    ("qapplication_ms", "创建QApplication"),
+    ("stylesheet_ms", "应用STYLESHEET"),
+    ("tab_background_ms", "  背景去除选项卡"),
+    ("tab_crop_ms", "  照片裁剪选项卡"),
+    ("tab_print_ms", "  照片排版选项卡"),
+    ("window_ms", "创建主窗口（合计）"),
+    ("first_paint_ms", "显示到首次绘制"),
+    ("total_ms", "合计"),
+)
+
+# 小于该值的差异视为噪声，不算回归
+MIN_REGRESSION_MS = 5.0
+
+TABS = (
+    ("create_background_tab", "tab_background_ms"),
+    ("create_crop_tab", "tab_crop_ms"),
+    ("create_print_tab", "tab_print_ms"),
+)
+
+
+def measure_once():
+    """在当前（新启动的）进程中测量一次启动，返回各指标毫秒数"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    from src.utils.startup_timing import StartupTimer
+
+    timer = StartupTimer()
+    timer.trace_imports()
+    from PySide6.QtCore import QEvent, QObject, QTimer
+    from PySide6.QtWidgets import QApplication
+    from src.utils.theme import STYLESHEET
+    from src.ui.main_window import ModernPhotoProcessor
+    timer.stop_tracing_imports()
+    results = {"import_ms": timer.mark("import") * 1000}
+
+    app = QApplication([sys.argv[0]])
+    results["qapplication_ms"] = timer.mark("qapplication") * 1000
+
+    app.setStyleSheet(STYLESHEET)
+    results["stylesheet_ms"] = timer.mark("stylesheet") * 1000
+
+    # 给每个选项卡的构建方法计时
+    def timed_tab(method, metric):
+        def wrapper(self):
+            start_time = time.perf_counter()
+            try:
+                return method(self)
+            finally:
+                results[metric] = (time.perf_counter() - start_time) * 1000
+        return wrapper
+
+    for method_name, metric in TABS:
+        setattr(ModernPhotoProcessor, method_name, timed_tab(getattr(ModernPhotoProcessor, method_name), metric))
+
+    window = ModernPhotoProcessor()
+    results["window_ms"] = timer.mark("window") * 1000
+
+    class PaintWatcher(QObject):
+        """收到主窗口的第一个绘制事件后退出事件循环"""
+
+        def eventFilter(self, watched, event):
+            if event.type() == QEvent.Paint and "first_paint_ms" not in results:
+                results["first_paint_ms"] = timer.mark("first_paint") * 1000
+                QTimer.singleShot(0, app.quit)
+            return False
+
+    watcher = PaintWatcher()
+    window.installEventFilter(watcher)
+    window.show()
+    # 平台不发送绘制事件时最多等待5秒
+    QTimer.singleShot(5000, app.quit)
+    app.exec()
+    if "first_paint_ms" not in results:
+        results["first_paint_ms"] = timer.mark("first_paint") * 1000
+
+    results["total_ms"] = sum(results[name] for name in
+                              ("import_ms", "qapplication_ms", "stylesheet_ms", "window_ms", "first_paint_ms"))
+    slowest = [{"module": name, "self_ms": round(own * 1000, 1), "cumulative_ms": round(cumulative * 1000, 1)}
+               for name, own, cumulative, _ in timer.slowest_imports(10)]
+    return {"metrics": {name: round(value, 2) for name, value in results.items()}, "slowest_imports": slowest}
+
+
+def run_child():
+    """启动子进程测量一次，返回其结果"""
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup_benchmark", "--child"],
+        check=True, capture_output=True, text=True, env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ).stdout
+    # Qt可能向标准输出打印警告，结果在最后一行
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare(medians, baseline, tolerance):
+    """返回回归的指标列表[(名称, 当前, 基线)]"""
+    regressions = []
+    for name, _ in METRICS:
+        if name not in baseline or name not in medians:
+            continue
+        current, previous = medians[name], baseline[name]
+        if current > previous * (1 + tolerance) and current - previous > MIN_REGRESSION_MS:
+            regressions.append((name, current, previous))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动基准测试")
+    parser.add_argument("--repeat", type=int, default=5, help="测量次数（每次一个新进程）")
+    parser.add_argument("--output", default=None, help="结果JSON路径")
+    parser.add_argument("--baseline", default=None, help="与该基线JSON比较，有回归时返回1")
+    parser.add_argument("--save-baseline", default=None, help="把本次结果保存为基线")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许比基线慢的比例")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_once()))
+        return 0
+
+    runs = []
+    for index in range(args.repeat):
+        runs.append(run_child())
+        print(f"第{index + 1}/{args.repeat}次: {runs[-1]['metrics']['total_ms']:.1f} ms", flush=True)
+
+    medians = {name: round(statistics.median(run["metrics"][name] for run in runs), 2)
+               for name, _ in METRICS if all(name in run["metrics"] for run in runs)}
+    result = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "median_ms": medians,
+        "runs": [run["metrics"] for run in runs],
+        "slowest_imports": runs[0]["slowest_imports"],
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["median_ms"]
+
+    print(f"\n{'阶段':<20}{'中位数ms':>10}{'最小ms':>10}{'最大ms':>10}" + (f"{'基线ms':>10}{'变化':>9}" if baseline else ""))
+    for name, label in METRICS:
+        if name not in medians:
+            continue
+        values = [run["metrics"][name] for run in runs]
+        line = f"{label:<20}{medians[name]:>10.1f}{min(values):>10.1f}{max(values):>10.1f}"
+        if baseline and name in baseline:
+            change = (medians[name] / baseline[name] - 1) * 100 if baseline[name] else 0.0
+            line += f"{baseline[name]:>10.1f}{change:>+8.0f}%"
+        print(line)
+
+    print("\n最慢的导入（第一次测量，自身 / 累计ms）:")
+    for record in result["slowest_imports"]:
+        print(f"  {record['self_ms']:>8.1f} {record['cumulative_ms']:>8.1f}  {record['module']}")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            print(f"结果已保存到 {path}")
+
+    if baseline:
+        regressions = compare(medians, baseline, args.tolerance)
+        if regressions:
+            print(f"\n发现回归（超过基线{args.tolerance:.0%}且多于{MIN_REGRESSION_MS:.0f}ms）:")
+            for name, current, previous in regressions:
+                print(f"  {dict(METRICS)[name].strip()}: {previous:.1f} ms -> {current:.1f} ms")
+            return 1
+        print("\n未发现回归")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
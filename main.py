@@ -1,8 +1,6 @@
+import argparse
 import sys
-from PySide6.QtWidgets import QApplication
 import os
-from src.utils.theme import STYLESHEET
-from src.ui.main_window import ModernPhotoProcessor
 
 def ensure_dirs():
     """确保必要的目录存在"""
@@ -10,24 +8,87 @@ def ensure_dirs():
     for d in dirs:
         os.makedirs(d, exist_ok=True)
 
-if __name__ == '__main__':
+def parse_args(argv):
+    """解析本程序的参数，其余参数留给Qt"""
+    parser = argparse.ArgumentParser(description="旅行证照片处理")
+    parser.add_argument("--startup-timing", action="store_true",
+                        help="输出启动各阶段和各模块导入的耗时（类似python -X importtime）")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="不在后台预加载rembg模型（只使用排版功能时可节省内存和CPU）")
+    parser.add_argument("--profile-log", action="store_true", help="把各处理阶段的耗时输出到日志")
+    parser.add_argument("--profile-trace", metavar="PATH", default=None,
+                        help="退出时把各处理阶段写成Chrome跟踪文件（在chrome://tracing或Perfetto中打开）")
+    parser.add_argument("--profile-panel", action="store_true", help="启动时打开性能面板（也可按Ctrl+Shift+P打开）")
+    return parser.parse_known_args(argv[1:])
+
+def main(argv):
+    args, qt_args = parse_args(argv)
+
+    timer = None
+    if args.startup_timing:
+        from src.utils.startup_timing import StartupTimer
+        timer = StartupTimer()
+        timer.trace_imports()
+
+    # 界面模块在解析参数之后才导入，以便统计导入耗时；rembg等重型依赖在第一次使用时才导入
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import QTimer
+    from src.utils.theme import STYLESHEET
+    from src.ui.main_window import ModernPhotoProcessor
+    from src.core.rembg_sessions import session_pool
+    if timer:
+        timer.mark("导入模块")
+
     # 确保必要的目录存在
     ensure_dirs()
-    
+
     # 创建应用实例
-    app = QApplication(sys.argv)
-    
+    app = QApplication(argv[:1] + qt_args)
+    if timer:
+        timer.mark("创建QApplication")
+
+    # 性能剖析输出，未指定时剖析保持关闭
+    if args.profile_log or args.profile_trace:
+        from src.core.profiling import profiler, LogSink, ChromeTraceSink
+        if args.profile_log:
+            profiler.add_sink(LogSink())
+        if args.profile_trace:
+            trace_sink = profiler.add_sink(ChromeTraceSink(args.profile_trace))
+            app.aboutToQuit.connect(lambda: print(f"性能跟踪已保存到 {trace_sink.save()}"))
+
     # 应用全局样式表
     app.setStyleSheet(STYLESHEET)
-    
+    if timer:
+        timer.mark("应用样式表")
+
     # 设置应用信息
     app.setApplicationName("旅行证照片处理")
     app.setApplicationVersion("2.0")
     app.setOrganizationName("照片处理工作室")
-    
+
     # 创建并显示主窗口
     window = ModernPhotoProcessor()
+    if timer:
+        timer.mark("创建主窗口")
     window.show()
-    
+    if args.profile_panel:
+        window.show_performance_panel()
+
+    def after_first_paint():
+        if timer:
+            timer.mark("显示窗口（首次绘制）")
+            timer.stop_tracing_imports()
+            timer.report()
+
+        # 窗口显示后再在后台预加载rembg模型，使第一张照片的处理速度与之后一致
+        if not args.no_warmup:
+            session_pool.preload_async()
+
+    # 事件循环开始后第一批事件（包括首次绘制）处理完才执行
+    QTimer.singleShot(0, after_first_paint)
+
     # 运行应用
-    sys.exit(app.exec()) 
\ No newline at end of file
+    return app.exec()
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1 @@
+# 初始化 Python 包
\ No newline at end of file
@@ -0,0 +1,178 @@
+"""
+旅行证照片处理 - 命令行批量处理
+不启动界面，批量完成背景去除、自动裁剪和可选的打印排版，并输出JSON/CSV报告
+
+用法:
+    python -m src.cli.batch 照片目录或通配符 [...] -o 输出目录 [--layout standard] [--report report.csv]
+    python -m src.cli.batch 照片目录 -o 输出目录 --workers 0    # 按CPU核数多进程处理
+    python -m src.cli.batch 照片目录 -o 输出目录 --pack one_inch:4 --pack two_inch:2    # 全部照片拼版到多页PDF
+"""
+import argparse
+import os
+import sys
+import time
+
+from src.core.batch import LAYOUTS, collect_inputs, run_batch, summarize, write_report
+from src.core.batch_executor import DEFAULT_ITEM_TIMEOUT, BatchExecutor
+from src.core.rembg_sessions import SUPPORTED_MODELS, MODEL_ALIASES, DEFAULT_MODEL
+from src.core.mask_utils import BACKGROUND_COLORS
+from src.core.cancellation import CancelToken
+from src.core.profiling import profiler, LogSink, ChromeTraceSink
+from src.core.sheet_packing import PHOTO_SIZES, PAPER_SIZES, pack_sheets, save_sheets
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="旅行证照片批量处理")
+    parser.add_argument("inputs", nargs="+", help="照片目录、通配符（如 'photos/**/*.jpg'）或文件")
+    parser.add_argument("-o", "--output-dir", default="output", help="输出目录")
+    parser.add_argument("--method", choices=("rembg", "grabcut", "api"), default="rembg", help="背景去除方法")
+    parser.add_argument("--model", choices=SUPPORTED_MODELS + tuple(MODEL_ALIASES), default=DEFAULT_MODEL,
+                        help="rembg模型")
+    parser.add_argument("--proxy-size", type=int, default=None, help="低分辨率分割的代理长边（如1024）")
+    parser.add_argument("--background", choices=tuple(BACKGROUND_COLORS), default="white", help="背景颜色")
+    parser.add_argument("--crop-first", action="store_true", help="先检测人脸，只对裁剪窗口去除背景")
+    parser.add_argument("--keep-background", action="store_true", help="同时保存去除背景后的整张照片")
+    parser.add_argument("--format", choices=("png", "jpg"), default="png", help="输出格式")
+    parser.add_argument("--timeout", type=float, default=None, help="整批处理的截止时间（秒）")
+    parser.add_argument("--workers", type=int, default=1, help="工作进程数，1为在当前进程中处理，0为CPU核数")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="多进程时同时处理或排队的最大照片数")
+    parser.add_argument("--item-timeout", type=float, default=DEFAULT_ITEM_TIMEOUT,
+                        help="多进程时单张照片的最长处理时间（秒），超时后终止工作进程并记为失败，0为不限制")
+    parser.add_argument("--report", default=None, help="报告路径（.json或.csv），默认为输出目录下的report.json")
+    parser.add_argument("--profile-log", action="store_true", help="把各处理阶段的耗时输出到日志")
+    parser.add_argument("--trace", default=None, metavar="PATH",
+                        help="把各处理阶段写成Chrome跟踪文件（只记录当前进程，多进程时工作进程中的阶段不记录）")
+
+    layout = parser.add_argument_group("打印排版")
+    layout.add_argument("--layout", choices=LAYOUTS, default="none", help="排版方式")
+    layout.add_argument("--layout-format", choices=("png", "jpg", "pdf"), default=None,
+                        help="排版文件格式，默认与--format相同")
+    layout.add_argument("--rows", type=int, default=4, help="自定义排版行数")
+    layout.add_argument("--columns", type=int, default=3, help="自定义排版列数")
+    layout.add_argument("--small-count", type=int, default=4, help="混合排版一寸照片数量")
+    layout.add_argument("--large-count", type=int, default=2, help="混合排版二寸照片数量")
+    layout.add_argument("--spacing", type=int, default=10, help="排版间距（像素）")
+    layout.add_argument("--dpi", type=int, default=300, help="排版DPI")
+
+    packing = parser.add_argument_group("多页拼版（把所有成功的照片装入尽量少的页面）")
+    packing.add_argument("--pack", action="append", type=pack_spec, default=[], metavar="尺寸:份数",
+                         help=f"每张照片打印的尺寸和份数，可重复（尺寸: {', '.join(PHOTO_SIZES)}）")
+    packing.add_argument("--paper", choices=tuple(PAPER_SIZES), default="a4", help="拼版纸张")
+    packing.add_argument("--pack-output", default=None, help="拼版文件路径，默认为输出目录下的pack.pdf")
+    return parser
+
+
+def pack_spec(text):
+    """解析"尺寸:份数"，如one_inch:4"""
+    size, _, quantity = text.partition(":")
+    if size not in PHOTO_SIZES:
+        raise argparse.ArgumentTypeError(f"不支持的尺寸: {size}")
+    try:
+        quantity = int(quantity or 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"份数必须是整数: {text}")
+    return size, quantity
+
+
+def pack_photos(records, args):
+    """把成功处理的照片按--pack拼版，返回写入的文件列表"""
+    from PIL import Image
+
+    items = []
+    for record in records:
+        if record["status"] != "ok" or not record["photo"]:
+            continue
+        with Image.open(record["photo"]) as image:
+            photo = image.convert("RGB")
+        for size, quantity in args.pack:
+            items.append({"photo": photo, "size": size, "quantity": quantity})
+    if not items:
+        return []
+
+    sheets = pack_sheets(items, paper=args.paper, dpi=args.dpi)
+    path = args.pack_output or os.path.join(args.output_dir, "pack.pdf")
+    return save_sheets(sheets, path)
+
+
+def layout_params(args):
+    """从命令行参数生成排版参数"""
+    if args.layout == "custom":
+        return {"rows": args.rows, "columns": args.columns, "spacing": args.spacing, "dpi": args.dpi}
+    elif args.layout == "mixed":
+        return {"small_count": args.small_count, "large_count": args.large_count,
+                "spacing": args.spacing, "dpi": args.dpi}
+    return None
+
+
+def print_progress(index, total, record):
+    """每张照片处理完后输出一行"""
+    name = os.path.basename(record["input"])
+    message = f"[{index}/{total}] {name}: {record['status']}"
+    if record["total_ms"] != "":
+        message += f" {record['total_ms']:.0f}ms"
+    if record["error"]:
+        message += f" ({record['error']})"
+    print(message, flush=True)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    files = collect_inputs(args.inputs)
+    if not files:
+        print("没有找到需要处理的照片")
+        return 1
+
+    print(f"共{len(files)}张照片，输出到 {args.output_dir}")
+    trace_sink = None
+    if args.profile_log:
+        profiler.add_sink(LogSink())
+    if args.trace:
+        trace_sink = profiler.add_sink(ChromeTraceSink(args.trace))
+        if args.workers != 1:
+            print("注意: 多进程时只记录主进程中的阶段，请配合--workers 1使用")
+    cancel_token = CancelToken(args.timeout)
+    start_time = time.perf_counter()
+    options = dict(
+        method=args.method, model_name=args.model, proxy_size=args.proxy_size, crop_first=args.crop_first,
+        layout=args.layout, layout_params=layout_params(args), keep_background=args.keep_background,
+        output_format=args.format, bg_color=args.background, layout_format=args.layout_format)
+    try:
+        if args.workers == 1:
+            records = run_batch(files, args.output_dir, progress_callback=print_progress,
+                                cancel_token=cancel_token, **options)
+        else:
+            executor = BatchExecutor(workers=args.workers or None, max_in_flight=args.max_in_flight,
+                                     item_timeout=args.item_timeout)
+            print(f"使用{executor.workers}个工作进程，每个进程{executor.threads_per_worker}个计算线程")
+            records = executor.run(files, args.output_dir, progress_callback=print_progress,
+                                   cancel_token=cancel_token, **options)
+    except KeyboardInterrupt:
+        print("已中断")
+        return 130
+    elapsed = time.perf_counter() - start_time
+    if trace_sink is not None:
+        print(f"性能跟踪已保存到 {trace_sink.save()}")
+
+    report_path = args.report or os.path.join(args.output_dir, "report.json")
+    write_report(records, report_path, extra={"options": vars(args)}, elapsed=elapsed)
+
+    summary = summarize(records, elapsed)
+    print(f"完成: 成功{summary['ok']}张，未检测到人脸{summary['no_face']}张，"
+          f"失败{summary['error']}张，超时{summary['timeout']}张，取消{summary['cancelled']}张；"
+          f"用时{elapsed:.1f}秒，{summary['images_per_minute']:.1f}张/分钟")
+    print(f"报告已保存到 {report_path}")
+
+    if args.pack:
+        try:
+            paths = pack_photos(records, args)
+        except (OSError, ValueError) as e:
+            print(f"拼版失败: {str(e)}")
+            return 1
+        if paths:
+            print(f"拼版已保存到 {', '.join(paths)}")
+    return 0 if summary["ok"] == summary["total"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""
+旅行证照片处理 - 批量处理
+不依赖界面，按"背景去除→裁剪→排版"的流程处理一批照片，并记录每张照片的耗时和失败原因
+"""
+import csv
+import glob
+import json
+import os
+import time
+import traceback
+
+from PIL import Image
+
+from src.core.image_processor import ImageProcessor
+from src.core.rembg_sessions import DEFAULT_MODEL
+from src.core.cancellation import OperationCancelled, OperationTimeout, check_cancelled
+from src.core.profiling import profiler
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+
+# 排版方式: none（不排版）、standard（4x6英寸9张）、custom（自定义行列）、mixed（一寸二寸混排）
+LAYOUTS = ("none", "standard", "custom", "mixed")
+
+# 报告中每张照片的字段（CSV列顺序）
+REPORT_FIELDS = ("input", "status", "error", "photo", "layout", "background",
+                 "load_ms", "background_ms", "crop_ms", "layout_ms", "save_ms", "total_ms")
+
+
+def collect_inputs(sources):
+    """把目录、通配符或文件路径展开为按名称排序的图片列表（去重）"""
+    files = []
+    for source in sources:
+        if os.path.isdir(source):
+            candidates = [os.path.join(source, name) for name in os.listdir(source)]
+        elif os.path.isfile(source):
+            candidates = [source]
+        else:
+            candidates = glob.glob(source, recursive=True)
+
+        files.extend(sorted(path for path in candidates
+                            if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS)))
+
+    seen = set()
+    unique = []
+    for path in files:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+def output_names(files):
+    """为每个输入生成不重复的输出文件名前缀（不同目录下的同名文件追加序号）"""
+    names = []
+    used = {}
+    for path in files:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        count = used.get(stem, 0)
+        used[stem] = count + 1
+        names.append(stem if count == 0 else f"{stem}_{count}")
+    return names
+
+
+def create_layout(photo, layout, layout_params=None, cancel_token=None):
+    """按排版方式生成打印排版页面（PrintSheet），layout为"none"时返回None"""
+    if layout == "standard":
+        return ImageProcessor.print_sheet(photo, cancel_token=cancel_token)
+    elif layout == "custom":
+        return ImageProcessor.custom_print_sheet(photo, layout_params or {}, cancel_token=cancel_token)
+    elif layout == "mixed":
+        return ImageProcessor.mixed_print_sheet(photo, layout_params or {}, cancel_token=cancel_token)
+    return None
+
+
+def _ignore_progress(value, text=None):
+    """批量处理不显示单张照片内部的进度"""
+
+
+def _save(image, path, output_format):
+    """保存图像，JPEG不支持透明通道时先转为RGB"""
+    with profiler.span("encode", format=output_format):
+        if output_format == "jpg":
+            image.convert("RGB").save(path, "JPEG", quality=95, dpi=(300, 300))
+        else:
+            image.save(path, "PNG", dpi=(300, 300))
+
+
+def process_file(path, output_dir, name=None, method="rembg", model_name=DEFAULT_MODEL, proxy_size=None,
+                 crop_first=False, layout="none", layout_params=None, keep_background=False,
+                 output_format="png", bg_color="white", layout_format=None, cancel_token=None):
+    """处理单张照片并返回报告记录
+
+    参数:
+        path: 输入图片路径
+        output_dir: 输出目录
+        name: 输出文件名前缀，默认使用输入文件名
+        method: 背景去除方法，同ImageProcessor.remove_background
+        model_name: rembg模型名称
+        proxy_size: 低分辨率分割的代理长边，None表示按原分辨率分割
+        crop_first: 先检测人脸、只对裁剪窗口去除背景（背景耗时计入裁剪耗时）
+        layout: 排版方式，见LAYOUTS
+        layout_params: 自定义/混合排版参数，同create_custom_print_layout/create_mixed_print_layout
+        keep_background: 同时保存去除背景后的整张照片（crop_first时无效）
+        output_format: "png"或"jpg"
+        bg_color: 背景颜色(R, G, B)或名称（"white"、"blue"、"red"）
+        layout_format: 排版文件格式"png"、"jpg"或"pdf"，None表示与output_format相同
+        cancel_token: 取消令牌
+
+    返回:
+        字典，字段见REPORT_FIELDS；status为ok、no_face、error、timeout（处理中超过截止时间）或cancelled
+    """
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    extension = "jpg" if output_format == "jpg" else "png"
+    record = {field: "" for field in REPORT_FIELDS}
+    record.update(input=path, status="ok", load_ms=0.0, background_ms=0.0, crop_ms=0.0,
+                  layout_ms=0.0, save_ms=0.0, total_ms=0.0)
+
+    def stage(field, start_time):
+        record[field] = round((time.perf_counter() - start_time) * 1000, 1)
+
+    total_start = time.perf_counter()
+    try:
+        start_time = time.perf_counter()
+        with profiler.span("decode"), Image.open(path) as source:
+            image = source.convert("RGB")
+        stage("load_ms", start_time)
+        check_cancelled(cancel_token)
+
+        if crop_first:
+            start_time = time.perf_counter()
+            photo = ImageProcessor.remove_background_and_crop(
+                image, _ignore_progress, method=method, model_name=model_name, cancel_token=cancel_token,
+                bg_color=bg_color, proxy_size=proxy_size)
+            stage("crop_ms", start_time)
+        else:
+            start_time = time.perf_counter()
+            processed = ImageProcessor.remove_background(
+                image, _ignore_progress, method=method, model_name=model_name, proxy_size=proxy_size,
+                cancel_token=cancel_token, bg_color=bg_color)
+            stage("background_ms", start_time)
+
+            if keep_background:
+                start_time = time.perf_counter()
+                background_path = os.path.join(output_dir, f"{name}_nobg.{extension}")
+                _save(processed, background_path, output_format)
+                record["background"] = background_path
+                record["save_ms"] += round((time.perf_counter() - start_time) * 1000, 1)
+
+            start_time = time.perf_counter()
+            photo = ImageProcessor.auto_crop_id_photo(processed, _ignore_progress, cancel_token=cancel_token)
+            stage("crop_ms", start_time)
+
+        if photo is None:
+            record.update(status="no_face", error="未检测到人脸")
+            return record
+
+        start_time = time.perf_counter()
+        photo_path = os.path.join(output_dir, f"{name}_id.{extension}")
+        _save(photo, photo_path, output_format)
+        record["photo"] = photo_path
+        record["save_ms"] += round((time.perf_counter() - start_time) * 1000, 1)
+
+        if layout != "none":
+            start_time = time.perf_counter()
+            sheet = create_layout(photo, layout, layout_params, cancel_token)
+            stage("layout_ms", start_time)
+
+            # 排版页面按条带渲染并写入文件，不生成整页图像
+            start_time = time.perf_counter()
+            layout_format = layout_format or output_format
+            layout_path = os.path.join(output_dir, f"{name}_layout.{layout_format}")
+            sheet.save(layout_path, layout_format, cancel_token)
+            record["layout"] = layout_path
+            record["save_ms"] += round((time.perf_counter() - start_time) * 1000, 1)
+    except OperationTimeout as e:
+        # OperationTimeout是OperationCancelled的子类，需先捕获：超时不是用户取消
+        record.update(status="timeout", error=str(e))
+    except OperationCancelled as e:
+        record.update(status="cancelled", error=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+    finally:
+        stage("total_ms", total_start)
+
+    return record
+
+
+def run_batch(files, output_dir, progress_callback=None, cancel_token=None, **options):
+    """依次处理files中的照片
+
+    progress_callback(index, total, record) 在每张照片处理完后调用，
+    其余参数传给process_file。取消后剩余的照片记为cancelled。
+
+    返回:
+        报告记录列表，顺序与files一致
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    records = []
+    for index, (path, name) in enumerate(zip(files, output_names(files))):
+        if cancel_token is not None and (cancel_token.cancelled or cancel_token.expired()):
+            record = {field: "" for field in REPORT_FIELDS}
+            record.update(input=path, status="cancelled", error="操作超时" if cancel_token.expired() else "操作已取消")
+        else:
+            with profiler.span("process_file", file=name):
+                record = process_file(path, output_dir, name, cancel_token=cancel_token, **options)
+        records.append(record)
+        if progress_callback:
+            progress_callback(index + 1, len(files), record)
+    return records
+
+
+def summarize(records, elapsed=None):
+    """统计各状态的数量和处理耗时，给出elapsed（秒）时同时计算吞吐量（张/分钟）"""
+    summary = {"total": len(records), "ok": 0, "no_face": 0, "error": 0, "timeout": 0, "cancelled": 0}
+    for record in records:
+        summary[record["status"]] = summary.get(record["status"], 0) + 1
+
+    timed = [record["total_ms"] for record in records if record["total_ms"] != ""]
+    summary["total_ms"] = round(sum(timed), 1)
+    summary["average_ms"] = round(sum(timed) / len(timed), 1) if timed else 0.0
+    if elapsed:
+        summary["elapsed_s"] = round(elapsed, 2)
+        summary["images_per_minute"] = round((summary["ok"] + summary["no_face"]) / elapsed * 60, 1)
+    return summary
+
+
+def write_report(records, path, extra=None, elapsed=None):
+    """写出报告，扩展名为.csv时写CSV，否则写JSON（包含汇总信息）"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if path.lower().endswith(".csv"):
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(records)
+    else:
+        report = {"summary": summarize(records, elapsed), "files": records}
+        if extra:
+            report.update(extra)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
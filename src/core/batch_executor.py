@@ -0,0 +1,225 @@
+"""
+旅行证照片处理 - 多进程批量执行器
+每个工作进程启动时加载一次rembg模型和人脸检测器，之后从任务队列中依次处理照片
+"""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from src.core.batch import REPORT_FIELDS, output_names, process_file
+from src.core.cancellation import CancelToken
+from src.core.rembg_sessions import DEFAULT_MODEL
+
+# 工作进程异常退出（崩溃、被系统因内存不足杀掉、处理超时被终止）后最多重建进程池的次数
+MAX_POOL_RESTARTS = 3
+
+# 单张照片默认的最长处理时间（秒）
+DEFAULT_ITEM_TIMEOUT = 300
+
+
+def default_workers():
+    """默认工作进程数：CPU核数"""
+    return max(1, os.cpu_count() or 1)
+
+
+def _init_worker(method, model_name, threads_per_worker):
+    """工作进程初始化：限制每个进程的计算线程数，并预先加载模型
+
+    每个进程独占若干核，避免onnxruntime/OpenCV各自按全部核数开线程而互相争抢。
+    """
+    import cv2
+    from src.core.image_processor import ImageProcessor
+    from src.core.rembg_sessions import session_pool
+
+    cv2.setNumThreads(threads_per_worker)
+    session_pool.configure(intra_op_threads=threads_per_worker, inter_op_threads=1)
+
+    try:
+        if method in ("rembg", "api"):
+            session_pool.warm_up(model_name)
+        ImageProcessor._load_face_cascade()
+    except Exception as e:
+        # 加载失败时不终止进程，处理照片时会按原有逻辑回退或记录错误
+        print(f"工作进程 {os.getpid()} 预加载失败: {str(e)}")
+
+
+def _process_item(path, output_dir, name, timeout, options):
+    """在工作进程中处理一张照片
+
+    输出直接由工作进程写入磁盘，只把报告记录（几百字节）传回主进程，
+    避免在进程间传递整张图像。
+    """
+    cancel_token = CancelToken(timeout) if timeout else None
+    record = process_file(path, output_dir, name, cancel_token=cancel_token, **options)
+    record["worker"] = os.getpid()
+    return record
+
+
+def _terminate_workers(executor):
+    """终止进程池中的全部工作进程，用于处理卡在原生代码中、无法响应取消的照片
+
+    ProcessPoolExecutor无法单独停止某个任务；终止进程后进程池损坏，
+    其中所有未完成的照片都以BrokenProcessPool结束。
+    """
+    for process in list((getattr(executor, "_processes", None) or {}).values()):
+        process.terminate()
+
+
+def _failed_record(path, status, error):
+    """主进程中生成的记录（照片没有处理或工作进程没有返回结果）"""
+    record = {field: "" for field in REPORT_FIELDS}
+    record.update(input=path, status=status, error=error)
+    return record
+
+
+class BatchExecutor:
+    """多进程批量执行器
+
+    参数:
+        workers: 工作进程数，默认为CPU核数
+        max_in_flight: 同时提交给进程池的最大照片数，用于限制峰值内存，默认为workers的2倍
+        threads_per_worker: 每个进程的onnxruntime/OpenCV线程数，默认平分CPU核数
+        item_timeout: 单张照片的最长处理时间（秒），从照片交给工作进程开始计算；
+            超时后终止工作进程并把该照片记为失败，None或0表示不限制
+    """
+
+    def __init__(self, workers=None, max_in_flight=None, threads_per_worker=None, item_timeout=DEFAULT_ITEM_TIMEOUT):
+        self.workers = workers or default_workers()
+        self.max_in_flight = max(self.workers, max_in_flight or self.workers * 2)
+        self.threads_per_worker = threads_per_worker or max(1, default_workers() // self.workers)
+        self.item_timeout = item_timeout or None
+
+    def run(self, files, output_dir, progress_callback=None, cancel_token=None, method="rembg",
+            model_name=DEFAULT_MODEL, **options):
+        """处理files中的照片，参数与run_batch相同
+
+        取消后不再提交新的照片；已提交的照片在工作进程中按剩余时间作为截止时间继续处理。
+        工作进程异常退出时进程池会损坏，当时已提交的照片记为失败，之后重建进程池继续处理，
+        重建MAX_POOL_RESTARTS次后仍损坏时其余照片也记为失败；无论哪种情况都返回全部记录。
+        照片处理超过item_timeout时主动终止工作进程：该照片记为失败，
+        同时被中断的其他照片在重建的进程池中重新处理。
+
+        返回:
+            报告记录列表，顺序与files一致（完成顺序可能不同）
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        options.update(method=method, model_name=model_name)
+        items = list(zip(files, output_names(files)))
+        records = [None] * len(items)
+        completed = 0
+        next_index = 0
+        pending = {}
+        restarts = 0
+        broken = False
+        # 照片交给工作进程的时间、处理超时的照片、因终止工作进程而需要重新提交的照片
+        started = {}
+        timed_out = set()
+        retry = []
+        terminated = False
+
+        def finish(index, record):
+            nonlocal completed
+            records[index] = record
+            completed += 1
+            if progress_callback:
+                progress_callback(completed, len(items), record)
+
+        executor = self._create_pool(method, model_name)
+        try:
+            while retry or next_index < len(items) or pending:
+                # 补充任务，保证同时在处理或排队的照片不超过max_in_flight
+                while not broken and (retry or next_index < len(items)) and len(pending) < self.max_in_flight:
+                    if cancel_token is not None and (cancel_token.cancelled or cancel_token.expired()):
+                        break
+                    index = retry[0] if retry else next_index
+                    path, name = items[index]
+                    timeout = cancel_token.remaining() if cancel_token is not None else None
+                    try:
+                        future = executor.submit(_process_item, path, output_dir, name, timeout, options)
+                    except BrokenProcessPool:
+                        broken = True
+                        break
+                    pending[future] = index
+                    if retry:
+                        retry.pop(0)
+                    else:
+                        next_index += 1
+
+                if broken and not pending:
+                    # 损坏的进程池中的照片都已记录，重建进程池继续处理剩余照片
+                    executor.shutdown(wait=True)
+                    if restarts >= MAX_POOL_RESTARTS:
+                        break
+                    restarts += 1
+                    executor = self._create_pool(method, model_name)
+                    broken = False
+                    terminated = False
+                    continue
+
+                if not pending:
+                    break
+
+                # 有取消令牌或单张超时时定期醒来检查，以便及时停止提交新任务、终止卡住的工作进程
+                periodic = cancel_token is not None or self.item_timeout is not None
+                done, _ = wait(pending, timeout=1.0 if periodic else None, return_when=FIRST_COMPLETED)
+
+                if self.item_timeout is not None and not terminated:
+                    now = time.monotonic()
+                    for future, index in pending.items():
+                        if future in done:
+                            continue
+                        if future.running():
+                            started.setdefault(future, now)
+                        if now - started.get(future, now) > self.item_timeout:
+                            timed_out.add(index)
+                    if timed_out:
+                        _terminate_workers(executor)
+                        terminated = True
+
+                for future in done:
+                    index = pending.pop(future)
+                    started.pop(future, None)
+                    try:
+                        record = future.result()
+                    except BrokenProcessPool as e:
+                        # 工作进程崩溃或被杀掉时，进程池中所有未完成的照片都以此结束
+                        broken = True
+                        if index in timed_out:
+                            timed_out.discard(index)
+                            record = _failed_record(items[index][0], "error",
+                                                    f"处理超过{self.item_timeout:g}秒，已终止工作进程")
+                        elif terminated:
+                            # 因其他照片超时被中断，重建进程池后重新处理
+                            retry.append(index)
+                            continue
+                        else:
+                            record = _failed_record(items[index][0], "error", f"工作进程异常退出: {e}")
+                    except Exception as e:
+                        # 结果无法传回等进程内没有捕获的错误
+                        record = _failed_record(items[index][0], "error", f"{type(e).__name__}: {e}")
+                    finish(index, record)
+        finally:
+            # 中断时取消尚未开始的任务，只等待正在处理的照片
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+        # 未提交的照片：进程池无法恢复时记为失败，否则是取消后没有提交
+        expired = cancel_token is not None and cancel_token.expired()
+        for index, record in enumerate(records):
+            if record is None:
+                if broken:
+                    record = _failed_record(items[index][0], "error", "进程池多次损坏，未处理")
+                else:
+                    record = _failed_record(items[index][0], "cancelled", "操作超时" if expired else "操作已取消")
+                finish(index, record)
+
+        return records
+
+    def _create_pool(self, method, model_name):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(method, model_name, self.threads_per_worker),
+        )
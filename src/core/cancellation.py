@@ -0,0 +1,62 @@
+"""
+旅行证照片处理 - 任务取消
+提供可跨线程使用的取消令牌和截止时间，供图像处理在各阶段之间检查
+"""
+import threading
+import time
+
+
+class OperationCancelled(Exception):
+    """操作被用户取消"""
+
+
+class OperationTimeout(OperationCancelled, TimeoutError):
+    """操作超过截止时间"""
+
+
+class CancelToken:
+    """取消令牌
+
+    界面线程调用cancel()，处理线程在各阶段之间调用check()，
+    已取消或超过截止时间时抛出异常，使处理尽快停止。
+    """
+
+    def __init__(self, timeout=None):
+        self._event = threading.Event()
+        self.deadline = time.monotonic() + timeout if timeout else None
+
+    def cancel(self):
+        """请求取消"""
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def expired(self):
+        """是否已超过截止时间"""
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def remaining(self, default=None):
+        """距截止时间的剩余秒数，没有截止时间时返回default"""
+        if self.deadline is None:
+            return default
+        return max(0.0, self.deadline - time.monotonic())
+
+    def sleep(self, seconds):
+        """等待seconds秒，期间被取消时立即返回并抛出异常"""
+        self._event.wait(seconds)
+        self.check()
+
+    def check(self):
+        """已取消或超时时抛出异常"""
+        if self._event.is_set():
+            raise OperationCancelled("操作已取消")
+        if self.expired():
+            raise OperationTimeout("操作超时")
+
+
+def check_cancelled(cancel_token):
+    """检查可选的取消令牌（None表示不可取消）"""
+    if cancel_token is not None:
+        cancel_token.check()
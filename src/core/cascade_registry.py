@@ -0,0 +1,67 @@
+"""
+旅行证照片处理 - 级联分类器缓存
+按线程缓存已加载的OpenCV级联分类器（cv2.CascadeClassifier不是线程安全的）
+"""
+import threading
+import time
+
+
+class CascadeRegistry:
+    """线程局部的级联分类器注册表
+
+    每个线程第一次使用时调用loader加载一次分类器，之后直接复用。
+    加载失败时不缓存，下次调用会重新尝试。
+    """
+
+    def __init__(self, loader):
+        # loader(progress_callback) 返回分类器，失败时返回None
+        self._loader = loader
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._loads = 0
+        self._hits = 0
+        self._load_time_total = 0.0
+        self._last_load_time = 0.0
+
+    def get(self, progress_callback=None):
+        """获取当前线程的分类器，未加载时加载"""
+        classifier = getattr(self._local, "classifier", None)
+        if classifier is not None:
+            with self._stats_lock:
+                self._hits += 1
+            return classifier
+
+        start_time = time.perf_counter()
+        classifier = self._loader(progress_callback)
+        elapsed = time.perf_counter() - start_time
+
+        if classifier is not None:
+            self._local.classifier = classifier
+            with self._stats_lock:
+                self._loads += 1
+                self._load_time_total += elapsed
+                self._last_load_time = elapsed
+
+        return classifier
+
+    def preload(self):
+        """为当前线程预先加载分类器，返回是否成功"""
+        return self.get() is not None
+
+    def is_loaded(self):
+        """当前线程是否已加载分类器"""
+        return getattr(self._local, "classifier", None) is not None
+
+    def clear(self):
+        """丢弃当前线程缓存的分类器"""
+        self._local.classifier = None
+
+    def stats(self):
+        """返回加载统计：加载次数、缓存命中次数、加载耗时（秒）"""
+        with self._stats_lock:
+            return {
+                "loads": self._loads,
+                "hits": self._hits,
+                "load_time_total": self._load_time_total,
+                "last_load_time": self._last_load_time,
+            }
@@ -0,0 +1,90 @@
+"""
+旅行证照片处理 - 缩小图人脸检测
+在限制尺寸的缩小图上检测人脸，再把人脸框映射回原图坐标
+"""
+import cv2
+import numpy as np
+
+# 检测用缩小图的最大长边
+DETECT_MAX_SIDE = 800
+
+# 证件照中人脸较大，最小人脸边长取图像短边的比例
+MIN_FACE_RATIO = 0.08
+
+# 精修时人脸框四周扩展的比例
+REFINE_PADDING = 0.3
+
+
+def _detect(face_cascade, gray, min_face):
+    """在灰度图上检测人脸，按面积从大到小排序"""
+    min_face = max(24, int(min_face))
+    faces = face_cascade.detectMultiScale(gray, 1.1, 4, minSize=(min_face, min_face))
+    if len(faces) == 0:
+        return np.empty((0, 4), dtype=np.int32)
+    faces = np.asarray(faces, dtype=np.int32)
+    return faces[np.argsort(-(faces[:, 2] * faces[:, 3]), kind="stable")]
+
+
+def _scale_to(gray, max_side):
+    """将灰度图缩小到长边不超过max_side，返回(缩小图, 缩放比例)"""
+    height, width = gray.shape[:2]
+    long_side = max(height, width)
+    if long_side <= max_side:
+        return gray, 1.0
+    scale = max_side / long_side
+    small = cv2.resize(gray, (max(1, round(width * scale)), max(1, round(height * scale))),
+                       interpolation=cv2.INTER_AREA)
+    return small, scale
+
+
+def _refine(face_cascade, gray, face, max_side):
+    """在原图人脸附近的区域上以更高分辨率重新检测"""
+    x, y, w, h = face
+    height, width = gray.shape[:2]
+    pad_x = int(w * REFINE_PADDING)
+    pad_y = int(h * REFINE_PADDING)
+    left, top = max(0, x - pad_x), max(0, y - pad_y)
+    right, bottom = min(width, x + w + pad_x), min(height, y + h + pad_y)
+
+    roi, scale = _scale_to(gray[top:bottom, left:right], max_side)
+    faces = _detect(face_cascade, roi, min(w, h) * scale * 0.6)
+    if len(faces) == 0:
+        return face
+
+    rx, ry, rw, rh = faces[0]
+    return np.array([
+        left + int(round(rx / scale)),
+        top + int(round(ry / scale)),
+        int(round(rw / scale)),
+        int(round(rh / scale)),
+    ], dtype=np.int32)
+
+
+def detect_faces(face_cascade, gray, max_side=DETECT_MAX_SIDE, refine=False):
+    """在缩小图上检测人脸并映射回原图坐标
+
+    参数:
+        face_cascade: cv2.CascadeClassifier
+        gray: 原图灰度数组
+        max_side: 检测用缩小图的最大长边，None表示按原图检测
+        refine: 是否在原图人脸附近以更高分辨率精修最大的人脸框
+
+    返回:
+        Nx4的人脸框数组 (x, y, w, h)，按面积从大到小排序
+    """
+    if max_side is None:
+        small, scale = gray, 1.0
+    else:
+        small, scale = _scale_to(gray, max_side)
+
+    faces = _detect(face_cascade, small, min(small.shape[:2]) * MIN_FACE_RATIO)
+    if len(faces) == 0 or scale == 1.0:
+        return faces
+
+    # 映射回原图坐标
+    faces = np.round(faces / scale).astype(np.int32)
+
+    if refine:
+        faces[0] = _refine(face_cascade, gray, faces[0], max_side * 2)
+
+    return faces
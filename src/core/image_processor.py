@@ -1,10 +1,18 @@
 import cv2
 import numpy as np
 from PIL import Image
-import time
 from PySide6.QtCore import QObject, Signal
 import os
-import rembg
+from src.core.rembg_sessions import session_pool, DEFAULT_MODEL
+from src.core.mask_utils import downscale_to_proxy, guided_upsample_mask, AlphaMask
+from src.core.mask_cache import mask_cache
+from src.core.cascade_registry import CascadeRegistry
+from src.core.face_detection import detect_faces
+from src.core.cancellation import CancelToken, OperationCancelled, check_cancelled
+from src.core.print_layout import PrintSheet
+from src.core.tile_cache import tile_cache
+from src.core.profiling import profiler
+from src.core.removebg_client import removebg_client
 
 class BackgroundRemovalSignals(QObject):
     """定义用于背景去除进度通信的信号类"""
@@ -51,7 +59,12 @@ class ImageProcessor:
             
     @staticmethod
     def _load_face_cascade(progress_callback=None):
-        """加载人脸检测级联分类器"""
+        """获取人脸检测级联分类器（每个线程只加载一次）"""
+        return face_cascade_registry.get(progress_callback)
+            
+    @staticmethod
+    def _create_face_cascade(progress_callback=None):
+        """从文件加载新的人脸检测级联分类器"""
         cascade_file = ImageProcessor._ensure_cascade_file('haarcascade_frontalface_default.xml', progress_callback)
         if not cascade_file:
             return None
@@ -69,17 +82,57 @@ class ImageProcessor:
         return face_cascade
         
     @staticmethod
-    def remove_background(image, progress_callback=None, method="rembg"):
+    def remove_background(image, progress_callback=None, method="rembg", model_name=DEFAULT_MODEL, proxy_size=None,
+                          cancel_token=None, api_key=None, use_cache=True, bg_color=(255, 255, 255)):
         """
-        移除图像背景
+        移除图像背景并合成到纯色背景上
+        
+        参数同segment_background，另外:
+        bg_color -- 背景颜色(R, G, B)或名称（"white"、"blue"、"red"）
+        
+        返回:
+        去除背景后的PIL Image对象
+        """
+        mask = ImageProcessor.segment_background(
+            image, progress_callback, method, model_name, proxy_size, cancel_token, api_key, use_cache)
+        return mask.composite(bg_color)
+
+    @staticmethod
+    def segment_and_composite(image, progress_callback=None, bg_color=(255, 255, 255), cancel_token=None, **kwargs):
+        """分割前景并合成到bg_color上，返回(AlphaMask, 合成后的PIL图像)
+
+        供后台任务使用：首次合成在任务中完成，界面线程只显示结果；
+        其他参数同segment_background。
+        """
+        mask = ImageProcessor.segment_background(image, progress_callback, cancel_token=cancel_token, **kwargs)
+        check_cancelled(cancel_token)
+        return mask, mask.composite(bg_color)
+
+    @staticmethod
+    def recomposite(mask, bg_color, progress_callback=None, cancel_token=None):
+        """用已有蒙版按新的背景颜色重新合成（供后台任务使用，不重新分割）"""
+        check_cancelled(cancel_token)
+        return mask.composite(bg_color)
+
+    @staticmethod
+    def segment_background(image, progress_callback=None, method="rembg", model_name=DEFAULT_MODEL, proxy_size=None,
+                           cancel_token=None, api_key=None, use_cache=True):
+        """
+        分割前景，返回可重复合成的AlphaMask
         
         参数:
         image -- PIL Image对象
         progress_callback -- 进度回调函数
         method -- 背景去除方法: "rembg"（推荐）、"grabcut"（快速）、"api"（在线服务）
+        model_name -- rembg模型名称: "u2net"、"u2netp"、"u2net_human_seg"、"isnet"
+        proxy_size -- 低分辨率分割的代理长边（如1024），None表示按原分辨率分割
+        cancel_token -- 取消令牌，取消或超时后在下一个阶段抛出OperationCancelled
+        api_key -- Remove.bg API密钥，None时读取已保存的密钥
+        use_cache -- 是否使用蒙版缓存，同一张照片用相同参数再次处理时直接读取蒙版
         
         返回:
-        去除背景后的PIL Image对象
+        AlphaMask对象，调用composite(bg_color)得到任意背景色的结果；
+        所有方法都失败时蒙版为全前景（即原图）；纯色图像抛出ValueError
         """
         # 更新进度回调的辅助函数
         def update_progress(value):
@@ -89,49 +142,112 @@ class ImageProcessor:
                 bg_signals.progress.emit(value)
         
         update_progress(10)
+        with profiler.span("convert"):
+            input_image = image.convert("RGB")
+        
+        # 纯色图像任何方法都无法分割，直接报错而不是回退
+        if ImageProcessor._is_flat(input_image):
+            raise ValueError("图像是纯色的，无法分割前景")
         
         try:
-            if method == "rembg":
-                return ImageProcessor.remove_background_rembg(image, progress_callback)
-            elif method == "api":
-                api_key = ImageProcessor.get_api_key()
-                if api_key:
-                    return ImageProcessor.remove_background_api(image, api_key, progress_callback)
-                else:
-                    print("未设置API密钥，回退到rembg方法")
-                    return ImageProcessor.remove_background_rembg(image, progress_callback)
-            elif method == "grabcut":
-                return ImageProcessor.remove_background_grabcut(image, progress_callback)
-            else:
-                # 默认使用rembg
-                return ImageProcessor.remove_background_rembg(image, progress_callback)
+            check_cancelled(cancel_token)
+            alpha = ImageProcessor.remove_background_mask(
+                input_image, progress_callback, method, model_name, proxy_size, cancel_token, api_key, use_cache)
+        except OperationCancelled:
+            # 取消或超时不再回退到其他方法
+            raise
         except Exception as e:
             print(f"背景去除失败: {str(e)}")
             # 如果首选方法失败，尝试GrabCut
+            alpha = None
             if method != "grabcut":
                 print(f"尝试使用GrabCut方法")
                 try:
-                    return ImageProcessor.remove_background_grabcut(image, progress_callback)
+                    alpha = ImageProcessor.remove_background_mask(
+                        input_image, progress_callback, "grabcut", cancel_token=cancel_token, use_cache=use_cache)
+                except OperationCancelled:
+                    raise
                 except Exception as e2:
                     print(f"GrabCut方法也失败: {str(e2)}")
             
-            # 所有方法都失败，返回原图
-            update_progress(100)
-            return image.copy()
+            if alpha is None:
+                # 所有方法都失败，保留原图
+                update_progress(100)
+                return AlphaMask.from_image(input_image)
+        
+        return AlphaMask(np.asarray(input_image), alpha)
+
+    @staticmethod
+    def remove_background_mask(image, progress_callback=None, method="rembg", model_name=DEFAULT_MODEL, proxy_size=None,
+                               cancel_token=None, api_key=None, use_cache=True):
+        """计算前景透明度蒙版（与原图同尺寸的uint8数组，255为前景）
+        
+        参数同segment_background；蒙版按像素内容和参数缓存在磁盘上，
+        与背景颜色无关，换背景色时可以直接复用。
+        """
+        def update_progress(value):
+            if progress_callback:
+                progress_callback(value)
+            elif hasattr(bg_signals, 'progress'):
+                bg_signals.progress.emit(value)
+        
+        image = image.convert("RGB")
+        
+        # 确定实际使用的方法和影响结果的参数
+        if method == "api":
+            api_key = api_key or ImageProcessor.get_api_key()
+            if not api_key:
+                print("未设置API密钥，回退到rembg方法")
+                method = "rembg"
+        if method not in ("rembg", "api", "grabcut"):
+            # 默认使用rembg
+            method = "rembg"
+        
+        if method == "rembg":
+            params = {"model": session_pool.resolve_model_name(model_name), "proxy_size": proxy_size}
+            compute = lambda: ImageProcessor._rembg_alpha(image, model_name, proxy_size, update_progress, cancel_token)
+        elif method == "api":
+            params = {}
+            compute = lambda: ImageProcessor._api_alpha(image, api_key, update_progress, cancel_token)
+        else:
+            params = {}
+            compute = lambda: ImageProcessor._grabcut_alpha(image, update_progress, cancel_token)
+        
+        key = None
+        if use_cache and mask_cache.enabled:
+            with profiler.span("cache_lookup"):
+                key = mask_cache.make_key(image, method, **params)
+                alpha = mask_cache.get(key)
+            if alpha is not None and alpha.shape == (image.height, image.width):
+                update_progress(100)
+                return alpha
+        
+        with profiler.span("segment", method=method):
+            alpha = compute()
+        check_cancelled(cancel_token)
+        
+        if key is not None:
+            with profiler.span("cache_store"):
+                mask_cache.put(key, alpha)
+        return alpha
 
     @staticmethod
-    def remove_background_rembg(image, progress_callback=None):
+    def remove_background_rembg(image, progress_callback=None, model_name=DEFAULT_MODEL, proxy_size=None,
+                                cancel_token=None):
         """
         使用rembg库去除背景 - 简单高效的方法
         
         参数:
         image -- PIL Image对象
         progress_callback -- 进度回调函数
+        model_name -- rembg模型名称，会话从全局会话池中获取
+        proxy_size -- 设置后先在长边为proxy_size的缩小图上分割，
+                      再用导向滤波把蒙版放大到原图尺寸，适合大尺寸照片
+        cancel_token -- 取消令牌（模型推理本身无法中断，在推理前后检查）
         
         返回:
         去除背景后的PIL Image对象
         """
-        # 更新进度回调的辅助函数
         def update_progress(value):
             if progress_callback:
                 progress_callback(value)
@@ -143,20 +259,11 @@ class ImageProcessor:
             
             # 转换为RGB模式确保兼容性
             input_image = image.convert("RGB")
+            alpha = ImageProcessor._rembg_alpha(input_image, model_name, proxy_size, update_progress, cancel_token)
+            check_cancelled(cancel_token)
             
-            update_progress(30)
-            
-            # 使用rembg移除背景
-            output_image = rembg.remove(input_image)
-            
-            update_progress(80)
-            
-            # 创建白色背景
-            white_bg = Image.new("RGBA", output_image.size, (255, 255, 255, 255))
-            
-            # 将透明背景图像叠加到白色背景上
-            result_image = Image.alpha_composite(white_bg.convert("RGBA"), output_image.convert("RGBA"))
-            result_image = result_image.convert("RGB")
+            # 与白色背景合成
+            result_image = AlphaMask(np.asarray(input_image), alpha).composite()
             
             update_progress(100)
             
@@ -167,9 +274,40 @@ class ImageProcessor:
             raise e
 
     @staticmethod
-    def remove_background_grabcut(image, progress_callback=None):
-        """使用GrabCut算法去除背景"""
-        # 更新进度回调的辅助函数
+    def _rembg_alpha(input_image, model_name, proxy_size, update_progress, cancel_token=None):
+        """用rembg计算RGB图像的透明度蒙版"""
+        # 从会话池获取已加载的模型，避免每次重新初始化
+        session = session_pool.get_session(model_name)
+        # rembg依赖onnxruntime、numba等，导入需要1秒以上，只在第一次使用时导入
+        from rembg import remove
+        
+        update_progress(30)
+        check_cancelled(cancel_token)
+        
+        if not proxy_size:
+            # 按原分辨率只输出蒙版
+            mask = remove(input_image, session=session, only_mask=True)
+            update_progress(80)
+            return np.asarray(mask.convert("L"))
+        
+        # 在缩小的代理图上分割，只对单通道蒙版做全分辨率上采样
+        proxy_image, _ = downscale_to_proxy(input_image, proxy_size)
+        proxy_mask = remove(proxy_image, session=session, only_mask=True)
+        
+        update_progress(60)
+        check_cancelled(cancel_token)
+        
+        # 以原图灰度为导向图，边缘保持地放大蒙版
+        with profiler.span("resize"):
+            guide = cv2.cvtColor(np.asarray(input_image), cv2.COLOR_RGB2GRAY)
+            alpha = guided_upsample_mask(np.asarray(proxy_mask.convert("L")), guide)
+        
+        update_progress(80)
+        return alpha
+
+    @staticmethod
+    def remove_background_grabcut(image, progress_callback=None, cancel_token=None):
+        """使用GrabCut算法去除背景（每次迭代之间检查取消令牌和30秒超时）"""
         def update_progress(value):
             if progress_callback:
                 progress_callback(value)
@@ -177,73 +315,11 @@ class ImageProcessor:
                 bg_signals.progress.emit(value)
         
         try:
-            # 设置超时时间（秒）
-            timeout = 30
-            start_time = time.time()
-            
-            update_progress(10)
-            
-            # 先缩小图像以加快处理速度
-            max_dimension = 1000
-            width, height = image.size
-            scale_factor = 1.0
-            
-            if max(width, height) > max_dimension:
-                scale_factor = max_dimension / max(width, height)
-                new_size = (int(width * scale_factor), int(height * scale_factor))
-                small_image = image.resize(new_size, Image.LANCZOS)
-            else:
-                small_image = image.copy()
-            
-            update_progress(20)
-            
-            # 转换为OpenCV格式
-            cv_image = np.array(small_image)
-            cv_image = cv2.cvtColor(cv_image, cv2.COLOR_RGB2BGR)
-            
-            update_progress(30)
-            
-            # 创建掩码和模型
-            mask = np.zeros(cv_image.shape[:2], np.uint8)
-            bgdModel = np.zeros((1, 65), np.float64)
-            fgdModel = np.zeros((1, 65), np.float64)
-            
-            # 定义前景矩形 - 适当扩大范围
-            height, width = cv_image.shape[:2]
-            rect = (int(width*0.05), int(height*0.05), int(width*0.9), int(height*0.9))
-            
-            update_progress(40)
-            
-            # 检查超时
-            if time.time() - start_time > timeout:
-                raise TimeoutError("背景去除操作超时")
-            
-            # 应用GrabCut，减少迭代次数提高速度
-            cv2.grabCut(cv_image, mask, rect, bgdModel, fgdModel, 3, cv2.GC_INIT_WITH_RECT)
-            
-            update_progress(70)
-            
-            # 创建二值掩码
-            mask2 = np.where((mask == 2) | (mask == 0), 0, 1).astype('uint8')
-            
-            # 应用掩码
-            result = cv_image * mask2[:, :, np.newaxis]
-            
-            update_progress(80)
-            
-            # 创建白色背景
-            white_bg = np.ones_like(cv_image, dtype=np.uint8) * 255
-            result = cv2.bitwise_or(white_bg, white_bg, mask=1-mask2) + result
-            
-            update_progress(90)
-            
-            # 转换回PIL格式并恢复原始大小
-            result_rgb = cv2.cvtColor(result, cv2.COLOR_BGR2RGB)
-            result_image = Image.fromarray(result_rgb)
+            input_image = image.convert("RGB")
+            alpha = ImageProcessor._grabcut_alpha(input_image, update_progress, cancel_token)
             
-            # 如果之前进行了缩放，现在恢复到原始大小
-            if scale_factor < 1.0:
-                result_image = result_image.resize(image.size, Image.LANCZOS)
+            # 在原分辨率上与白色背景合成
+            result_image = AlphaMask(np.asarray(input_image), alpha).composite()
             
             update_progress(100)
             
@@ -257,9 +333,78 @@ class ImageProcessor:
             raise e
 
     @staticmethod
-    def remove_background_api(image, api_key, progress_callback=None):
-        """使用Remove.bg API移除背景"""
-        # 更新进度回调的辅助函数
+    def _is_flat(image):
+        """RGB图像的每个通道是否都只有一个值"""
+        return all(low == high for low, high in image.getextrema())
+
+    @staticmethod
+    def _grabcut_alpha(image, update_progress, cancel_token=None):
+        """用GrabCut计算RGB图像的二值透明度蒙版（在缩小图上分割，再放大到原图尺寸）"""
+        # 调用方提供取消令牌时只使用它的截止时间；否则与原来一样只在开始分割前检查30秒的超时
+        start_check = cancel_token if cancel_token is not None else CancelToken(timeout=30)
+        
+        update_progress(10)
+        
+        # 先缩小图像以加快处理速度
+        max_dimension = 1000
+        width, height = image.size
+        scale_factor = 1.0
+        
+        if max(width, height) > max_dimension:
+            scale_factor = max_dimension / max(width, height)
+            new_size = (int(width * scale_factor), int(height * scale_factor))
+            with profiler.span("resize"):
+                small_image = image.resize(new_size, Image.LANCZOS)
+        else:
+            small_image = image
+        
+        update_progress(20)
+        
+        # 转换为OpenCV格式
+        cv_image = cv2.cvtColor(np.array(small_image), cv2.COLOR_RGB2BGR)
+
+        # 纯色图像没有可分割的前景，GrabCut在这种输入上会长时间卡在原生代码中
+        if ImageProcessor._is_flat(small_image):
+            raise ValueError("图像是纯色的，无法分割前景")
+
+        update_progress(30)
+
+        # 创建掩码和模型
+        mask = np.zeros(cv_image.shape[:2], np.uint8)
+        bgdModel = np.zeros((1, 65), np.float64)
+        fgdModel = np.zeros((1, 65), np.float64)
+        
+        # 定义前景矩形 - 适当扩大范围
+        small_height, small_width = cv_image.shape[:2]
+        rect = (int(small_width*0.05), int(small_height*0.05), int(small_width*0.9), int(small_height*0.9))
+        
+        update_progress(40)
+        
+        # 应用GrabCut，减少迭代次数提高速度；逐次迭代以便及时响应调用方的取消
+        start_check.check()
+        cv2.grabCut(cv_image, mask, rect, bgdModel, fgdModel, 1, cv2.GC_INIT_WITH_RECT)
+        for iteration in range(2):
+            update_progress(50 + iteration * 10)
+            check_cancelled(cancel_token)
+            cv2.grabCut(cv_image, mask, None, bgdModel, fgdModel, 1, cv2.GC_EVAL)
+        
+        update_progress(70)
+        check_cancelled(cancel_token)
+        
+        # 前景（确定和可能）为255，背景为0
+        alpha = np.where((mask == cv2.GC_BGD) | (mask == cv2.GC_PR_BGD), 0, 255).astype(np.uint8)
+        
+        # 如果之前进行了缩放，把蒙版放大到原始大小
+        if scale_factor < 1.0:
+            with profiler.span("resize"):
+                alpha = cv2.resize(alpha, (width, height), interpolation=cv2.INTER_LINEAR)
+        
+        update_progress(90)
+        return alpha
+
+    @staticmethod
+    def remove_background_api(image, api_key, progress_callback=None, cancel_token=None):
+        """使用Remove.bg API移除背景，返回与白色背景合成后的RGB图像"""
         def update_progress(value):
             if progress_callback:
                 progress_callback(value)
@@ -267,45 +412,51 @@ class ImageProcessor:
                 bg_signals.progress.emit(value)
         
         try:
-            import requests
-            import io
-            
-            update_progress(20)
-            
-            # 将图像转换为字节
-            img_byte_arr = io.BytesIO()
-            image.save(img_byte_arr, format='PNG')
-            img_byte_arr = img_byte_arr.getvalue()
-            
-            update_progress(40)
-            
-            # 发送到Remove.bg API
-            response = requests.post(
-                'https://api.remove.bg/v1.0/removebg',
-                files={'image_file': img_byte_arr},
-                data={'size': 'auto'},
-                headers={'X-Api-Key': api_key},
-            )
+            input_image = image.convert("RGB")
+            alpha = ImageProcessor._api_alpha(input_image, api_key, update_progress, cancel_token)
+            result_image = AlphaMask(np.asarray(input_image), alpha).composite()
             
-            update_progress(70)
+            update_progress(100)
             
-            if response.status_code == requests.codes.ok:
-                update_progress(90)
-                
-                # 从响应创建图像
-                result_image = Image.open(io.BytesIO(response.content))
-                
-                update_progress(100)
-                
-                return result_image
-            else:
-                print(f"API错误: {response.status_code} {response.text}")
-                raise Exception(f"API错误: {response.status_code}")
+            return result_image
                 
         except Exception as e:
             print(f"API背景去除出错: {str(e)}")
             raise e
 
+    @staticmethod
+    def _api_alpha(image, api_key, update_progress, cancel_token=None):
+        """用Remove.bg API计算透明度蒙版
+        
+        请求通过全局removebg_client发送：复用连接，带连接/读取超时，
+        429和5xx时按指数退避重试；响应分块下载，每块之间检查取消令牌。
+        """
+        import io
+        
+        update_progress(20)
+        
+        # 将图像转换为字节
+        img_byte_arr = io.BytesIO()
+        image.save(img_byte_arr, format='PNG')
+        img_byte_arr = img_byte_arr.getvalue()
+        
+        update_progress(40)
+        check_cancelled(cancel_token)
+        
+        # 发送到Remove.bg API
+        content = removebg_client.remove_background(img_byte_arr, api_key, cancel_token=cancel_token)
+        
+        update_progress(90)
+        
+        # 取结果的透明通道作为蒙版，尺寸不同时（如按账户额度缩小）放大到原图尺寸
+        result_image = Image.open(io.BytesIO(content))
+        if "A" not in result_image.getbands():
+            return np.full((image.height, image.width), 255, np.uint8)
+        alpha = np.asarray(result_image.getchannel("A"))
+        if result_image.size != image.size:
+            alpha = cv2.resize(alpha, image.size, interpolation=cv2.INTER_LINEAR)
+        return alpha
+
     @staticmethod
     def get_api_key():
         """获取存储的API密钥"""
@@ -321,14 +472,15 @@ class ImageProcessor:
         return None
 
     @staticmethod
-    def auto_crop_id_photo(image, progress_callback=None):
+    def auto_crop_id_photo(image, progress_callback=None, cancel_token=None):
         """自动裁剪证件照"""
         # 报告进度
         if progress_callback:
             progress_callback(10, "准备人脸检测...")
             
         # 转换为OpenCV格式
-        cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        with profiler.span("convert"):
+            cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
         
         # 加载人脸检测器
         if progress_callback:
@@ -341,9 +493,11 @@ class ImageProcessor:
         # 检测人脸
         if progress_callback:
             progress_callback(30, "检测人脸中...")
+        check_cancelled(cancel_token)
             
-        gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+        with profiler.span("detect"):
+            gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
+            faces = detect_faces(face_cascade, gray)
         
         if len(faces) == 0:
             if progress_callback:
@@ -353,77 +507,186 @@ class ImageProcessor:
         # 获取人脸区域
         if progress_callback:
             progress_callback(50, "计算裁剪区域...")
+        check_cancelled(cancel_token)
             
-        x, y, w, h = faces[0]
-        
-        # 计算证件照尺寸（390×567像素）
+        # 证件照尺寸（390×567像素）
         target_width = 390
         target_height = 567
         
-        # 计算缩放比例
-        face_height = h
-        required_face_height = int(target_height * 0.635)  # 63.5%为理想人脸高度比例
-        scale = required_face_height / face_height
+        new_width, new_height, crop_x, crop_y = ImageProcessor._auto_crop_window(
+            cv_image.shape[1], cv_image.shape[0], faces[0], target_width, target_height)
         
-        # 缩放图像
+        # 只对裁剪窗口缩放，不缩放整张图像
         if progress_callback:
-            progress_callback(70, "缩放图像...")
+            progress_callback(70, "缩放并裁剪图像...")
             
-        new_width = int(cv_image.shape[1] * scale)
-        new_height = int(cv_image.shape[0] * scale)
-        resized = cv2.resize(cv_image, (new_width, new_height))
+        with profiler.span("crop"):
+            cropped = ImageProcessor._resample_window(
+                cv_image, (cv_image.shape[1], cv_image.shape[0]), (new_width, new_height),
+                crop_x, crop_y, min(target_width, new_width - crop_x), min(target_height, new_height - crop_y))
         
-        # 计算裁剪区域
+        # 转换回PIL格式
+        if progress_callback:
+            progress_callback(100, "完成")
+            
+        return Image.fromarray(cv2.cvtColor(cropped, cv2.COLOR_BGR2RGB))
+
+    @staticmethod
+    def _auto_crop_window(image_width, image_height, face, target_width=390, target_height=567):
+        """根据检测到的人脸矩形计算自动裁剪的缩放尺寸和裁剪位置
+        
+        返回:
+            (new_width, new_height, crop_x, crop_y)，裁剪坐标位于缩放后的图像中
+        """
+        x, y, w, h = face
+        
+        # 计算缩放比例
+        required_face_height = int(target_height * 0.635)  # 63.5%为理想人脸高度比例
+        scale = required_face_height / h
+        
+        new_width = int(image_width * scale)
+        new_height = int(image_height * scale)
+        
+        # 计算缩放后的人脸区域
         face_x = int(x * scale)
         face_y = int(y * scale)
         face_w = int(w * scale)
-        face_h = int(h * scale)
         
         # 计算最终裁剪坐标
         crop_x = face_x + face_w//2 - target_width//2
         crop_y = face_y - int(target_height * 0.08)  # 头顶到照片顶部的距离约8%
         
         # 确保裁剪区域在图像范围内
-        crop_x = max(0, min(crop_x, resized.shape[1] - target_width))
-        crop_y = max(0, min(crop_y, resized.shape[0] - target_height))
+        crop_x = max(0, min(crop_x, new_width - target_width))
+        crop_y = max(0, min(crop_y, new_height - target_height))
+        
+        return new_width, new_height, crop_x, crop_y
+
+    @staticmethod
+    def _resample_window(cv_image, image_size, new_size, crop_x, crop_y, out_width, out_height, offset=(0, 0)):
+        """只对裁剪窗口重采样，结果与先整体cv2.resize再切片一致
+        
+        参数:
+            cv_image: 源图像（可以是原图的一部分）
+            image_size: 原图尺寸 (宽, 高)
+            new_size: 整体缩放后的尺寸 (宽, 高)
+            crop_x, crop_y: 裁剪窗口在缩放后图像中的左上角
+            out_width, out_height: 输出尺寸
+            offset: cv_image左上角在原图中的位置
+        """
+        scale_x = image_size[0] / new_size[0]
+        scale_y = image_size[1] / new_size[1]
+        
+        # 输出像素(u, v)对应源图坐标，与cv2.resize的像素中心对齐方式相同
+        matrix = np.float32([
+            [scale_x, 0, (crop_x + 0.5) * scale_x - 0.5 - offset[0]],
+            [0, scale_y, (crop_y + 0.5) * scale_y - 0.5 - offset[1]],
+        ])
+        return cv2.warpAffine(cv_image, matrix, (out_width, out_height),
+                              flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+                              borderMode=cv2.BORDER_REPLICATE)
+
+    @staticmethod
+    def remove_background_and_crop(image, progress_callback=None, method="rembg", model_name=DEFAULT_MODEL, margin=0.15,
+                                   cancel_token=None, bg_color=(255, 255, 255), proxy_size=None):
+        """先检测人脸再去除背景的证件照流程
+        
+        先计算出与auto_crop_id_photo相同的裁剪窗口，只对窗口（加上边距）内的像素
+        去除背景，避免为最终会被裁掉的区域运行分割模型。
+        
+        参数:
+            image: PIL Image对象
+            progress_callback: 进度回调函数
+            method: 背景去除方法，同remove_background
+            model_name: rembg模型名称
+            margin: 去除背景时在裁剪窗口四周额外保留的比例，为分割提供上下文
+            cancel_token: 取消令牌
+            bg_color: 背景颜色，同remove_background
+            proxy_size: 对窗口区域分割时的代理长边，同remove_background
+        
+        返回:
+            390×567的证件照PIL Image对象，未检测到人脸时返回None
+        """
+        if progress_callback:
+            progress_callback(10, "检测人脸中...")
+        
+        face_cascade = ImageProcessor._load_face_cascade(progress_callback)
+        if face_cascade is None:
+            return None
+        
+        with profiler.span("convert"):
+            image = image.convert("RGB")
+            gray = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2GRAY)
+        with profiler.span("detect"):
+            faces = detect_faces(face_cascade, gray)
+        
+        if len(faces) == 0:
+            if progress_callback:
+                progress_callback(100, "未检测到人脸")
+            return None
+        
+        if progress_callback:
+            progress_callback(20, "计算裁剪区域...")
+        
+        target_width = 390
+        target_height = 567
+        image_width, image_height = image.size
+        
+        new_width, new_height, crop_x, crop_y = ImageProcessor._auto_crop_window(
+            image_width, image_height, faces[0], target_width, target_height)
+        out_width = min(target_width, new_width - crop_x)
+        out_height = min(target_height, new_height - crop_y)
+        
+        # 裁剪窗口在原图中的位置，并加上边距
+        scale_x = image_width / new_width
+        scale_y = image_height / new_height
+        left = crop_x * scale_x
+        top = crop_y * scale_y
+        right = (crop_x + out_width) * scale_x
+        bottom = (crop_y + out_height) * scale_y
+        pad_x = (right - left) * margin
+        pad_y = (bottom - top) * margin
+        
+        box = (
+            max(0, int(left - pad_x)),
+            max(0, int(top - pad_y)),
+            min(image_width, int(np.ceil(right + pad_x)) + 1),
+            min(image_height, int(np.ceil(bottom + pad_y)) + 1),
+        )
+        
+        # 只对窗口区域去除背景
+        def region_progress(value, text=None):
+            if progress_callback:
+                progress_callback(20 + int(value * 0.6), text or "去除背景中...")
+        
+        check_cancelled(cancel_token)
+        region = ImageProcessor.remove_background(
+            image.crop(box), progress_callback=region_progress, method=method, model_name=model_name,
+            proxy_size=proxy_size, cancel_token=cancel_token, bg_color=bg_color)
         
-        # 裁剪图像
         if progress_callback:
             progress_callback(90, "裁剪图像...")
-            
-        cropped = resized[crop_y:crop_y+target_height, crop_x:crop_x+target_width]
         
-        # 转换回PIL格式
+        with profiler.span("crop"):
+            region_rgb = np.asarray(region.convert("RGB"))
+            cropped = ImageProcessor._resample_window(
+                region_rgb, (image_width, image_height), (new_width, new_height),
+                crop_x, crop_y, out_width, out_height, offset=box[:2])
+        
         if progress_callback:
             progress_callback(100, "完成")
-            
-        return Image.fromarray(cv2.cvtColor(cropped, cv2.COLOR_BGR2RGB))
+        
+        return Image.fromarray(cropped)
 
     @staticmethod
-    def create_print_layout(photo, progress_callback=None):
+    def create_print_layout(photo, progress_callback=None, cancel_token=None):
         """创建证件照打印排版"""
         # 如果有进度回调，初始化进度
         if progress_callback:
             progress_callback(10, "准备打印排版...")
         
-        # 创建4x6英寸（1200x1800像素，300dpi）的白色背景
-        layout = Image.new('RGB', (1200, 1800), 'white')
-        
-        # 计算间距
-        margin_x = (1200 - 390 * 3) // 4
-        margin_y = (1800 - 567 * 3) // 4
-        
-        # 粘贴9张照片
-        total_photos = 9
-        for idx, (row, col) in enumerate([(r, c) for r in range(3) for c in range(3)]):
-            x = margin_x + col * (390 + margin_x)
-            y = margin_y + row * (567 + margin_y)
-            layout.paste(photo, (x, y))
-            
-            # 更新进度
-            if progress_callback:
-                progress = 20 + int(70 * (idx + 1) / total_photos)
-                progress_callback(progress, f"排版中... {idx+1}/{total_photos}")
+        sheet = ImageProcessor.print_sheet(photo)
+        layout = sheet.render(progress_callback, cancel_token)
         
         # 完成进度
         if progress_callback:
@@ -432,15 +695,36 @@ class ImageProcessor:
         return layout
 
     @staticmethod
-    def manual_crop_id_photo(image, face_position, face_size, progress_callback=None, target_width=390, target_height=567):
+    def print_sheet(photo, cancel_token=None):
+        """标准排版页面：4x6英寸（1200x1800像素，300dpi）上排3x3张照片"""
+        sheet = PrintSheet(1200, 1800, dpi=300)
+        tile = sheet.add_tile("photo", tile_cache.get(photo))
+        
+        # 计算间距
+        margin_x = (1200 - 390 * 3) // 4
+        margin_y = (1800 - 567 * 3) // 4
+        
+        # 放置9张照片
+        for row in range(3):
+            for col in range(3):
+                x = margin_x + col * (390 + margin_x)
+                y = margin_y + row * (567 + margin_y)
+                sheet.place(tile, x, y)
+        
+        return sheet
+
+    @staticmethod
+    def manual_crop_id_photo(image, face_position, face_size, progress_callback=None, target_width=390, target_height=567,
+                             cancel_token=None):
         """手动调整裁剪证件照"""
         try:
             # 初始化进度
             if progress_callback:
                 progress_callback(10, "准备处理图像...")
                 
-            # 转换为OpenCV格式
-            cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+            # 直接在RGB数组上处理，只有裁剪窗口会被重采样
+            with profiler.span("convert"):
+                cv_image = np.asarray(image.convert("RGB"))
             
             # 从人脸位置和大小计算裁剪区域
             face_x, face_y = face_position
@@ -455,13 +739,9 @@ class ImageProcessor:
             # 计算缩放比例
             scale = required_face_height / face_h
             
-            # 缩放图像
-            if progress_callback:
-                progress_callback(50, "缩放图像...")
-                
+            # 缩放后的图像尺寸（只用于计算坐标，不实际缩放整张图像）
             new_width = int(cv_image.shape[1] * scale)
             new_height = int(cv_image.shape[0] * scale)
-            resized = cv2.resize(cv_image, (new_width, new_height))
             
             # 调整人脸位置坐标
             scaled_face_x = int(face_x * scale)
@@ -473,21 +753,27 @@ class ImageProcessor:
             crop_y = scaled_face_y - int(target_height * 0.45)  # 人脸中心Y位置约为照片高度的45%处
             
             # 确保裁剪区域在图像范围内
-            crop_x = max(0, min(crop_x, resized.shape[1] - target_width))
-            crop_y = max(0, min(crop_y, resized.shape[0] - target_height))
+            crop_x = max(0, min(crop_x, new_width - target_width))
+            crop_y = max(0, min(crop_y, new_height - target_height))
             
-            # 裁剪图像
+            # 只对裁剪窗口缩放
             if progress_callback:
-                progress_callback(80, "裁剪图像...")
+                progress_callback(80, "缩放并裁剪图像...")
+            check_cancelled(cancel_token)
                 
-            cropped = resized[crop_y:crop_y+target_height, crop_x:crop_x+target_width]
+            with profiler.span("crop"):
+                cropped = ImageProcessor._resample_window(
+                    cv_image, (cv_image.shape[1], cv_image.shape[0]), (new_width, new_height),
+                    crop_x, crop_y, min(target_width, new_width - crop_x), min(target_height, new_height - crop_y))
             
             # 转换回PIL格式
             if progress_callback:
                 progress_callback(100, "裁剪完成")
                 
-            return Image.fromarray(cv2.cvtColor(cropped, cv2.COLOR_BGR2RGB))
+            return Image.fromarray(cropped)
             
+        except OperationCancelled:
+            raise
         except Exception as e:
             print(f"手动裁剪出错: {str(e)}")
             if progress_callback:
@@ -495,11 +781,14 @@ class ImageProcessor:
             return None
 
     @staticmethod
-    def detect_face(image):
+    def detect_face(image, cancel_token=None):
         """检测图像中的人脸并返回位置和大小"""
         try:
+            check_cancelled(cancel_token)
+            
             # 转换为OpenCV格式
-            cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+            with profiler.span("convert"):
+                cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
             
             # 加载人脸检测器
             face_cascade = ImageProcessor._load_face_cascade()
@@ -507,8 +796,9 @@ class ImageProcessor:
                 return None
             
             # 检测人脸
-            gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
-            faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+            with profiler.span("detect"):
+                gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
+                faces = detect_faces(face_cascade, gray)
             
             if len(faces) == 0:
                 return None
@@ -523,10 +813,74 @@ class ImageProcessor:
             # 返回人脸中心位置和大小
             return ((face_center_x, face_center_y), (w, h))
             
+        except OperationCancelled:
+            raise
         except Exception as e:
             print(f"人脸检测出错: {str(e)}")
             return None
 
+    @staticmethod
+    def face_overlay_geometry(image_size, face_position, face_size, inner_scale=0.9, outer_scale=1.1):
+        """计算人脸调整界面的裁剪框、椭圆和距离（毫米）
+        
+        参数:
+            image_size: 图像尺寸 (宽, 高)
+            face_position: 人脸中心 (x, y)
+            face_size: 人脸大小 (宽, 高)
+            inner_scale, outer_scale: 内外椭圆相对人脸大小的比例
+        
+        返回:
+            字典，包含以下键:
+                - crop: 裁剪框 (x, y, 宽, 高)
+                - center: 椭圆中心 (x, y)
+                - inner_axes / outer_axes: 内外椭圆半轴长
+                - inner_distances / outer_distances: 椭圆到裁剪框上、下、左、右边缘的距离（毫米）
+        """
+        img_width, img_height = image_size
+        center_x, center_y = face_position
+        width, height = face_size
+        
+        # 证件照标准尺寸（33mm×48mm，像素尺寸为390×567）
+        target_width_px = 390
+        target_height_px = 567
+        
+        # 计算缩放比例（基于人脸大小）
+        required_face_height = int(target_height_px * 0.635)  # 人脸应占照片高度的63.5%
+        scale = required_face_height / height
+        
+        # 计算实际裁剪框大小
+        crop_width = int(target_width_px / scale)
+        crop_height = int(target_height_px / scale)
+        
+        # 计算裁剪框位置（使人脸位于照片高度的45%处）
+        crop_y = int(center_y - crop_height * 0.45)  # 人脸中心在照片45%的位置
+        crop_x = int(center_x - crop_width / 2)      # 人脸水平居中
+        
+        # 确保裁剪框在图像范围内
+        crop_x = max(0, min(crop_x, img_width - crop_width))
+        crop_y = max(0, min(crop_y, img_height - crop_height))
+        
+        center = (int(center_x), int(center_y))
+        inner_axes = (int(width * inner_scale * 0.5), int(height * inner_scale * 0.6))
+        outer_axes = (int(width * outer_scale * 0.5), int(height * outer_scale * 0.6))
+        
+        # 计算椭圆边缘到裁剪框的距离
+        def calculate_distance(axes):
+            top = center[1] - axes[1] - crop_y
+            bottom = crop_y + crop_height - (center[1] + axes[1])
+            left = center[0] - axes[0] - crop_x
+            right = crop_x + crop_width - (center[0] + axes[0])
+            return [d * (33/390) / scale for d in [top, bottom, left, right]]  # 转换为毫米
+        
+        return {
+            'crop': (crop_x, crop_y, crop_width, crop_height),
+            'center': center,
+            'inner_axes': inner_axes,
+            'outer_axes': outer_axes,
+            'inner_distances': calculate_distance(inner_axes),
+            'outer_distances': calculate_distance(outer_axes),
+        }
+
     @staticmethod
     def draw_face_ellipses(image, face_position, face_size, inner_scale=0.9, outer_scale=1.1, show_distances=True):
         """在图像上绘制椭圆用于调整人脸位置"""
@@ -534,32 +888,12 @@ class ImageProcessor:
             # 转换为OpenCV格式
             cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
             
-            # 获取人脸中心和大小
-            center_x, center_y = face_position
-            width, height = face_size
-            
             # 获取图像大小
             img_height, img_width = cv_image.shape[:2]
             
-            # 证件照标准尺寸（33mm×48mm，像素尺寸为390×567）
-            target_width_px = 390
-            target_height_px = 567
-            
-            # 计算缩放比例（基于人脸大小）
-            required_face_height = int(target_height_px * 0.635)  # 人脸应占照片高度的63.5%
-            scale = required_face_height / height
-            
-            # 计算实际裁剪框大小
-            crop_width = int(target_width_px / scale)
-            crop_height = int(target_height_px / scale)
-            
-            # 计算裁剪框位置（使人脸位于照片高度的45%处）
-            crop_y = int(center_y - crop_height * 0.45)  # 人脸中心在照片45%的位置
-            crop_x = int(center_x - crop_width / 2)      # 人脸水平居中
-            
-            # 确保裁剪框在图像范围内
-            crop_x = max(0, min(crop_x, img_width - crop_width))
-            crop_y = max(0, min(crop_y, img_height - crop_height))
+            geometry = ImageProcessor.face_overlay_geometry(
+                (img_width, img_height), face_position, face_size, inner_scale, outer_scale)
+            crop_x, crop_y, crop_width, crop_height = geometry['crop']
             
             # 创建一个半透明的遮罩层
             overlay = cv_image.copy()
@@ -577,9 +911,9 @@ class ImageProcessor:
                          3)  # 线宽
             
             # 绘制椭圆
-            center = (int(center_x), int(center_y))
-            inner_axes = (int(width * inner_scale * 0.5), int(height * inner_scale * 0.6))
-            outer_axes = (int(width * outer_scale * 0.5), int(height * outer_scale * 0.6))
+            center = geometry['center']
+            inner_axes = geometry['inner_axes']
+            outer_axes = geometry['outer_axes']
             
             cv2.ellipse(overlay, center, inner_axes, 0, 0, 360, (0, 255, 0), 2)  # 绿色
             cv2.ellipse(overlay, center, outer_axes, 0, 0, 360, (0, 0, 255), 2)  # 红色
@@ -602,27 +936,8 @@ class ImageProcessor:
                     cv2.rectangle(img, (bg_rect[0], bg_rect[1]), (bg_rect[2], bg_rect[3]), (255, 255, 255), -1)
                     cv2.putText(img, text, pos, font, font_scale, text_color, text_thickness)
                 
-                # 计算距离的通用函数
-                def calculate_distance(center_pos, axes, crop_pos, crop_size):
-                    top = center_pos[1] - axes[1] - crop_pos[1]
-                    bottom = crop_pos[1] + crop_size[1] - (center_pos[1] + axes[1])
-                    left = center_pos[0] - axes[0] - crop_pos[0]
-                    right = crop_pos[0] + crop_size[0] - (center_pos[0] + axes[0])
-                    return [d * (33/390) / scale for d in [top, bottom, left, right]]  # 转换为毫米
-                
-                # 计算外椭圆（红色）的距离
-                outer_distances = calculate_distance(
-                    center, outer_axes, 
-                    (crop_x, crop_y), 
-                    (crop_width, crop_height)
-                )
-                
-                # 计算内椭圆（绿色）的距离
-                inner_distances = calculate_distance(
-                    center, inner_axes, 
-                    (crop_x, crop_y), 
-                    (crop_width, crop_height)
-                )
+                outer_distances = geometry['outer_distances']
+                inner_distances = geometry['inner_distances']
                 
                 # 绘制距离标签
                 # 上边缘
@@ -699,7 +1014,7 @@ class ImageProcessor:
             return image.copy() 
 
     @staticmethod
-    def create_custom_print_layout(photo, params, progress_callback=None):
+    def create_custom_print_layout(photo, params, progress_callback=None, cancel_token=None):
         """创建自定义证件照打印排版
         
         参数:
@@ -710,6 +1025,7 @@ class ImageProcessor:
                 - spacing: 间距（像素）
                 - dpi: 打印DPI
             progress_callback: 进度回调函数
+            cancel_token: 取消令牌
         
         返回:
             PIL.Image对象，排版后的图像
@@ -718,6 +1034,26 @@ class ImageProcessor:
         if progress_callback:
             progress_callback(10, "准备自定义排版...")
         
+        sheet = ImageProcessor.custom_print_sheet(photo, params, cancel_token)
+        
+        if progress_callback:
+            progress_callback(20, "创建排版画布...")
+        
+        layout = sheet.render(progress_callback, cancel_token)
+        
+        # 完成进度
+        if progress_callback:
+            progress_callback(100, "自定义排版完成")
+        
+        return layout
+
+    @staticmethod
+    def custom_layout(photo_size, params):
+        """计算自定义排版的位置，参数同create_custom_print_layout
+        
+        返回:
+            (页面尺寸, 照片尺寸, 每张照片左上角坐标的列表)，尺寸均为(宽, 高)像素
+        """
         # 获取参数
         rows = params.get('rows', 4)
         columns = params.get('columns', 3)
@@ -725,7 +1061,7 @@ class ImageProcessor:
         dpi = params.get('dpi', 300)
         
         # 获取照片尺寸
-        photo_width, photo_height = photo.size
+        photo_width, photo_height = photo_size
         
         # 计算排版尺寸（假设A4纸，8.27 x 11.69英寸）
         page_width = int(8.27 * dpi)
@@ -744,48 +1080,55 @@ class ImageProcessor:
             scale = min(page_width / layout_width, page_height / layout_height)
             new_photo_width = int(photo_width * scale)
             new_photo_height = int(photo_height * scale)
-            photo = photo.resize((new_photo_width, new_photo_height), Image.LANCZOS)
-            photo_width, photo_height = photo.size
+            photo_width, photo_height = new_photo_width, new_photo_height
             layout_width = columns * photo_width + (columns - 1) * h_spacing
             layout_height = rows * photo_height + (rows - 1) * v_spacing
         
-        # 创建白色背景
-        if progress_callback:
-            progress_callback(20, "创建排版画布...")
-        
         # 水平和垂直边距，使排版居中
         h_margin = (page_width - layout_width) // 2
         v_margin = (page_height - layout_height) // 2
         
-        layout = Image.new('RGB', (page_width, page_height), 'white')
+        positions = [(h_margin + col * (photo_width + h_spacing), v_margin + row * (photo_height + v_spacing))
+                     for row in range(rows) for col in range(columns)]
+        return (page_width, page_height), (photo_width, photo_height), positions
+
+    @staticmethod
+    def custom_print_sheet(photo, params, cancel_token=None):
+        """自定义排版页面：A4纸上居中排列rows行columns列照片，参数同create_custom_print_layout"""
+        (page_width, page_height), photo_size, positions = ImageProcessor.custom_layout(photo.size, params)
         
-        # 粘贴照片
-        total_photos = rows * columns
-        photo_count = 0
+        sheet = PrintSheet(page_width, page_height, dpi=params.get('dpi', 300))
+        # 缩放结果按尺寸缓存，调整行列数时只要尺寸不变就不再重新缩放
+        tile = sheet.add_tile("photo", tile_cache.get(photo, photo_size))
+        check_cancelled(cancel_token)
         
-        for row in range(rows):
-            for col in range(columns):
-                # 计算位置
-                x = h_margin + col * (photo_width + h_spacing)
-                y = v_margin + row * (photo_height + v_spacing)
-                
-                # 粘贴照片
-                layout.paste(photo, (x, y))
-                
-                # 更新计数和进度
-                photo_count += 1
-                if progress_callback:
-                    progress = 30 + int(60 * photo_count / total_photos)
-                    progress_callback(progress, f"排版中... {photo_count}/{total_photos}")
+        for x, y in positions:
+            sheet.place(tile, x, y)
         
-        # 完成进度
-        if progress_callback:
-            progress_callback(100, "自定义排版完成")
+        return sheet
+
+    @staticmethod
+    def custom_print_preview(preview_source, photo_size, params, max_width, max_height):
+        """按custom_print_sheet的排版直接渲染不超过max_width x max_height的预览图
         
-        return layout 
+        photo_size为原照片尺寸（决定排版），preview_source为已缩小的证件照：照片从小图直接缩放到预览尺寸，
+        不生成打印尺寸的照片，也不进入共享的tile_cache。
+        """
+        (page_width, page_height), (photo_width, photo_height), positions = ImageProcessor.custom_layout(
+            photo_size, params)
+        
+        scale = min(max_width / page_width, max_height / page_height, 1.0)
+        sheet = PrintSheet(max(1, round(page_width * scale)), max(1, round(page_height * scale)))
+        tile_size = (max(1, round(photo_width * scale)), max(1, round(photo_height * scale)))
+        tile = sheet.add_tile("photo", preview_source.resize(tile_size, Image.LANCZOS))
+        
+        for x, y in positions:
+            sheet.place(tile, round(x * scale), round(y * scale))
+        
+        return sheet.render()
 
     @staticmethod
-    def create_mixed_print_layout(photo, params, progress_callback=None):
+    def create_mixed_print_layout(photo, params, progress_callback=None, cancel_token=None):
         """创建混合证件照打印排版 (一寸和二寸混合)
         
         参数:
@@ -796,6 +1139,7 @@ class ImageProcessor:
                 - spacing: 间距（像素）
                 - dpi: 打印DPI
             progress_callback: 进度回调函数
+            cancel_token: 取消令牌
         
         返回:
             PIL.Image对象，排版后的图像
@@ -804,6 +1148,22 @@ class ImageProcessor:
         if progress_callback:
             progress_callback(10, "准备混合排版...")
         
+        sheet = ImageProcessor.mixed_print_sheet(photo, params, cancel_token)
+        
+        if progress_callback:
+            progress_callback(20, "创建排版画布...")
+        
+        layout = sheet.render(progress_callback, cancel_token)
+        
+        # 完成进度
+        if progress_callback:
+            progress_callback(100, "混合排版完成")
+        
+        return layout
+
+    @staticmethod
+    def mixed_print_sheet(photo, params, cancel_token=None):
+        """混合排版页面：A4纸上半部分排一寸照片，下半部分排二寸照片，参数同create_mixed_print_layout"""
         # 获取参数
         small_count = params.get('small_count', 4)  # 一寸照片数量
         large_count = params.get('large_count', 2)  # 二寸照片数量
@@ -822,84 +1182,48 @@ class ImageProcessor:
         page_width = int(210 / 25.4 * dpi)
         page_height = int(297 / 25.4 * dpi)
         
-        # 调整照片大小
-        small_photo = photo.resize((small_width, small_height), Image.LANCZOS)
-        large_photo = photo.resize((large_width, large_height), Image.LANCZOS)
+        sheet = PrintSheet(page_width, page_height, dpi=dpi)
         
-        # 创建白色背景
-        if progress_callback:
-            progress_callback(20, "创建排版画布...")
-            
-        layout = Image.new('RGB', (page_width, page_height), 'white')
+        # 调整照片大小，每种尺寸只缩放一次，并在多次排版之间缓存
+        small_tile = large_tile = None
+        if small_count > 0:
+            small_tile = sheet.add_tile("small", tile_cache.get(photo, (small_width, small_height)), (25, 35))
+            check_cancelled(cancel_token)
+        if large_count > 0:
+            large_tile = sheet.add_tile("large", tile_cache.get(photo, (large_width, large_height)), (35, 45))
+            check_cancelled(cancel_token)
         
-        # 计算布局
-        # 为简化，一寸照片在上半部分，二寸照片在下半部分
+        # 为简化，一寸照片在上半部分（最多4列），二寸照片在下半部分（最多3列）
+        ImageProcessor._place_centered_grid(
+            sheet, small_tile, small_count, 4, small_width, small_height, spacing, page_height // 4)
+        ImageProcessor._place_centered_grid(
+            sheet, large_tile, large_count, 3, large_width, large_height, spacing, page_height * 3 // 4)
         
-        # 一寸照片布局
-        sm_cols = min(4, small_count)  # 最多4列
-        sm_rows = (small_count + sm_cols - 1) // sm_cols  # 计算所需行数
-        
-        # 计算一寸照片区域总宽高
-        sm_total_width = sm_cols * small_width + (sm_cols - 1) * spacing
-        sm_total_height = sm_rows * small_height + (sm_rows - 1) * spacing
+        return sheet
+
+    @staticmethod
+    def _place_centered_grid(sheet, tile, count, max_columns, tile_width, tile_height, spacing, center_y):
+        """把count张照片排成最多max_columns列的网格，水平居中，垂直中心位于center_y"""
+        if count <= 0:
+            return
         
-        # 一寸照片起始位置（居中）
-        sm_start_x = (page_width - sm_total_width) // 2
-        sm_start_y = page_height // 4 - sm_total_height // 2  # 在页面上半部分居中
+        columns = min(max_columns, count)
+        rows = (count + columns - 1) // columns
         
-        # 粘贴一寸照片
-        small_count_pasted = 0
-        for row in range(sm_rows):
-            for col in range(sm_cols):
-                if small_count_pasted >= small_count:
-                    break
-                    
-                x = sm_start_x + col * (small_width + spacing)
-                y = sm_start_y + row * (small_height + spacing)
-                
-                layout.paste(small_photo, (x, y))
-                small_count_pasted += 1
-                
-                # 更新进度
-                if progress_callback:
-                    progress = 30 + int(30 * small_count_pasted / small_count)
-                    progress_callback(progress, f"一寸照片排版中... {small_count_pasted}/{small_count}")
-        
-        # 二寸照片布局
-        lg_cols = min(3, large_count)  # 最多3列
-        lg_rows = (large_count + lg_cols - 1) // lg_cols  # 计算所需行数
-        
-        # 计算二寸照片区域总宽高
-        lg_total_width = lg_cols * large_width + (lg_cols - 1) * spacing
-        lg_total_height = lg_rows * large_height + (lg_rows - 1) * spacing
-        
-        # 二寸照片起始位置（居中）
-        lg_start_x = (page_width - lg_total_width) // 2
-        lg_start_y = page_height * 3 // 4 - lg_total_height // 2  # 在页面下半部分居中
-        
-        # 粘贴二寸照片
-        large_count_pasted = 0
-        for row in range(lg_rows):
-            for col in range(lg_cols):
-                if large_count_pasted >= large_count:
-                    break
-                    
-                x = lg_start_x + col * (large_width + spacing)
-                y = lg_start_y + row * (large_height + spacing)
-                
-                layout.paste(large_photo, (x, y))
-                large_count_pasted += 1
-                
-                # 更新进度
-                if progress_callback:
-                    progress = 60 + int(30 * large_count_pasted / large_count)
-                    progress_callback(progress, f"二寸照片排版中... {large_count_pasted}/{large_count}")
+        # 区域总宽高
+        total_width = columns * tile_width + (columns - 1) * spacing
+        total_height = rows * tile_height + (rows - 1) * spacing
         
-        # 完成进度
-        if progress_callback:
-            progress_callback(100, "混合排版完成")
+        # 起始位置（居中）
+        start_x = (sheet.width - total_width) // 2
+        start_y = center_y - total_height // 2
         
-        return layout
+        for index in range(count):
+            row, col = divmod(index, columns)
+            sheet.place(tile, start_x + col * (tile_width + spacing), start_y + row * (tile_height + spacing))
+
+# 创建全局人脸检测器缓存
+face_cascade_registry = CascadeRegistry(ImageProcessor._create_face_cascade)
 
 # 修改处理按钮的样式，增加文字和背景的对比度
 def set_primary_button_style(button):
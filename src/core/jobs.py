@@ -0,0 +1,141 @@
+"""
+旅行证照片处理 - 后台任务
+在线程池中执行耗时的图像处理，并通过信号把进度和结果送回界面线程
+"""
+import traceback
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from src.core.cancellation import CancelToken, OperationCancelled, OperationTimeout
+
+
+class JobSignals(QObject):
+    """后台任务的信号（在界面线程中创建，跨线程发射时自动排队到界面线程）"""
+    progress = Signal(int, str)
+    result = Signal(object)
+    error = Signal(str)
+    cancelled = Signal()
+    finished = Signal()
+
+
+class ProcessingJob(QRunnable):
+    """包装一次图像处理调用的任务
+
+    func以 func(*args, progress_callback=..., cancel_token=..., **kwargs) 的形式调用，
+    progress_callback的调用会被转换为progress信号。
+    """
+
+    def __init__(self, func, *args, group=None, timeout=None, **kwargs):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.group = group
+        self.cancel_token = CancelToken(timeout)
+        self.signals = JobSignals()
+
+    def cancel(self):
+        """请求取消；排队中的任务开始时会直接结束"""
+        self.cancel_token.cancel()
+
+    def progress_callback(self, value, text=None):
+        """在工作线程中调用，通过信号转发到界面线程"""
+        self.signals.progress.emit(int(value), text or "")
+
+    def run(self):
+        try:
+            self.cancel_token.check()
+            result = self.func(*self.args, progress_callback=self.progress_callback,
+                               cancel_token=self.cancel_token, **self.kwargs)
+        except OperationTimeout as e:
+            self.signals.error.emit(str(e))
+        except OperationCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+
+class JobRunner(QObject):
+    """后台任务执行器
+
+    默认同时只执行一个任务，之后提交的任务按顺序排队，
+    这样前一位顾客的照片处理时可以继续准备下一位。
+
+    同一分组中处理同一张照片（source相同）的新任务是对它的重新处理：提交时取消较早的任务，
+    较早任务已经排队的进度、结果、错误和取消信号都会被丢弃，不会覆盖新任务的结果。
+    处理其他照片的任务不受影响，继续排队并按提交顺序送达结果。
+    """
+
+    def __init__(self, max_workers=1, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers)
+        # 保持任务引用，直到finished信号送达界面线程
+        self._active_jobs = set()
+        # 被同一照片的重新处理取代的任务
+        self._superseded_jobs = set()
+
+    def submit(self, func, *args, on_progress=None, on_result=None, on_error=None, on_cancelled=None,
+               group=None, source=None, timeout=None, **kwargs):
+        """提交任务并连接回调，回调都在界面线程中执行
+
+        group用于按选项卡分组取消任务，source为任务处理的照片对象，timeout为任务的截止时间（秒）。
+        同组中source相同的较早任务会被取消，之后不再调用它的回调。
+        """
+        job = ProcessingJob(func, *args, group=group, timeout=timeout, **kwargs)
+        job.source = source
+        job.setAutoDelete(False)
+
+        if group is not None and source is not None:
+            # 同一张照片的重新处理取代同组中较早的任务
+            for old in list(self._active_jobs):
+                if old.group == group and old.source is source:
+                    self._superseded_jobs.add(old)
+                    old.cancel()
+
+        for signal, callback in ((job.signals.progress, on_progress), (job.signals.result, on_result),
+                                 (job.signals.error, on_error), (job.signals.cancelled, on_cancelled)):
+            if callback:
+                signal.connect(self._if_current(job, callback))
+        job.signals.finished.connect(lambda: self._job_finished(job))
+
+        self._active_jobs.add(job)
+        self.pool.start(job)
+        return job
+
+    def is_current(self, job):
+        """任务是否未被同一照片的重新处理取代"""
+        return job not in self._superseded_jobs
+
+    def _if_current(self, job, callback):
+        """包装回调，被同组新任务取代后不再调用"""
+        def guarded(*args):
+            if self.is_current(job):
+                callback(*args)
+        return guarded
+
+    def _job_finished(self, job):
+        # finished在结果等信号之后送达，此时可以释放任务
+        self._active_jobs.discard(job)
+        self._superseded_jobs.discard(job)
+
+    def pending_count(self):
+        """尚未完成的任务数（包括正在执行的）"""
+        return len(self._active_jobs)
+
+    def cancel(self, group=None):
+        """取消指定分组（None表示全部）中尚未完成的任务"""
+        for job in list(self._active_jobs):
+            if group is None or job.group == group:
+                job.cancel()
+
+    def shutdown(self, wait_ms=-1):
+        """取消所有任务并等待正在执行的任务结束"""
+        self.cancel()
+        self.pool.clear()
+        return self.pool.waitForDone(wait_ms)
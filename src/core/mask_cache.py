@@ -0,0 +1,158 @@
+"""
+旅行证照片处理 - 蒙版缓存
+按照片像素内容和处理参数缓存背景去除的透明度蒙版，重复处理同一张照片时直接读取
+"""
+import hashlib
+import os
+import threading
+
+import cv2
+import numpy as np
+
+# 缓存放在项目根目录下，与启动时的工作目录无关（命令行工具可能从任意目录运行）
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_CACHE_DIR = os.path.join(PROJECT_DIR, "cache", "masks")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# 蒙版算法变化时修改版本号，使旧缓存失效
+CACHE_VERSION = 1
+
+
+class MaskCache:
+    """磁盘蒙版缓存
+
+    键为解码后像素和处理参数的哈希，与文件名、格式和元数据无关；
+    蒙版以8位PNG保存（蒙版大部分区域是纯色，压缩后通常只有几十KB）。
+    总大小超过max_bytes时按最近使用时间淘汰。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(image, method, **params):
+        """根据RGB像素和处理参数计算缓存键"""
+        pixels = np.ascontiguousarray(np.asarray(image if image.mode == "RGB" else image.convert("RGB")))
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"v{CACHE_VERSION}|{pixels.shape}|{method}".encode())
+        for name in sorted(params):
+            digest.update(f"|{name}={params[name]}".encode())
+        digest.update(pixels.data)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.png")
+
+    def get(self, key):
+        """读取蒙版，不存在时返回None；命中时更新使用时间"""
+        if not self.enabled:
+            return None
+
+        path = self._path(key)
+        mask = cv2.imread(path, cv2.IMREAD_GRAYSCALE) if os.path.exists(path) else None
+        if mask is None:
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return mask
+
+    def put(self, key, mask):
+        """保存蒙版并在超出容量时淘汰最久未使用的条目"""
+        if not self.enabled:
+            return
+
+        ok, encoded = cv2.imencode(".png", mask, [cv2.IMWRITE_PNG_COMPRESSION, 3])
+        if not ok:
+            return
+
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再替换，避免其他进程读到写了一半的文件
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(encoded.tobytes())
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"写入蒙版缓存失败: {str(e)}")
+            return
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += len(encoded) - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        """返回所有缓存文件的(最近使用时间, 大小, 路径)"""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if not name.endswith(".png"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """删除最久未使用的条目，直到总大小降到容量的90%以下"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._total_bytes = total
+
+    def size_bytes(self):
+        """缓存当前占用的磁盘空间"""
+        with self._lock:
+            self._total_bytes = self._scan_size()
+            return self._total_bytes
+
+    def clear(self):
+        """删除全部缓存"""
+        with self._lock:
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._total_bytes = 0
+
+    def stats(self):
+        """返回命中次数、未命中次数和占用空间"""
+        return {"hits": self.hits, "misses": self.misses, "size_bytes": self.size_bytes()}
+
+
+# 创建全局蒙版缓存实例
+mask_cache = MaskCache()
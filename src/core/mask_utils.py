@@ -0,0 +1,195 @@
+"""
+旅行证照片处理 - 蒙版工具
+提供蒙版的边缘保持上采样和基于NumPy的背景合成
+"""
+import cv2
+import numpy as np
+from PIL import Image
+
+from src.core.profiling import profiler
+
+# 低分辨率分割时代理图像的默认长边
+DEFAULT_PROXY_SIZE = 1024
+
+# 合成时每次处理的行数，控制临时数组的内存占用
+COMPOSITE_STRIP_ROWS = 512
+
+
+def downscale_to_proxy(image, proxy_size):
+    """将PIL图像缩小到长边不超过proxy_size，返回(缩小后的图像, 缩放比例)"""
+    width, height = image.size
+    long_side = max(width, height)
+    if long_side <= proxy_size:
+        return image, 1.0
+
+    scale = proxy_size / long_side
+    new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return image.resize(new_size, Image.BILINEAR), scale
+
+
+def _upsample_rows(coefficients, top, bottom, full_w, full_h):
+    """双线性放大低分辨率数组后第top到bottom行的结果（与cv2.resize的INTER_LINEAR一致）
+
+    双线性插值可以分离：先在低分辨率宽度上按行插值出这些行，再只横向放大到full_w。
+    """
+    small_h = coefficients[0].shape[0]
+    # 像素中心对齐的源坐标，超出边界时按边缘复制
+    src_y = np.clip((np.arange(top, bottom, dtype=np.float32) + 0.5) * (small_h / full_h) - 0.5, 0, small_h - 1)
+    y0 = np.floor(src_y).astype(np.intp)
+    y1 = np.minimum(y0 + 1, small_h - 1)
+    weight = (src_y - y0).astype(np.float32)[:, np.newaxis]
+
+    strips = []
+    for coefficient in coefficients:
+        rows = coefficient[y0] * (1.0 - weight) + coefficient[y1] * weight
+        strips.append(cv2.resize(rows, (full_w, bottom - top), interpolation=cv2.INTER_LINEAR))
+    return strips
+
+
+def guided_upsample_mask(mask, guide, radius=4, eps=1e-3):
+    """使用快速导向滤波将低分辨率蒙版上采样到原图大小
+
+    在低分辨率下计算导向滤波的线性系数a、b，只对这两个系数做双线性放大，
+    再用全分辨率灰度图作为导向图得到 q = a * I + b，使蒙版边缘贴合原图的真实边缘。
+
+    参数:
+        mask: 低分辨率单通道uint8蒙版
+        guide: 全分辨率单通道uint8导向图（通常为原图灰度）
+        radius: 低分辨率下的滤波窗口半径
+        eps: 正则化系数，越小越保持边缘
+
+    返回:
+        与guide同尺寸的uint8蒙版
+    """
+    full_h, full_w = guide.shape[:2]
+    small_h, small_w = mask.shape[:2]
+
+    if (small_h, small_w) == (full_h, full_w):
+        return mask
+
+    # 低分辨率导向图和蒙版（归一化到0-1）
+    guide_small = cv2.resize(guide, (small_w, small_h), interpolation=cv2.INTER_AREA).astype(np.float32) / 255.0
+    p = mask.astype(np.float32) / 255.0
+
+    ksize = (2 * radius + 1, 2 * radius + 1)
+    mean_i = cv2.boxFilter(guide_small, -1, ksize)
+    mean_p = cv2.boxFilter(p, -1, ksize)
+    corr_ip = cv2.boxFilter(guide_small * p, -1, ksize)
+    corr_ii = cv2.boxFilter(guide_small * guide_small, -1, ksize)
+
+    var_i = corr_ii - mean_i * mean_i
+    cov_ip = corr_ip - mean_i * mean_p
+
+    a = cov_ip / (var_i + eps)
+    b = mean_p - a * mean_i
+
+    mean_a = cv2.boxFilter(a, -1, ksize)
+    mean_b = cv2.boxFilter(b, -1, ksize)
+
+    # 只放大系数，按行分块计算全分辨率结果，每块只放大对应的几行低分辨率系数，不创建整张图的浮点数组
+    result = np.empty((full_h, full_w), dtype=np.uint8)
+    for top in range(0, full_h, COMPOSITE_STRIP_ROWS):
+        bottom = min(top + COMPOSITE_STRIP_ROWS, full_h)
+        strip_a, strip_b = _upsample_rows((mean_a, mean_b), top, bottom, full_w, full_h)
+        # q×255 = a×I + b×255，原地计算以减少临时数组
+        strip = guide[top:bottom].astype(np.float32)
+        strip *= strip_a
+        strip_b *= 255.0
+        strip += strip_b
+        strip += 0.5
+        result[top:bottom] = np.clip(strip, 0, 255, out=strip)
+
+    return result
+
+
+def composite_alpha(rgb, alpha, bg_color=(255, 255, 255)):
+    """将RGB图像按alpha蒙版合成到纯色背景上
+
+    参数:
+        rgb: HxWx3 uint8数组
+        alpha: HxW uint8蒙版（255为前景）
+        bg_color: 背景颜色(R, G, B)
+
+    返回:
+        HxWx3 uint8数组
+    """
+    height = rgb.shape[0]
+    result = np.empty_like(rgb)
+    bg = (float(bg_color[0]), float(bg_color[1]), float(bg_color[2]), 0.0)
+
+    # 按行分块，临时数组只有一个条带大小：前景×a + 背景×(255-a) 不超过65025，
+    # 在uint16中用OpenCV的向量化运算完成，最后除以255四舍五入后直接写入结果
+    for top in range(0, height, COMPOSITE_STRIP_ROWS):
+        bottom = min(top + COMPOSITE_STRIP_ROWS, height)
+        a = cv2.merge([alpha[top:bottom]] * 3)
+        blended = cv2.multiply(rgb[top:bottom], a, dtype=cv2.CV_16U)
+        blended = cv2.add(blended, cv2.multiply(cv2.bitwise_not(a), bg, dtype=cv2.CV_16U))
+        cv2.convertScaleAbs(blended, dst=result[top:bottom], alpha=1.0 / 255.0)
+
+    return result
+
+
+# 常用证件照背景颜色(R, G, B)
+BACKGROUND_COLORS = {
+    "white": (255, 255, 255),
+    "blue": (67, 142, 219),
+    "red": (255, 0, 0),
+}
+
+
+def resolve_color(color):
+    """将颜色名称（见BACKGROUND_COLORS）或(R, G, B)转换为(R, G, B)"""
+    if isinstance(color, str):
+        if color not in BACKGROUND_COLORS:
+            raise ValueError(f"不支持的背景颜色: {color}")
+        return BACKGROUND_COLORS[color]
+    return tuple(int(c) for c in color[:3])
+
+
+class AlphaMask:
+    """背景去除结果：原图像素及其透明度蒙版
+
+    与背景颜色无关，换背景色时只需用composite_alpha按条带重新合成而不必重新分割。
+    """
+
+    def __init__(self, rgb, alpha):
+        if rgb.shape[:2] != alpha.shape[:2]:
+            raise ValueError(f"蒙版尺寸{alpha.shape[:2]}与图像尺寸{rgb.shape[:2]}不一致")
+        self.rgb = rgb
+        self.alpha = alpha
+
+    @classmethod
+    def from_image(cls, image, alpha=None):
+        """从PIL图像创建；alpha为None时使用图像自身的透明通道（没有时为全前景）"""
+        if alpha is None:
+            if "A" in image.getbands():
+                alpha = np.asarray(image.getchannel("A"))
+            else:
+                alpha = np.full((image.height, image.width), 255, np.uint8)
+        return cls(np.asarray(image.convert("RGB")), alpha)
+
+    @property
+    def size(self):
+        """(宽, 高)，与PIL一致"""
+        return self.rgb.shape[1], self.rgb.shape[0]
+
+    def composite(self, bg_color=(255, 255, 255)):
+        """合成到纯色背景上，返回RGB模式的PIL图像
+
+        bg_color可以是(R, G, B)或BACKGROUND_COLORS中的名称。
+        """
+        with profiler.span("composite"):
+            return Image.fromarray(composite_alpha(self.rgb, self.alpha, resolve_color(bg_color)))
+
+    def to_rgba(self):
+        """返回带透明通道的PIL图像"""
+        return Image.fromarray(np.dstack([self.rgb, self.alpha]), "RGBA")
+
+    def mask_image(self):
+        """返回蒙版的L模式PIL图像"""
+        return Image.fromarray(self.alpha)
+
+    def crop(self, box):
+        """按(left, top, right, bottom)裁剪，返回新的AlphaMask"""
+        left, top, right, bottom = box
+        return AlphaMask(self.rgb[top:bottom, left:right], self.alpha[top:bottom, left:right])
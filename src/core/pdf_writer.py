@@ -0,0 +1,187 @@
+"""
+旅行证照片处理 - PDF导出
+把打印排版页面直接写成PDF：每种尺寸的照片只嵌入一次，每份拷贝通过变换矩阵引用，裁切线为矢量线条
+"""
+import io
+import zlib
+
+from src.core.cancellation import check_cancelled
+
+POINTS_PER_INCH = 72.0
+MM_PER_INCH = 25.4
+
+# 裁切线参数（毫米）：线长、与照片边缘的间隔、线宽（点）
+CUT_MARK_LENGTH_MM = 3.0
+CUT_MARK_OFFSET_MM = 1.0
+CUT_MARK_WIDTH_PT = 0.25
+
+
+def _mm_to_pt(mm):
+    return mm / MM_PER_INCH * POINTS_PER_INCH
+
+
+def _number(value):
+    """PDF数字格式（最多4位小数，去掉多余的0）"""
+    text = f"{value:.4f}".rstrip("0").rstrip(".")
+    return text if text not in ("", "-0") else "0"
+
+
+class PdfWriter:
+    """简单的PDF写入器，按顺序写入对象并在结尾生成交叉引用表"""
+
+    def __init__(self, f):
+        self.f = f
+        self.offsets = {}
+        self._next_id = 1
+        self.f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def reserve(self):
+        """预留一个对象编号（如页面树需要在页面之后才能写入）"""
+        object_id = self._next_id
+        self._next_id += 1
+        return object_id
+
+    def write_object(self, object_id, body, stream=None):
+        """写入对象；stream不为None时body为流字典（不含Length）"""
+        self.offsets[object_id] = self.f.tell()
+        self.f.write(f"{object_id} 0 obj\n".encode())
+        if stream is None:
+            self.f.write(body.encode() if isinstance(body, str) else body)
+        else:
+            dictionary = body[:-2] if body.endswith(">>") else body
+            self.f.write(f"{dictionary} /Length {len(stream)} >>\nstream\n".encode())
+            self.f.write(stream)
+            self.f.write(b"\nendstream")
+        self.f.write(b"\nendobj\n")
+        return object_id
+
+    def close(self, root_id):
+        """写入交叉引用表和文件尾"""
+        xref_offset = self.f.tell()
+        count = self._next_id
+        self.f.write(f"xref\n0 {count}\n".encode())
+        self.f.write(b"0000000000 65535 f \n")
+        for object_id in range(1, count):
+            self.f.write(f"{self.offsets.get(object_id, 0):010d} 00000 n \n".encode())
+        self.f.write(f"trailer\n<< /Size {count} /Root {root_id} 0 R >>\n".encode())
+        self.f.write(f"startxref\n{xref_offset}\n%%EOF\n".encode())
+
+
+def _encode_tile(tile, image_format, jpeg_quality):
+    """编码照片像素，返回(过滤器名称, 数据)"""
+    height, width = tile.shape[:2]
+    if image_format == "jpeg":
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.fromarray(tile).save(buffer, "JPEG", quality=jpeg_quality, subsampling=0)
+        return "/DCTDecode", buffer.getvalue()
+    return "/FlateDecode", zlib.compress(tile.tobytes(), 6)
+
+
+def _cut_marks(x, y, width, height):
+    """照片四角的裁切线路径（PDF坐标，单位为点）"""
+    length = _mm_to_pt(CUT_MARK_LENGTH_MM)
+    offset = _mm_to_pt(CUT_MARK_OFFSET_MM)
+    commands = []
+    for corner_x, direction_x in ((x, -1), (x + width, 1)):
+        for corner_y, direction_y in ((y, -1), (y + height, 1)):
+            # 水平线沿照片上/下边缘向外延伸，竖直线沿左/右边缘向外延伸
+            start_x = corner_x + direction_x * offset
+            end_x = corner_x + direction_x * (offset + length)
+            commands.append(f"{_number(start_x)} {_number(corner_y)} m {_number(end_x)} {_number(corner_y)} l")
+            start_y = corner_y + direction_y * offset
+            end_y = corner_y + direction_y * (offset + length)
+            commands.append(f"{_number(corner_x)} {_number(start_y)} m {_number(corner_x)} {_number(end_y)} l")
+    return commands
+
+
+def write_pdf(sheets, path, image_format="jpeg", jpeg_quality=92, cut_marks=True, cancel_token=None):
+    """把一页或多页PrintSheet写成PDF
+
+    每种照片（同一个像素数组）在整个文件中只嵌入一次，即使出现在多页上；
+    页面和照片的物理尺寸按各页DPI换算，设置了tile_sizes_mm的照片按标称毫米尺寸放置。
+
+    参数:
+        sheets: PrintSheet或其列表
+        path: 输出路径
+        image_format: "jpeg"（DCT压缩，文件小）或"flate"（无损）
+        jpeg_quality: JPEG质量
+        cut_marks: 是否在每张照片四角绘制裁切线
+        cancel_token: 取消令牌
+    """
+    if not isinstance(sheets, (list, tuple)):
+        sheets = [sheets]
+
+    with open(path, "wb") as f:
+        writer = PdfWriter(f)
+        catalog_id = writer.reserve()
+        pages_id = writer.reserve()
+
+        # 嵌入照片：按像素数组去重
+        image_ids = {}
+        for sheet in sheets:
+            for tile in sheet.tiles.values():
+                if id(tile) in image_ids:
+                    continue
+                check_cancelled(cancel_token)
+                height, width = tile.shape[:2]
+                pdf_filter, data = _encode_tile(tile, image_format, jpeg_quality)
+                image_ids[id(tile)] = writer.write_object(
+                    writer.reserve(),
+                    f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                    f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter {pdf_filter} >>",
+                    data)
+
+        page_ids = []
+        for sheet in sheets:
+            check_cancelled(cancel_token)
+            scale = POINTS_PER_INCH / sheet.dpi
+            page_width = sheet.width * scale
+            page_height = sheet.height * scale
+
+            # 资源名称：同一页内每种照片一个
+            names = {}
+            for tile in sheet.tiles.values():
+                names.setdefault(id(tile), f"Im{len(names)}")
+
+            commands = []
+            placed = []
+            for name, x, y in sheet.placements:
+                tile = sheet.tiles[name]
+                width_pt, height_pt = sheet.tile_size_pt(name)
+                # PDF原点在左下角
+                left = x * scale
+                bottom = page_height - y * scale - height_pt
+                placed.append((names[id(tile)], left, bottom, width_pt, height_pt))
+
+            # 先画裁切线再画照片，照片会盖住伸入相邻照片的线段，只在间隙和页边留下裁切线
+            if cut_marks and placed:
+                commands.append(f"q 0 G {_number(CUT_MARK_WIDTH_PT)} w")
+                for _, left, bottom, width_pt, height_pt in placed:
+                    commands.extend(_cut_marks(left, bottom, width_pt, height_pt))
+                commands.append("S Q")
+
+            if sheet.background != (255, 255, 255):
+                r, g, b = (c / 255.0 for c in sheet.background)
+                commands.insert(0, f"q {_number(r)} {_number(g)} {_number(b)} rg "
+                                   f"0 0 {_number(page_width)} {_number(page_height)} re f Q")
+
+            for resource, left, bottom, width_pt, height_pt in placed:
+                commands.append(f"q {_number(width_pt)} 0 0 {_number(height_pt)} "
+                                f"{_number(left)} {_number(bottom)} cm /{resource} Do Q")
+
+            content = zlib.compress("\n".join(commands).encode(), 6)
+            content_id = writer.write_object(writer.reserve(), "<< /Filter /FlateDecode >>", content)
+
+            xobjects = " ".join(f"/{resource} {image_ids[tile_id]} 0 R" for tile_id, resource in names.items())
+            page_ids.append(writer.write_object(
+                writer.reserve(),
+                f"<< /Type /Page /Parent {pages_id} 0 R "
+                f"/MediaBox [0 0 {_number(page_width)} {_number(page_height)}] "
+                f"/Resources << /XObject << {xobjects} >> >> /Contents {content_id} 0 R >>"))
+
+        kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+        writer.write_object(pages_id, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>")
+        writer.write_object(catalog_id, f"<< /Type /Catalog /Pages {pages_id} 0 R >>")
+        writer.close(catalog_id)
@@ -0,0 +1,253 @@
+"""
+旅行证照片处理 - 打印排版页面
+把一页排版描述为"照片 + 位置"的列表，按水平条带渲染和编码，内存占用与页面大小无关
+"""
+import struct
+import zlib
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image
+
+from src.core.cancellation import check_cancelled
+from src.core.pdf_writer import POINTS_PER_INCH, MM_PER_INCH, write_pdf
+from src.core.profiling import profiler
+
+# 每次渲染的行数（A4 600DPI时一条约8MB）
+DEFAULT_STRIP_ROWS = 512
+
+# 界面中显示的排版预览的最大尺寸（宽, 高），可以放大查看细节又不必渲染整页
+PREVIEW_MAX_SIZE = (1800, 1800)
+
+# 一张照片在页面上的位置（左上角像素坐标）
+Placement = namedtuple("Placement", ["tile", "x", "y"])
+
+
+class PrintSheet:
+    """一页打印排版
+
+    tiles保存已缩放到打印尺寸的照片（每种尺寸一份），placements记录每一份拷贝的位置，
+    页面本身不分配整页画布，渲染和保存时按条带逐段生成。
+
+    参数:
+        width, height: 页面像素尺寸
+        dpi: 打印分辨率，用于写入文件的物理尺寸
+        background: 页面背景颜色(R, G, B)
+    """
+
+    def __init__(self, width, height, dpi=300, background=(255, 255, 255)):
+        self.width = int(width)
+        self.height = int(height)
+        self.dpi = dpi
+        self.background = tuple(background)
+        self.tiles = {}
+        self.tile_sizes_mm = {}
+        self.placements = []
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def add_tile(self, name, image, size_mm=None):
+        """登记一种照片（已是打印像素尺寸的PIL图像或HxWx3数组），返回名称
+
+        size_mm为照片的标称物理尺寸(宽, 高)，导出PDF时按此尺寸精确放置，
+        不受像素取整的影响；None表示按像素和DPI换算。
+        """
+        if isinstance(image, np.ndarray):
+            # 已缩放好的像素数组可在多页之间共享
+            self.tiles[name] = image
+        else:
+            self.tiles[name] = np.asarray(image.convert("RGB"))
+        if size_mm:
+            self.tile_sizes_mm[name] = tuple(size_mm)
+        return name
+
+    def tile_image(self, name):
+        """返回照片的PIL图像"""
+        return Image.fromarray(self.tiles[name])
+
+    def tile_size(self, name):
+        """照片的(宽, 高)"""
+        height, width = self.tiles[name].shape[:2]
+        return width, height
+
+    def tile_size_pt(self, name):
+        """照片在PDF中的(宽, 高)，单位为点"""
+        if name in self.tile_sizes_mm:
+            width_mm, height_mm = self.tile_sizes_mm[name]
+            return width_mm / MM_PER_INCH * POINTS_PER_INCH, height_mm / MM_PER_INCH * POINTS_PER_INCH
+        width, height = self.tile_size(name)
+        return width * POINTS_PER_INCH / self.dpi, height * POINTS_PER_INCH / self.dpi
+
+    def place(self, name, x, y):
+        """在(x, y)处放置一份照片"""
+        self.placements.append(Placement(name, int(x), int(y)))
+
+    def render_strip(self, top, bottom):
+        """渲染[top, bottom)行，返回(bottom-top)xWx3的uint8数组
+
+        后放置的照片覆盖先放置的，超出页面的部分被裁掉，与Image.paste一致。
+        """
+        strip = np.empty((bottom - top, self.width, 3), dtype=np.uint8)
+        strip[:] = self.background
+
+        for name, x, y in self.placements:
+            tile = self.tiles[name]
+            tile_height, tile_width = tile.shape[:2]
+
+            # 照片与条带、页面的交集
+            y0 = max(y, top)
+            y1 = min(y + tile_height, bottom)
+            x0 = max(x, 0)
+            x1 = min(x + tile_width, self.width)
+            if y0 >= y1 or x0 >= x1:
+                continue
+
+            strip[y0 - top:y1 - top, x0:x1] = tile[y0 - y:y1 - y, x0 - x:x1 - x]
+
+        return strip
+
+    def iter_strips(self, strip_rows=DEFAULT_STRIP_ROWS, cancel_token=None):
+        """依次生成(top, 条带数组)"""
+        for top in range(0, self.height, strip_rows):
+            check_cancelled(cancel_token)
+            yield top, self.render_strip(top, min(top + strip_rows, self.height))
+
+    def scaled(self, scale):
+        """返回按scale缩小的页面副本（照片先缩小再放置，用于屏幕预览）"""
+        sheet = PrintSheet(max(1, round(self.width * scale)), max(1, round(self.height * scale)),
+                           self.dpi * scale, self.background)
+        for name, tile in self.tiles.items():
+            height, width = tile.shape[:2]
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            # BOX即区域平均，缩小时又快又不产生锯齿
+            sheet.add_tile(name, Image.fromarray(tile).resize(size, Image.BOX), self.tile_sizes_mm.get(name))
+        for name, x, y in self.placements:
+            sheet.place(name, round(x * scale), round(y * scale))
+        return sheet
+
+    def preview(self, max_width, max_height, cancel_token=None):
+        """渲染不超过max_width x max_height的预览图，只缩小不放大"""
+        scale = min(max_width / self.width, max_height / self.height, 1.0)
+        sheet = self.scaled(scale) if scale < 1.0 else self
+        return sheet.render(cancel_token=cancel_token)
+
+    def render(self, progress_callback=None, cancel_token=None, strip_rows=DEFAULT_STRIP_ROWS):
+        """渲染整页为PIL图像（进度从30%到100%）"""
+        with profiler.span("render", size=f"{self.width}x{self.height}"):
+            page = np.empty((self.height, self.width, 3), dtype=np.uint8)
+            for top, strip in self.iter_strips(strip_rows, cancel_token):
+                page[top:top + len(strip)] = strip
+                if progress_callback:
+                    done = top + len(strip)
+                    progress_callback(30 + int(70 * done / self.height), f"渲染排版中... {done}/{self.height}行")
+
+        image = Image.fromarray(page)
+        image.info["dpi"] = (self.dpi, self.dpi)
+        return image
+
+    def save_png(self, path, cancel_token=None, strip_rows=DEFAULT_STRIP_ROWS, compress_level=6):
+        """按条带渲染并直接写入PNG文件，不生成整页图像"""
+        with open(path, "wb") as f:
+            writer = PngStripWriter(f, self.width, self.height, self.dpi, compress_level)
+            for _, strip in self.iter_strips(strip_rows, cancel_token):
+                writer.write_rows(strip)
+            writer.close()
+
+    def save(self, path, format=None, cancel_token=None):
+        """保存页面：PNG按条带流式写入，PDF每种照片只嵌入一次，其他格式先渲染整页"""
+        format = (format or path.rsplit(".", 1)[-1]).upper()
+        with profiler.span("encode", format=format):
+            if format == "PNG":
+                self.save_png(path, cancel_token)
+            elif format == "PDF":
+                write_pdf(self, path, cancel_token=cancel_token)
+            else:
+                image = self.render(cancel_token=cancel_token)
+                if format in ("JPG", "JPEG"):
+                    image.save(path, "JPEG", quality=95, dpi=(self.dpi, self.dpi))
+                elif format in ("TIF", "TIFF"):
+                    image.save(path, "TIFF", dpi=(self.dpi, self.dpi))
+                else:
+                    image.save(path, format)
+
+
+def build_and_preview(builder, *args, preview_size=PREVIEW_MAX_SIZE, progress_callback=None, cancel_token=None):
+    """调用builder(*args, cancel_token=...)生成页面并渲染预览，返回(页面, 预览PIL图像)
+
+    供后台任务使用：界面只显示不超过preview_size的预览，不渲染整页；
+    保存时再用页面按条带写PNG、直接写PDF，或只在保存其他格式时渲染整页。
+    """
+    if progress_callback:
+        progress_callback(10, "准备排版...")
+    with profiler.span("layout"):
+        sheet = builder(*args, cancel_token=cancel_token)
+    if progress_callback:
+        progress_callback(50, "生成预览...")
+    image = sheet.preview(*preview_size, cancel_token=cancel_token)
+    if progress_callback:
+        progress_callback(100, "排版完成")
+    return sheet, image
+
+
+class PngStripWriter:
+    """逐行写入的RGB PNG编码器
+
+    每行使用"Up"滤波（与上一行相减，排版页面大面积相同时压缩效果好），
+    压缩数据随写随输出为IDAT块，内存只与条带大小有关。
+    """
+
+    # 每个IDAT块的最大字节数
+    CHUNK_SIZE = 256 * 1024
+
+    def __init__(self, f, width, height, dpi=None, compress_level=6):
+        self.f = f
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._previous_row = np.zeros(width * 3, dtype=np.uint8)
+        self._compressor = zlib.compressobj(compress_level)
+        self._pending = bytearray()
+
+        f.write(b"\x89PNG\r\n\x1a\n")
+        self._write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        if dpi:
+            # pHYs以每米像素数记录分辨率
+            pixels_per_meter = int(round(dpi / 0.0254))
+            self._write_chunk(b"pHYs", struct.pack(">IIB", pixels_per_meter, pixels_per_meter, 1))
+
+    def _write_chunk(self, chunk_type, data):
+        self.f.write(struct.pack(">I", len(data)))
+        self.f.write(chunk_type)
+        self.f.write(data)
+        self.f.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(chunk_type)) & 0xFFFFFFFF))
+
+    def _flush_pending(self, final=False):
+        while len(self._pending) >= self.CHUNK_SIZE or (final and self._pending):
+            data = bytes(self._pending[:self.CHUNK_SIZE])
+            del self._pending[:self.CHUNK_SIZE]
+            self._write_chunk(b"IDAT", data)
+
+    def write_rows(self, rows):
+        """写入若干行（NxWx3 uint8数组）"""
+        rows = np.ascontiguousarray(rows).reshape(len(rows), self.width * 3)
+
+        # Up滤波：每行减去上一行（uint8按模256回绕），每行前加滤波类型字节2
+        filtered = np.empty((len(rows), self.width * 3 + 1), dtype=np.uint8)
+        filtered[:, 0] = 2
+        filtered[0, 1:] = rows[0] - self._previous_row
+        filtered[1:, 1:] = rows[1:] - rows[:-1]
+        self._previous_row = rows[-1].copy()
+
+        self._pending += self._compressor.compress(filtered.tobytes())
+        self._flush_pending()
+        self.rows_written += len(rows)
+
+    def close(self):
+        """写入剩余数据和文件结尾"""
+        if self.rows_written != self.height:
+            raise ValueError(f"PNG行数不符: 已写入{self.rows_written}行，应为{self.height}行")
+        self._pending += self._compressor.flush()
+        self._flush_pending(final=True)
+        self._write_chunk(b"IEND", b"")
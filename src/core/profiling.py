@@ -0,0 +1,186 @@
+"""
+旅行证照片处理 - 性能剖析
+在各处理阶段（转换、检测、缩放、裁剪、合成、编码等）记录耗时区间，输出到日志、Chrome跟踪文件或界面的性能面板
+
+用法:
+    with profiler.span("detect"):
+        faces = detect_faces(...)
+
+没有添加任何输出时profiler.span()返回共享的空上下文，开销只有一次属性判断。
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+
+# 一个已结束的区间；start_ns为time.perf_counter_ns()，args为附加信息字典或None
+SpanRecord = namedtuple("SpanRecord", ["name", "start_ns", "duration_ns", "thread_id", "thread_name", "args"])
+
+
+class _DisabledSpan:
+    """未启用剖析时使用的空上下文"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_DISABLED_SPAN = _DisabledSpan()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "args", "start_ns")
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration_ns = time.perf_counter_ns() - self.start_ns
+        thread = threading.current_thread()
+        args = self.args
+        if exc_type is not None:
+            args = dict(args or {}, error=exc_type.__name__)
+        self.profiler.emit(SpanRecord(self.name, self.start_ns, duration_ns, thread.ident, thread.name, args))
+        return False
+
+
+class Profiler:
+    """区间记录器，把结束的区间分发给所有输出（sink）
+
+    输出是带emit(record)方法的对象，可能在任意线程中被调用。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._sinks = []
+        self._lock = threading.Lock()
+
+    def span(self, name, **args):
+        """返回记录name阶段耗时的上下文管理器"""
+        if not self.enabled:
+            return _DISABLED_SPAN
+        return _Span(self, name, args or None)
+
+    def emit(self, record):
+        for sink in self._sinks:
+            try:
+                sink.emit(record)
+            except Exception as e:
+                print(f"性能记录输出失败: {str(e)}")
+
+    def add_sink(self, sink):
+        """添加输出并启用剖析，返回该输出"""
+        with self._lock:
+            self._sinks = self._sinks + [sink]
+            self.enabled = True
+        return sink
+
+    def remove_sink(self, sink):
+        """移除输出，没有输出时停止剖析"""
+        with self._lock:
+            self._sinks = [s for s in self._sinks if s is not sink]
+            self.enabled = bool(self._sinks)
+
+
+class LogSink:
+    """把每个区间输出为一行日志"""
+
+    def __init__(self, file=None, min_ms=0.0):
+        self.file = file
+        self.min_ms = min_ms
+
+    def emit(self, record):
+        duration_ms = record.duration_ns / 1e6
+        if duration_ms < self.min_ms:
+            return
+        extra = f" {record.args}" if record.args else ""
+        print(f"[性能] {record.name:<12}{duration_ms:>10.2f} ms  {record.thread_name}{extra}",
+              file=self.file or sys.stderr, flush=True)
+
+
+class ChromeTraceSink:
+    """收集区间，保存为Chrome跟踪事件格式（在chrome://tracing或Perfetto中打开）"""
+
+    def __init__(self, path):
+        self.path = path
+        self._events = []
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        event = {
+            "name": record.name,
+            "cat": "travel_photo",
+            "ph": "X",
+            "ts": record.start_ns / 1000,
+            "dur": record.duration_ns / 1000,
+            "pid": os.getpid(),
+            "tid": record.thread_id,
+        }
+        if record.args:
+            event["args"] = {key: str(value) for key, value in record.args.items()}
+        with self._lock:
+            self._events.append(event)
+            self._threads.setdefault(record.thread_id, record.thread_name)
+
+    def save(self, path=None):
+        """写入跟踪文件，返回路径"""
+        path = path or self.path
+        with self._lock:
+            metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": thread_id,
+                         "args": {"name": thread_name}} for thread_id, thread_name in self._threads.items()]
+            events = metadata + list(self._events)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        return path
+
+
+class StatsSink:
+    """按阶段名称汇总次数、总耗时和最大耗时，并保留最近的区间（供性能面板显示）"""
+
+    def __init__(self, recent=200):
+        self._stats = {}
+        self._recent = deque(maxlen=recent)
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        duration_ms = record.duration_ns / 1e6
+        with self._lock:
+            count, total, longest, _ = self._stats.get(record.name, (0, 0.0, 0.0, 0.0))
+            self._stats[record.name] = (count + 1, total + duration_ms, max(longest, duration_ms), duration_ms)
+            self._recent.append(record)
+
+    def snapshot(self):
+        """返回[(名称, 次数, 平均ms, 最大ms, 最近一次ms)]，按总耗时从大到小排列"""
+        with self._lock:
+            items = list(self._stats.items())
+        items.sort(key=lambda item: item[1][1], reverse=True)
+        return [(name, count, total / count, longest, last) for name, (count, total, longest, last) in items]
+
+    def recent(self):
+        """最近的区间记录"""
+        with self._lock:
+            return list(self._recent)
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+            self._recent.clear()
+
+
+# 创建全局性能剖析器实例
+profiler = Profiler()
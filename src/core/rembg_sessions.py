@@ -0,0 +1,136 @@
+"""
+旅行证照片处理 - rembg推理会话池
+按模型名称缓存rembg推理会话，避免每张照片都重新加载U2Net模型
+"""
+import threading
+import time
+
+# 支持的模型名称（isnet为isnet-general-use的简写）
+SUPPORTED_MODELS = ("u2net", "u2netp", "u2net_human_seg", "isnet-general-use")
+MODEL_ALIASES = {"isnet": "isnet-general-use"}
+DEFAULT_MODEL = "u2net"
+
+
+class RembgSessionPool:
+    """进程级rembg会话池
+
+    会话在第一次使用时创建，之后所有线程共享同一个会话
+    （onnxruntime的InferenceSession.run是线程安全的）。
+    """
+
+    def __init__(self, intra_op_threads=0, inter_op_threads=0):
+        # 0表示由onnxruntime自行决定线程数
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+
+        self._sessions = {}
+        self._load_times = {}
+        self._warmed_up = set()
+        self._lock = threading.Lock()
+        self._model_locks = {}
+
+    @staticmethod
+    def resolve_model_name(model_name):
+        """将模型别名转换为rembg使用的模型名称"""
+        model_name = MODEL_ALIASES.get(model_name, model_name or DEFAULT_MODEL)
+        if model_name not in SUPPORTED_MODELS:
+            raise ValueError(f"不支持的rembg模型: {model_name}")
+        return model_name
+
+    def configure(self, intra_op_threads=None, inter_op_threads=None):
+        """设置onnxruntime线程数，只对之后新建的会话生效"""
+        with self._lock:
+            if intra_op_threads is not None:
+                self.intra_op_threads = intra_op_threads
+            if inter_op_threads is not None:
+                self.inter_op_threads = inter_op_threads
+
+    def _model_lock(self, model_name):
+        with self._lock:
+            if model_name not in self._model_locks:
+                self._model_locks[model_name] = threading.Lock()
+            return self._model_locks[model_name]
+
+    def _create_session(self, model_name):
+        """创建新的rembg会话"""
+        import onnxruntime as ort
+        from rembg import new_session
+
+        sess_opts = ort.SessionOptions()
+        sess_opts.intra_op_num_threads = self.intra_op_threads
+        sess_opts.inter_op_num_threads = self.inter_op_threads
+        return new_session(model_name, sess_opts=sess_opts)
+
+    def get_session(self, model_name=DEFAULT_MODEL):
+        """获取指定模型的会话，不存在时创建"""
+        model_name = self.resolve_model_name(model_name)
+
+        session = self._sessions.get(model_name)
+        if session is not None:
+            return session
+
+        # 每个模型一把锁，避免多个线程同时加载同一个模型
+        with self._model_lock(model_name):
+            session = self._sessions.get(model_name)
+            if session is None:
+                start_time = time.perf_counter()
+                session = self._create_session(model_name)
+                self._load_times[model_name] = time.perf_counter() - start_time
+                self._sessions[model_name] = session
+                print(f"已加载rembg模型 {model_name}，耗时 {self._load_times[model_name]:.2f}s")
+            return session
+
+    def warm_up(self, model_name=DEFAULT_MODEL):
+        """用一张小图跑一次推理，让onnxruntime完成首次运行的初始化"""
+        model_name = self.resolve_model_name(model_name)
+        session = self.get_session(model_name)
+        if model_name in self._warmed_up:
+            return session
+
+        from PIL import Image
+        from rembg import remove
+
+        remove(Image.new("RGB", (64, 64), "white"), session=session, only_mask=True)
+        self._warmed_up.add(model_name)
+        return session
+
+    def preload(self, model_names=(DEFAULT_MODEL,), warm_up=True):
+        """启动时预加载模型，使第一张照片和之后的照片一样快"""
+        for model_name in model_names:
+            try:
+                if warm_up:
+                    self.warm_up(model_name)
+                else:
+                    self.get_session(model_name)
+            except Exception as e:
+                print(f"预加载rembg模型 {model_name} 失败: {str(e)}")
+
+    def preload_async(self, model_names=(DEFAULT_MODEL,), warm_up=True):
+        """在后台线程中预加载模型，不阻塞界面"""
+        thread = threading.Thread(
+            target=self.preload,
+            args=(model_names, warm_up),
+            name="rembg-preload",
+            daemon=True,
+        )
+        thread.start()
+        return thread
+
+    def is_loaded(self, model_name=DEFAULT_MODEL):
+        """模型是否已加载"""
+        return self.resolve_model_name(model_name) in self._sessions
+
+    def load_times(self):
+        """返回各模型的加载耗时（秒）"""
+        return dict(self._load_times)
+
+    def clear(self):
+        """释放所有会话"""
+        with self._lock:
+            self._sessions.clear()
+            self._load_times.clear()
+            self._warmed_up.clear()
+
+
+# 创建全局会话池实例
+session_pool = RembgSessionPool()
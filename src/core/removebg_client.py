@@ -0,0 +1,190 @@
+"""
+旅行证照片处理 - Remove.bg客户端
+复用连接的Remove.bg API客户端：连接池和长连接、连接/读取超时、429和5xx时按指数退避（遵守Retry-After）重试
+"""
+import email.utils
+import io
+import os
+import random
+import threading
+import time
+
+from src.core.cancellation import check_cancelled
+
+DEFAULT_ENDPOINT = "https://api.remove.bg/v1.0/removebg"
+
+# 设置该环境变量可把请求发往本地模拟服务（见benchmarks/removebg_mock_server.py）
+ENDPOINT_ENV = "REMOVEBG_ENDPOINT"
+
+# 可以重试的HTTP状态码：请求过多和服务端临时错误
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class RemoveBgError(Exception):
+    """Remove.bg请求失败"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def parse_retry_after(value, now=None):
+    """解析Retry-After（秒数或HTTP日期），返回等待秒数，无法解析时返回None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_time = email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+    return max(0.0, retry_time - (now if now is not None else time.time()))
+
+
+def _error_message(response):
+    """从错误响应中取出说明（Remove.bg返回{"errors": [{"title": ...}]}）"""
+    try:
+        errors = response.json().get("errors") or []
+        if errors:
+            return errors[0].get("title") or str(errors[0])
+    except ValueError:
+        pass
+    return response.text[:200]
+
+
+class RemoveBgClient:
+    """Remove.bg API客户端
+
+    所有线程共享一个requests会话（urllib3连接池是线程安全的），
+    同一主机的请求复用TCP/TLS连接，不再为每张照片重新握手。
+
+    参数:
+        endpoint: API地址，None时读取REMOVEBG_ENDPOINT环境变量，再退回官方地址
+        connect_timeout: 连接超时（秒）
+        read_timeout: 读取超时（秒），不超过取消令牌的剩余时间
+        max_retries: 429/5xx/网络错误时的最大重试次数
+        backoff_base: 第一次重试前的等待时间（秒），之后每次翻倍并加入随机抖动
+        backoff_max: 单次等待的上限（秒），Retry-After超过上限时同样按上限截断
+        pool_size: 连接池大小，应不小于同时请求的线程数
+    """
+
+    def __init__(self, endpoint=None, connect_timeout=10.0, read_timeout=60.0, max_retries=3,
+                 backoff_base=1.0, backoff_max=30.0, pool_size=4):
+        self.endpoint = endpoint or os.environ.get(ENDPOINT_ENV) or DEFAULT_ENDPOINT
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+
+        self._session = None
+        self._lock = threading.Lock()
+        self.requests_sent = 0
+        self.retries = 0
+
+    @property
+    def session(self):
+        """第一次使用时创建会话（requests在此时才导入）"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    # 重试由本类处理（需要遵守Retry-After并检查取消令牌），连接池不自动重试
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """第attempt次重试（从0开始）前的等待秒数"""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        delay = self.backoff_base * (2 ** attempt)
+        # 全抖动：在[delay/2, delay]之间随机，避免多个线程同时重试
+        return min(self.backoff_max, delay / 2 + random.uniform(0, delay / 2))
+
+    def _wait(self, delay, cancel_token):
+        if cancel_token is None:
+            time.sleep(delay)
+            return
+        # 等不到下次重试就会超时时，只等到截止时间，随后抛出超时异常
+        remaining = cancel_token.remaining()
+        cancel_token.sleep(delay if remaining is None else min(delay, remaining))
+
+    def remove_background(self, image_bytes, api_key, size="auto", cancel_token=None):
+        """上传图片，返回Remove.bg生成的PNG（带透明通道）字节
+
+        参数:
+            image_bytes: 编码后的图片（如PNG）
+            api_key: Remove.bg API密钥
+            size: 输出尺寸，"auto"表示按账户允许的最大尺寸
+            cancel_token: 取消令牌，在请求之间、下载的每块之间和重试等待期间检查
+
+        异常:
+            RemoveBgError: 不可重试的错误（如密钥无效、额度不足）或重试次数用完
+            OperationCancelled: 已取消或超时
+        """
+        import requests
+
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            check_cancelled(cancel_token)
+
+            read_timeout = self.read_timeout
+            if cancel_token is not None:
+                read_timeout = max(1.0, min(read_timeout, cancel_token.remaining(read_timeout)))
+
+            retry_after = None
+            try:
+                self.requests_sent += 1
+                response = self.session.post(
+                    self.endpoint,
+                    files={"image_file": ("image.png", image_bytes)},
+                    data={"size": size},
+                    headers={"X-Api-Key": api_key},
+                    timeout=(self.connect_timeout, read_timeout),
+                    stream=True,
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = RemoveBgError(f"网络错误: {str(e)}")
+            else:
+                with response:
+                    if response.status_code == requests.codes.ok:
+                        # 分块读取响应，期间可以取消；读完后连接回到连接池
+                        content = io.BytesIO()
+                        for chunk in response.iter_content(chunk_size=64 * 1024):
+                            check_cancelled(cancel_token)
+                            content.write(chunk)
+                        return content.getvalue()
+
+                    message = f"API错误: {response.status_code} {_error_message(response)}"
+                    if response.status_code not in RETRY_STATUS:
+                        raise RemoveBgError(message, response.status_code)
+                    last_error = RemoveBgError(message, response.status_code)
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+
+            if attempt == self.max_retries:
+                break
+            delay = self.backoff_delay(attempt, retry_after)
+            print(f"Remove.bg请求失败: {last_error}，{delay:.1f}秒后重试（第{attempt + 1}/{self.max_retries}次）")
+            self.retries += 1
+            self._wait(delay, cancel_token)
+
+        raise last_error
+
+    def close(self):
+        """关闭会话和连接池中的连接"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+# 创建全局Remove.bg客户端实例
+removebg_client = RemoveBgClient()
@@ -0,0 +1,174 @@
+"""
+旅行证照片处理 - 多页拼版
+把多位顾客、多种尺寸和数量的证件照装入尽量少的页面，所有位置都可以用一刀切（闸刀式裁切）分开
+"""
+import os
+
+from src.core.cancellation import check_cancelled
+from src.core.print_layout import PrintSheet
+from src.core.pdf_writer import MM_PER_INCH, write_pdf
+from src.core.tile_cache import tile_cache
+
+# 常用照片尺寸（宽, 高），单位毫米
+PHOTO_SIZES = {
+    "travel": (33, 48),     # 旅行证/护照
+    "one_inch": (25, 35),   # 一寸
+    "two_inch": (35, 45),   # 二寸
+}
+
+# 常用纸张尺寸（宽, 高），单位毫米
+PAPER_SIZES = {
+    "a4": (210, 297),
+    "6inch": (101.6, 152.4),
+}
+
+
+def resolve_size(size):
+    """将尺寸名称（见PHOTO_SIZES/PAPER_SIZES）或(宽, 高)转换为毫米(宽, 高)"""
+    if isinstance(size, str):
+        if size in PHOTO_SIZES:
+            return PHOTO_SIZES[size]
+        if size in PAPER_SIZES:
+            return PAPER_SIZES[size]
+        raise ValueError(f"不支持的尺寸: {size}")
+    return tuple(float(v) for v in size)
+
+
+def mm_to_px(mm, dpi):
+    return int(round(mm / MM_PER_INCH * dpi))
+
+
+class _GuillotineBin:
+    """一页的空闲区域，用闸刀式切分管理
+
+    每次放置后把所在空闲矩形沿较短的剩余边切成两个矩形，
+    因此所有放置结果都可以用一系列贯穿的直线裁切分开。
+    """
+
+    def __init__(self, width, height):
+        self.free = [(0, 0, width, height)]
+        self.placed = []
+
+    def find(self, width, height):
+        """返回最合适的空闲矩形下标（剩余面积最小），放不下时返回None"""
+        best = None
+        best_score = None
+        for index, (_, _, free_width, free_height) in enumerate(self.free):
+            if width <= free_width and height <= free_height:
+                score = (free_width * free_height - width * height, min(free_width - width, free_height - height))
+                if best_score is None or score < best_score:
+                    best, best_score = index, score
+        return best
+
+    def place(self, index, width, height, item):
+        x, y, free_width, free_height = self.free.pop(index)
+        self.placed.append((item, x, y))
+
+        right_width = free_width - width
+        bottom_height = free_height - height
+        # 沿剩余较短的方向切，保留较大的完整矩形
+        if right_width < bottom_height:
+            right = (x + width, y, right_width, height)
+            bottom = (x, y + height, free_width, bottom_height)
+        else:
+            right = (x + width, y, right_width, free_height)
+            bottom = (x, y + height, width, bottom_height)
+        for rect in (right, bottom):
+            if rect[2] > 0 and rect[3] > 0:
+                self.free.append(rect)
+
+
+def pack_sheets(items, paper="a4", dpi=300, spacing_mm=2.0, margin_mm=5.0, cancel_token=None):
+    """把照片装入尽量少的页面
+
+    参数:
+        items: 列表，每项为字典:
+            - photo: PIL.Image对象，证件照
+            - size: 尺寸名称（见PHOTO_SIZES）或(宽, 高)毫米
+            - quantity: 份数
+        paper: 纸张名称（见PAPER_SIZES）或(宽, 高)毫米
+        dpi: 打印DPI
+        spacing_mm: 照片之间的间距（毫米）
+        margin_mm: 页边距（毫米）
+        cancel_token: 取消令牌
+
+    返回:
+        PrintSheet列表；同一张照片的同一尺寸只缩放一次，在各页之间共享
+        （导出PDF时也只嵌入一次）
+    """
+    paper_width, paper_height = resolve_size(paper)
+    page_width = mm_to_px(paper_width, dpi)
+    page_height = mm_to_px(paper_height, dpi)
+    margin = mm_to_px(margin_mm, dpi)
+    spacing = mm_to_px(spacing_mm, dpi)
+
+    # 可用区域加上一个间距，每张照片也按"照片+间距"占位，最右/最下一张的间距落在页边距内
+    usable_width = page_width - 2 * margin + spacing
+    usable_height = page_height - 2 * margin + spacing
+
+    # 每种(照片, 尺寸)缩放一次
+    tiles = []
+    pieces = []
+    for item in items:
+        quantity = int(item.get("quantity", 1))
+        if quantity <= 0:
+            continue
+        size_mm = resolve_size(item.get("size", "travel"))
+        width = mm_to_px(size_mm[0], dpi)
+        height = mm_to_px(size_mm[1], dpi)
+        if width + spacing > usable_width or height + spacing > usable_height:
+            raise ValueError(f"照片尺寸{size_mm}超出纸张可用范围")
+
+        check_cancelled(cancel_token)
+        pixels = tile_cache.get(item["photo"], (width, height))
+        tile_index = len(tiles)
+        tiles.append((pixels, size_mm))
+        pieces.extend([(tile_index, width, height)] * quantity)
+
+    # 面积大的先放，同面积时高的先放
+    pieces.sort(key=lambda piece: (piece[1] * piece[2], piece[2]), reverse=True)
+
+    bins = []
+    for tile_index, width, height in pieces:
+        slot_width = width + spacing
+        slot_height = height + spacing
+        for page in bins:
+            index = page.find(slot_width, slot_height)
+            if index is not None:
+                page.place(index, slot_width, slot_height, tile_index)
+                break
+        else:
+            page = _GuillotineBin(usable_width, usable_height)
+            page.place(page.find(slot_width, slot_height), slot_width, slot_height, tile_index)
+            bins.append(page)
+
+    sheets = []
+    for page in bins:
+        sheet = PrintSheet(page_width, page_height, dpi=dpi)
+        for tile_index, x, y in page.placed:
+            name = f"tile{tile_index}"
+            if name not in sheet.tiles:
+                pixels, size_mm = tiles[tile_index]
+                sheet.add_tile(name, pixels, size_mm)
+            sheet.place(name, margin + x, margin + y)
+        sheets.append(sheet)
+
+    return sheets
+
+
+def save_sheets(sheets, path, cancel_token=None):
+    """保存多页排版：PDF写成一个多页文件，其他格式每页一个文件（文件名后加页码）
+
+    返回写入的文件路径列表
+    """
+    root, extension = os.path.splitext(path)
+    if extension.lower() == ".pdf":
+        write_pdf(sheets, path, cancel_token=cancel_token)
+        return [path]
+
+    paths = []
+    for index, sheet in enumerate(sheets, 1):
+        page_path = f"{root}_{index:02d}{extension}" if len(sheets) > 1 else path
+        sheet.save(page_path, extension.lstrip(".") or "png", cancel_token)
+        paths.append(page_path)
+    return paths
@@ -0,0 +1,97 @@
+"""
+旅行证照片处理 - 排版照片缓存
+缓存每张证件照缩放到打印尺寸后的像素，在标准、自定义和混合排版之间切换时不再重复缩放
+"""
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from src.core.profiling import profiler
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class TileCache:
+    """内存中的排版照片缓存
+
+    键为(源照片, 目标像素尺寸, 重采样滤波器)，值为只读的HxWx3 RGB数组，可直接交给PrintSheet.add_tile。
+    源照片按对象身份识别：照片对象被释放时其缓存随之删除，因此照片在登记后不能原地修改像素。
+    总大小超过max_bytes时淘汰最久未使用的条目。
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sources = {}
+        # 可重入锁：垃圾回收可能在持有锁时触发_forget
+        self._lock = threading.RLock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, photo, size=None, resample=Image.LANCZOS):
+        """返回photo缩放到size(宽, 高)后的RGB数组；size为None或与原图相同时不缩放"""
+        size = tuple(int(v) for v in size) if size else photo.size
+        if size == photo.size:
+            resample = None
+        key = (id(photo), size, resample)
+
+        with self._lock:
+            tile = self._entries.get(key)
+            if tile is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return tile
+            self.misses += 1
+
+        # 缩放在锁外进行，多个线程可同时缩放不同照片
+        with profiler.span("resize"):
+            resized = photo if resample is None else photo.resize(size, resample)
+            tile = np.array(resized.convert("RGB"))
+        tile.setflags(write=False)
+
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+            self._watch(photo)
+            self._entries[key] = tile
+            self.total_bytes += tile.nbytes
+            self._evict()
+        return tile
+
+    def _watch(self, photo):
+        """源照片被释放时删除它的全部缓存（对象编号可能被新对象复用）"""
+        source_id = id(photo)
+        if source_id not in self._sources:
+            self._sources[source_id] = weakref.ref(photo, lambda _, source_id=source_id: self._forget(source_id))
+
+    def _forget(self, source_id):
+        with self._lock:
+            self._sources.pop(source_id, None)
+            for key in [key for key in self._entries if key[0] == source_id]:
+                self.total_bytes -= self._entries.pop(key).nbytes
+
+    def _evict(self):
+        """淘汰最久未使用的条目，至少保留最新的一个"""
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, tile = self._entries.popitem(last=False)
+            self.total_bytes -= tile.nbytes
+
+    def clear(self):
+        """删除全部缓存"""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        """返回命中次数、未命中次数、条目数和占用内存"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "entries": len(self._entries), "size_bytes": self.total_bytes}
+
+
+# 创建全局排版照片缓存实例
+tile_cache = TileCache()
@@ -4,20 +4,23 @@
 """
 from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton, 
                             QLabel, QSlider, QFrame, QGraphicsView, QGraphicsScene,
-                            QGraphicsPixmapItem, QGraphicsEllipseItem, QSizePolicy, QWidget)
+                            QGraphicsPixmapItem, QGraphicsEllipseItem, QGraphicsRectItem,
+                            QGraphicsSimpleTextItem, QSizePolicy, QWidget)
 from PySide6.QtCore import Qt, QRectF, QPointF
-from PySide6.QtGui import QPixmap, QImage, QPen, QColor, QBrush, QPainter, QCursor
-import numpy as np
+from PySide6.QtGui import (QPen, QColor, QBrush, QPainter, QCursor,
+                           QPainterPath, QFont)
 from PIL import Image
 
 from src.utils.theme import Colors, set_card_style, set_primary_button_style, set_accent_button_style
 from src.utils.icons import IconProvider
+from src.utils.frame_scheduler import FrameScheduler
+from src.utils.qt_image import pil_to_qpixmap
 from src.core.image_processor import ImageProcessor
 
 class ModernFaceAdjustmentEditor(QDialog):
     """现代化人脸位置调整编辑器"""
     
-    def __init__(self, parent=None, image=None):
+    def __init__(self, parent=None, image=None, target_fps=60):
         super().__init__(parent)
         self.setWindowTitle("人脸位置调整")
         self.setMinimumSize(1000, 800)
@@ -30,10 +33,15 @@ class ModernFaceAdjustmentEditor(QDialog):
         self.face_size = None
         self.inner_ellipse = None
         self.outer_ellipse = None
-        self.display_image = None
         self.control_point = None
         self.pixmap_item = None
         
+        # 叠加层图形项（裁剪框、暗化区域、参考线和距离标签）
+        self.dim_item = None
+        self.crop_frame = None
+        self.guide_lines = []
+        self.distance_labels = []
+        
         # 拖拽状态
         self.dragging = False
         self.last_pos = None
@@ -41,6 +49,9 @@ class ModernFaceAdjustmentEditor(QDialog):
         # 缩放比例
         self.zoom_factor = 1.0
         
+        # 拖动和滑块的更新按帧合并，每帧最多刷新一次叠加层；刷新耗时和合并的请求数显示在性能面板（Ctrl+Shift+P）中
+        self.overlay_scheduler = FrameScheduler(self.update_overlay, target_fps, self, name="overlay")
+        
         # 创建UI
         self.create_ui()
         
@@ -358,41 +369,127 @@ class ModernFaceAdjustmentEditor(QDialog):
         self.update_display()
     
     def update_display(self):
-        """更新显示图像，保留控制点位置"""
+        """更新显示：照片只在第一次加载时渲染，之后只移动叠加层"""
         if self.original_image is None:
             return
         
-        # 清除场景，但记住控制点位置
-        control_pos = None
-        if self.control_point is not None:
-            control_pos = QPointF(self.face_position[0], self.face_position[1])
-            self.scene.removeItem(self.control_point)
-            self.control_point = None
-        
-        # 创建带椭圆和标记的图像
-        processor = ImageProcessor()
-        self.display_image = processor.draw_face_ellipses(
-            self.original_image,
-            self.face_position,
-            self.face_size,
-            show_distances=True
-        )
+        if self.pixmap_item is not None:
+            self.update_overlay()
+            if self.control_point is not None:
+                self.control_point.setPos(self.face_position[0], self.face_position[1])
+            return
         
-        # 转换为QPixmap
-        qimage = self.pil_to_qimage(self.display_image)
-        pixmap = QPixmap.fromImage(qimage)
+        # 添加静态照片
+        self.pixmap_item = self.scene.addPixmap(pil_to_qpixmap(self.original_image))
         
-        # 清除场景并添加pixmap
-        self.scene.clear()
-        self.pixmap_item = self.scene.addPixmap(pixmap)
+        # 创建叠加层图形项
+        self.create_overlay_items()
+        self.update_overlay()
         
-        # 适应视图大小
-        if control_pos is None:  # 第一次加载时适应窗口
-            self.view.fitInView(self.pixmap_item, Qt.KeepAspectRatio)
+        # 第一次加载时适应窗口
+        self.view.fitInView(self.pixmap_item, Qt.KeepAspectRatio)
         
         # 添加控制点
         self.add_control_point()
     
+    def create_overlay_items(self):
+        """创建裁剪框、暗化区域、椭圆、参考线和距离标签"""
+        red = QColor(255, 0, 0)
+        green = QColor(0, 255, 0)
+        
+        # 裁剪框外的暗化区域（相当于原图亮度的80%）
+        self.dim_item = self.scene.addPath(QPainterPath(), QPen(Qt.NoPen), QBrush(QColor(0, 0, 0, 51)))
+        self.dim_item.setZValue(10)
+        
+        # 裁剪框（黄色）
+        self.crop_frame = self.scene.addRect(QRectF(), QPen(QColor(255, 255, 0), 3))
+        self.crop_frame.setZValue(20)
+        
+        # 内椭圆（绿色）和外椭圆（红色）
+        self.inner_ellipse = self.scene.addEllipse(QRectF(), QPen(green, 2))
+        self.outer_ellipse = self.scene.addEllipse(QRectF(), QPen(red, 2))
+        self.inner_ellipse.setZValue(20)
+        self.outer_ellipse.setZValue(20)
+        
+        # 参考虚线：外椭圆4条（红色）+ 内椭圆4条（绿色）
+        self.guide_lines = []
+        for color in (red, green):
+            pen = QPen(color, 1)
+            pen.setDashPattern([10, 10])
+            for _ in range(4):
+                line = self.scene.addLine(0, 0, 0, 0, pen)
+                line.setZValue(20)
+                self.guide_lines.append(line)
+        
+        # 距离标签：上、下、左、右各一对（红色外椭圆、绿色内椭圆）
+        font = QFont()
+        font.setPixelSize(22)
+        font.setBold(True)
+        self.distance_labels = []
+        for _ in range(4):
+            for color in (red, green):
+                background = QGraphicsRectItem()
+                background.setPen(QPen(Qt.NoPen))
+                background.setBrush(QBrush(Qt.white))
+                background.setZValue(30)
+                text = QGraphicsSimpleTextItem(background)
+                text.setFont(font)
+                text.setBrush(QBrush(color))
+                self.scene.addItem(background)
+                self.distance_labels.append((background, text))
+    
+    def update_overlay(self):
+        """按当前人脸位置和大小移动叠加层图形项，不重新渲染照片"""
+        if self.pixmap_item is None or self.face_position is None:
+            return
+        
+        width, height = self.original_image.size
+        geometry = ImageProcessor.face_overlay_geometry(
+            (width, height), self.face_position, self.face_size)
+        crop_x, crop_y, crop_w, crop_h = geometry['crop']
+        cx, cy = geometry['center']
+        inner_axes = geometry['inner_axes']
+        outer_axes = geometry['outer_axes']
+        
+        # 暗化区域 = 整张图 - 裁剪框
+        path = QPainterPath()
+        path.setFillRule(Qt.OddEvenFill)
+        path.addRect(QRectF(0, 0, width, height))
+        path.addRect(QRectF(crop_x, crop_y, crop_w, crop_h))
+        self.dim_item.setPath(path)
+        
+        self.crop_frame.setRect(QRectF(crop_x, crop_y, crop_w, crop_h))
+        self.inner_ellipse.setRect(QRectF(cx - inner_axes[0], cy - inner_axes[1], inner_axes[0] * 2, inner_axes[1] * 2))
+        self.outer_ellipse.setRect(QRectF(cx - outer_axes[0], cy - outer_axes[1], outer_axes[0] * 2, outer_axes[1] * 2))
+        
+        # 参考线：从椭圆边缘到裁剪框边缘
+        for index, (ax, ay) in enumerate((outer_axes, inner_axes)):
+            lines = self.guide_lines[index * 4:index * 4 + 4]
+            lines[0].setLine(cx, cy - ay, cx, crop_y)
+            lines[1].setLine(cx, cy + ay, cx, crop_y + crop_h)
+            lines[2].setLine(cx - ax, cy, crop_x, cy)
+            lines[3].setLine(cx + ax, cy, crop_x + crop_w, cy)
+        
+        # 距离标签（位置为文字基线左端，与原先的绘制方式一致）
+        ox, oy = outer_axes
+        positions = [
+            (cx - 80, cy - oy - 10), (cx + 10, cy - oy - 10),        # 上边缘
+            (cx - 80, cy + oy + 30), (cx + 10, cy + oy + 30),        # 下边缘
+            (cx - ox - 120, cy - 20), (cx - ox - 120, cy + 20),      # 左边缘
+            (cx + ox + 10, cy - 20), (cx + ox + 10, cy + 20),        # 右边缘
+        ]
+        outer_distances = geometry['outer_distances']
+        inner_distances = geometry['inner_distances']
+        for index, ((background, text), (x, y)) in enumerate(zip(self.distance_labels, positions)):
+            edge = index // 2
+            if index % 2 == 0:
+                text.setText(f"R:{outer_distances[edge]:.1f}mm")
+            else:
+                text.setText(f"G:{inner_distances[edge]:.1f}mm")
+            text_rect = text.boundingRect()
+            background.setRect(QRectF(-5, -5, text_rect.width() + 10, text_rect.height() + 10))
+            background.setPos(x, y - text_rect.height())
+    
     def add_control_point(self):
         """添加可交互的控制点"""
         if self.face_position is None:
@@ -476,29 +573,8 @@ class ModernFaceAdjustmentEditor(QDialog):
         # 记住当前鼠标位置用于下次计算
         self.last_pos = scene_pos
         
-        # 使用QGraphicsScene的update()而不是直接清除和重新添加项
-        self.scene.update()
-        
-        # 重新绘制带椭圆的图像
-        processor = ImageProcessor()
-        self.display_image = processor.draw_face_ellipses(
-            self.original_image,
-            self.face_position,
-            self.face_size,
-            show_distances=True
-        )
-        
-        # 更新显示图像 - 使用setPixmap而不是重新创建项
-        qimage = self.pil_to_qimage(self.display_image)
-        pixmap = QPixmap.fromImage(qimage)
-        if self.pixmap_item:
-            self.pixmap_item.setPixmap(pixmap)
-        
-        # 确保控制点在最上层
-        self.control_point.setZValue(100)
-        
-        # 强制更新视图
-        self.view.viewport().update()
+        # 叠加层在下一帧统一刷新
+        self.overlay_scheduler.request()
         
         event.accept()
     
@@ -506,6 +582,8 @@ class ModernFaceAdjustmentEditor(QDialog):
         """处理鼠标释放事件"""
         if self.dragging and self.control_point is not None:
             self.dragging = False
+            # 立即显示最终位置
+            self.overlay_scheduler.flush()
             # 恢复控制点颜色
             self.control_point.setBrush(QBrush(QColor(Colors.ACCENT)))
             event.accept()
@@ -532,8 +610,8 @@ class ModernFaceAdjustmentEditor(QDialog):
         # 更新大小值标签
         self.size_value.setText(f"{value}%")
         
-        # 更新显示
-        self.update_display()
+        # 叠加层在下一帧统一刷新
+        self.overlay_scheduler.request()
     
     def reset_adjustment(self):
         """重置人脸位置检测"""
@@ -543,19 +621,6 @@ class ModernFaceAdjustmentEditor(QDialog):
         # 重置滑块
         self.size_slider.setValue(100)
     
-    def pil_to_qimage(self, pil_image):
-        """将PIL图像转换为QImage"""
-        if pil_image.mode != "RGB":
-            pil_image = pil_image.convert("RGB")
-        
-        # 使用numpy数组进行转换
-        numpy_array = np.array(pil_image)
-        height, width, channel = numpy_array.shape
-        bytes_per_line = 3 * width
-        
-        qimage = QImage(numpy_array.data, width, height, bytes_per_line, QImage.Format_RGB888)
-        return qimage
-    
     def get_result(self):
         """返回调整后的人脸位置和大小"""
         return self.face_position, self.face_size 
\ No newline at end of file
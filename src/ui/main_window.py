@@ -4,21 +4,25 @@
 """
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                             QPushButton, QLabel, QFileDialog, QTabWidget,
-                            QMessageBox, QSplitter, QStackedWidget, QDialog, QFormLayout, QSpinBox, QDialogButtonBox)
+                            QMessageBox, QSplitter, QStackedWidget, QDialog, QFormLayout, QSpinBox, QDialogButtonBox,
+                            QComboBox)
 from PySide6.QtCore import Qt, QTimer, Signal
-from PySide6.QtGui import QPixmap, QIcon, QCursor
+from PySide6.QtGui import QPixmap, QIcon, QCursor, QKeySequence, QShortcut
 from PIL import Image
 import os
 import sys
 
 from src.utils.theme import Colors, set_card_style, set_primary_button_style, set_accent_button_style, set_secondary_button_style
 from src.utils.icons import IconProvider
+from src.utils.qt_image import pil_to_qpixmap
 from src.ui.widgets.drag_drop_widget import DragDropWidget
 from src.ui.widgets.image_preview import ModernImagePreview
 from src.ui.widgets.progress_indicator import ModernProgressIndicator 
 from src.ui.widgets.algorithm_cards import AlgorithmSelector, AlgorithmCard
 
 from src.core.image_processor import ImageProcessor
+from src.core.jobs import JobRunner
+from src.core.print_layout import build_and_preview
 
 class ModernPhotoProcessor(QMainWindow):
     """现代化的旅行证照片处理主窗口"""
@@ -31,14 +35,37 @@ class ModernPhotoProcessor(QMainWindow):
         # 初始化数据
         self.original_image = None
         self.processed_image = None
+        self.bg_mask = None
         self.cropped_image = None
-        self.print_image = None
+        self.print_sheet = None
+        self.performance_panel = None
+        
+        # 后台任务执行器，耗时处理不在界面线程中运行；每个选项卡一个分组，
+        # 重新处理同一张照片时只显示最新提交的结果，其他照片的任务继续排队
+        self.job_runner = JobRunner(parent=self)
         
         # 创建UI
         self.init_ui()
         
         # 连接信号
         self.connect_signals()
+        
+        # Ctrl+Shift+P打开性能面板
+        QShortcut(QKeySequence("Ctrl+Shift+P"), self, self.show_performance_panel)
+    
+    def show_performance_panel(self):
+        """打开性能面板，面板打开期间记录各处理阶段的耗时"""
+        from src.ui.widgets.performance_panel import PerformancePanel
+        
+        if self.performance_panel is None or not self.performance_panel.isVisible():
+            self.performance_panel = PerformancePanel(self)
+            self.performance_panel.setAttribute(Qt.WA_DeleteOnClose)
+            self.performance_panel.destroyed.connect(self._performance_panel_closed)
+        self.performance_panel.show()
+        self.performance_panel.raise_()
+    
+    def _performance_panel_closed(self):
+        self.performance_panel = None
     
     def init_ui(self):
         """初始化用户界面"""
@@ -219,6 +246,18 @@ class ModernPhotoProcessor(QMainWindow):
         
         control_layout.addWidget(self.bg_algo_selector)
         
+        # 背景颜色（去除背景后可直接切换，不需要重新处理）
+        color_row = QHBoxLayout()
+        color_label = QLabel("背景颜色:")
+        color_label.setStyleSheet(f"font-size: 15px; font-weight: bold; color: {Colors.PRIMARY_DARK};")
+        color_row.addWidget(color_label)
+        self.bg_color_combo = QComboBox()
+        self.bg_color_combo.addItem("白色", "white")
+        self.bg_color_combo.addItem("蓝色", "blue")
+        self.bg_color_combo.addItem("红色", "red")
+        color_row.addWidget(self.bg_color_combo, 1)
+        control_layout.addLayout(color_row)
+        
         # 底部区域 - 操作按钮
         button_area = QWidget()
         button_layout = QHBoxLayout(button_area)
@@ -545,18 +584,22 @@ class ModernPhotoProcessor(QMainWindow):
         self.bg_upload_widget.clicked.connect(self.upload_image_for_bg)
         self.bg_process_btn.clicked.connect(self.process_background_removal)
         self.bg_save_btn.clicked.connect(self.save_bg_image)
+        self.bg_color_combo.currentIndexChanged.connect(self.update_bg_color)
+        self.bg_progress.cancel_requested.connect(lambda: self.job_runner.cancel("bg"))
         
         # 照片裁剪页面
         self.crop_upload_widget.image_dropped.connect(self.load_image_for_crop)
         self.crop_upload_widget.clicked.connect(self.upload_image_for_crop)
         self.crop_process_btn.clicked.connect(self.process_crop)
         self.crop_save_btn.clicked.connect(self.save_crop_image)
+        self.crop_progress.cancel_requested.connect(lambda: self.job_runner.cancel("crop"))
         
         # 照片排版页面
         self.print_upload_widget.image_dropped.connect(self.load_image_for_print)
         self.print_upload_widget.clicked.connect(self.upload_image_for_print)
         self.print_process_btn.clicked.connect(self.process_print_layout)
         self.print_save_btn.clicked.connect(self.save_print_image)
+        self.print_progress.cancel_requested.connect(lambda: self.job_runner.cancel("print"))
         
         # 设置默认选择项 - 解决初次打开时无法选择算法的问题
         self.bg_algo_selector.set_selected("rembg")
@@ -571,6 +614,7 @@ class ModernPhotoProcessor(QMainWindow):
             self.bg_upload_widget.load_preview(file_path)
             self.bg_image_preview.set_image(QPixmap(file_path))
             self.processed_image = None
+            self.bg_mask = None
             self.bg_save_btn.setEnabled(False)
         except Exception as e:
             QMessageBox.critical(self, "错误", f"无法打开图片: {str(e)}")
@@ -592,98 +636,118 @@ class ModernPhotoProcessor(QMainWindow):
         # 获取选中的算法
         method = self.bg_algo_selector.get_selected()
         
+        processor = ImageProcessor()
+        func = processor.segment_and_composite
+        args = (self.original_image,)
+        kwargs = {'method': method}
+        
+        if method == "api":
+            # 当用户选择"在线API"去除背景时
+            # 首先显示提示信息
+            QMessageBox.information(
+                self, 
+                "在线API说明", 
+                "您选择了Remove.bg在线API服务进行背景去除。\n\n"
+                "此功能需要API密钥才能使用。如果您没有API密钥，系统将自动使用AI抠图功能作为替代。\n\n"
+                "要获取API密钥，请访问: https://www.remove.bg/，注册账号并获取免费或付费的API密钥。"
+            )
+            
+            # 检查API密钥是否设置
+            api_key = processor.get_api_key()
+            if not api_key:
+                # 显示API密钥设置对话框
+                from src.ui.dialogs.api_key_dialog import ApiKeyDialog
+                dialog = ApiKeyDialog(self)
+                if dialog.exec_():
+                    api_key = dialog.get_api_key()
+            
+            if api_key:
+                # 使用API方法（经过remove_background以便使用蒙版缓存）
+                kwargs = {'method': "api", 'api_key': api_key}
+            else:
+                # API密钥未设置，回退到rembg方法
+                kwargs = {'method': "rembg"}
+        
         # 显示进度指示器
         self.bg_progress.start("正在去除背景...")
+        if method == "api" and kwargs['method'] != "api":
+            self.bg_progress.update_progress(10, "API密钥未设置，使用AI抠图...")
+        
+        # 在后台线程中分割并按当前背景颜色合成
+        bg_color = self.bg_color_combo.currentData()
+        self.job_runner.submit(
+            func, *args,
+            on_progress=self.bg_progress_updated,
+            on_result=lambda result: self.bg_removal_finished(result, bg_color),
+            on_error=self.bg_removal_failed,
+            on_cancelled=self.bg_removal_cancelled,
+            group="bg",
+            source=self.original_image,
+            bg_color=bg_color,
+            **kwargs
+        )
+    
+    def bg_progress_updated(self, value, text):
+        """更新背景去除进度"""
+        self.bg_progress.update_progress(value, text or f"处理中...{value}%")
+    
+    def bg_removal_finished(self, result, bg_color):
+        """背景去除完成，显示任务中按bg_color合成好的结果"""
+        if result is None:
+            self.bg_removal_failed("处理失败，未返回有效图像")
+            return
+        
+        self.bg_mask, image = result
+        self.show_bg_result(image)
+        self.bg_save_btn.setEnabled(True)
         
-        # 定义进度回调
-        def update_progress(value, text=None):
-            update_text = text if text else f"处理中...{value}%"
-            self.bg_progress.update_progress(value, update_text)
+        # 完成进度
+        self.bg_progress.complete("背景去除完成")
         
-        # 使用QTimer延迟执行，以便UI能够更新
-        self.bg_method = method
-        QTimer.singleShot(100, lambda: self.execute_bg_removal(update_progress))
+        # 处理期间换了背景颜色时按新颜色重新合成
+        if bg_color != self.bg_color_combo.currentData():
+            self.update_bg_color()
     
-    def execute_bg_removal(self, progress_callback):
-        """执行背景去除处理"""
-        try:
-            processor = ImageProcessor()
-            
-            if self.bg_method == "api":
-                # 当用户选择"在线API"去除背景时
-                # 首先显示提示信息
-                QMessageBox.information(
-                    self, 
-                    "在线API说明", 
-                    "您选择了Remove.bg在线API服务进行背景去除。\n\n"
-                    "此功能需要API密钥才能使用。如果您没有API密钥，系统将自动使用AI抠图功能作为替代。\n\n"
-                    "要获取API密钥，请访问: https://www.remove.bg/，注册账号并获取免费或付费的API密钥。"
-                )
-                
-                # 检查API密钥是否设置
-                api_key = processor.get_api_key()
-                if not api_key:
-                    # 显示API密钥设置对话框
-                    from src.ui.dialogs.api_key_dialog import ApiKeyDialog
-                    dialog = ApiKeyDialog(self)
-                    if dialog.exec_():
-                        api_key = dialog.get_api_key()
-                        # 如果用户设置了API密钥，使用API方法
-                        if api_key:
-                            self.processed_image = processor.remove_background_api(
-                                self.original_image,
-                                api_key,
-                                progress_callback=progress_callback
-                            )
-                        else:
-                            # 回退到rembg方法
-                            progress_callback(10, "API密钥未设置，使用AI抠图...")
-                            self.processed_image = processor.remove_background(
-                                self.original_image,
-                                progress_callback=progress_callback,
-                                method="rembg"
-                            )
-                    else:
-                        # 用户取消了API密钥设置
-                        progress_callback(10, "API密钥未设置，使用AI抠图...")
-                        self.processed_image = processor.remove_background(
-                            self.original_image,
-                            progress_callback=progress_callback,
-                            method="rembg"
-                        )
-                else:
-                    # 使用已设置的API密钥
-                    self.processed_image = processor.remove_background_api(
-                        self.original_image,
-                        api_key,
-                        progress_callback=progress_callback
-                    )
-            else:
-                # 使用选择的方法(rembg或grabcut)
-                self.processed_image = processor.remove_background(
-                    self.original_image,
-                    progress_callback=progress_callback,
-                    method=self.bg_method
-                )
-            
-            # 显示处理结果
-            if self.processed_image:
-                # 将PIL图像转换为QPixmap
-                self.processed_image.save("temp/processed.png", "PNG")
-                processed_pixmap = QPixmap("temp/processed.png")
-                
-                # 更新预览
-                self.bg_image_preview.set_processed_image(processed_pixmap)
-                self.bg_save_btn.setEnabled(True)
-                
-                # 完成进度
-                self.bg_progress.complete("背景去除完成")
-            else:
-                raise Exception("处理失败，未返回有效图像")
-                
-        except Exception as e:
-            self.bg_progress.error(f"处理出错: {str(e)}")
-            QMessageBox.critical(self, "错误", f"背景去除过程中发生错误: {str(e)}")
+    def show_bg_result(self, image):
+        """显示合成后的图像"""
+        self.processed_image = image
+        
+        # 将PIL图像直接转换为QPixmap并更新预览
+        self.bg_image_preview.set_processed_image(pil_to_qpixmap(image))
+    
+    def update_bg_color(self):
+        """用已有蒙版按选中的背景颜色在后台重新合成，不重新分割"""
+        if self.bg_mask is None:
+            return
+        
+        # 合成完成前保存的仍是旧颜色的图像，暂时禁用保存
+        mask = self.bg_mask
+        bg_color = self.bg_color_combo.currentData()
+        self.bg_save_btn.setEnabled(False)
+        self.job_runner.submit(
+            ImageProcessor.recomposite, mask, bg_color,
+            on_result=lambda image: self.bg_recomposite_finished(mask, image),
+            on_error=self.bg_removal_failed,
+            on_cancelled=lambda: self.bg_save_btn.setEnabled(mask is self.bg_mask),
+            group="bg",
+            source=mask
+        )
+    
+    def bg_recomposite_finished(self, mask, image):
+        """重新合成完成；期间换了照片或重新去除背景时丢弃结果"""
+        if mask is not self.bg_mask:
+            return
+        self.show_bg_result(image)
+        self.bg_save_btn.setEnabled(True)
+    
+    def bg_removal_failed(self, message):
+        """背景去除出错"""
+        self.bg_progress.error(f"处理出错: {message}")
+        QMessageBox.critical(self, "错误", f"背景去除过程中发生错误: {message}")
+    
+    def bg_removal_cancelled(self):
+        """背景去除已取消"""
+        self.bg_progress.error("已取消背景去除")
     
     def save_bg_image(self):
         """保存处理后的图像"""
@@ -743,85 +807,88 @@ class ModernPhotoProcessor(QMainWindow):
         # 获取选中的裁剪方法
         crop_method = self.crop_mode_selector.get_selected()
         
-        # 显示进度指示器
-        self.crop_progress.start("正在处理证件照...")
-        
-        # 定义进度回调
-        def update_progress(value, text=None):
-            update_text = text if text else f"处理中...{value}%"
-            self.crop_progress.update_progress(value, update_text)
+        processor = ImageProcessor()
         
-        # 使用QTimer延迟执行，以便UI能够更新
-        self.crop_method = crop_method
-        QTimer.singleShot(100, lambda: self.execute_crop(update_progress))
-    
-    def execute_crop(self, progress_callback):
-        """执行照片裁剪处理"""
-        try:
-            processor = ImageProcessor()
+        if crop_method == "manual":
+            # 手动调整：编辑器在界面线程中显示
+            # 导入这里以避免循环引用
+            from src.ui.dialogs.face_adjustment_editor import ModernFaceAdjustmentEditor
             
-            if self.crop_method == "auto":
-                # 自动裁剪
-                progress_callback(10, "检测人脸中...")
-                self.cropped_image = processor.auto_crop_id_photo(
-                    self.original_image, 
-                    progress_callback=progress_callback
-                )
-                
-                if self.cropped_image is None:
-                    raise Exception("未检测到人脸，请尝试使用清晰的正面照片或手动调整")
+            # 创建并显示编辑器
+            editor = ModernFaceAdjustmentEditor(self, self.original_image)
             
-            elif self.crop_method == "manual":
-                # 手动调整
-                progress_callback(10, "启动人脸位置编辑器...")
-                
-                # 导入这里以避免循环引用
-                from src.ui.dialogs.face_adjustment_editor import ModernFaceAdjustmentEditor
-                
-                # 暂时隐藏进度条，显示编辑器
-                self.crop_progress.hide_animation()
-                
-                # 创建并显示编辑器
-                editor = ModernFaceAdjustmentEditor(self, self.original_image)
-                
-                # 如果用户接受调整
-                if editor.exec_():
-                    # 显示进度条
-                    self.crop_progress.start("应用调整...")
-                    
-                    # 获取调整后的人脸位置和大小
-                    face_position, face_size = editor.get_result()
-                    
-                    # 手动裁剪
-                    progress_callback(30, "裁剪证件照...")
-                    self.cropped_image = processor.manual_crop_id_photo(
-                        self.original_image,
-                        face_position,
-                        face_size,
-                        progress_callback=progress_callback
-                    )
-                else:
-                    # 用户取消了编辑
-                    return
+            # 用户取消了编辑
+            if not editor.exec_():
+                return
             
-            # 显示处理结果
-            if self.cropped_image:
-                # 将PIL图像转换为QPixmap
-                self.cropped_image.save("temp/cropped.png", "PNG")
-                cropped_pixmap = QPixmap("temp/cropped.png")
-                
-                # 更新预览
-                self.crop_image_preview.set_processed_image(cropped_pixmap)
-                self.crop_save_btn.setEnabled(True)
-                
-                # 完成进度
-                self.crop_progress.complete("证件照裁剪完成")
-            else:
-                raise Exception("处理失败，未返回有效图像")
-                
-        except Exception as e:
-            self.crop_progress.error(f"处理出错: {str(e)}")
-            QMessageBox.critical(self, "错误", f"证件照裁剪过程中发生错误: {str(e)}")
+            # 获取调整后的人脸位置和大小
+            face_position, face_size = editor.get_result()
+            
+            # 显示进度条
+            self.crop_progress.start("应用调整...")
+            self.job_runner.submit(
+                processor.manual_crop_id_photo,
+                self.original_image,
+                face_position,
+                face_size,
+                on_progress=self.crop_progress_updated,
+                on_result=self.crop_finished,
+                on_error=self.crop_failed,
+                on_cancelled=self.crop_cancelled,
+                group="crop",
+                source=self.original_image
+            )
+        else:
+            # 自动裁剪
+            self.crop_progress.start("正在处理证件照...")
+            self.job_runner.submit(
+                processor.auto_crop_id_photo,
+                self.original_image,
+                on_progress=self.crop_progress_updated,
+                on_result=self.auto_crop_finished,
+                on_error=self.crop_failed,
+                on_cancelled=self.crop_cancelled,
+                group="crop",
+                source=self.original_image
+            )
+    
+    def crop_progress_updated(self, value, text):
+        """更新裁剪进度"""
+        self.crop_progress.update_progress(value, text or f"处理中...{value}%")
+    
+    def auto_crop_finished(self, result):
+        """自动裁剪完成"""
+        if result is None:
+            self.crop_failed("未检测到人脸，请尝试使用清晰的正面照片或手动调整")
+            return
+        self.crop_finished(result)
+    
+    def crop_finished(self, result):
+        """裁剪完成，显示处理结果"""
+        if result is None:
+            self.crop_failed("处理失败，未返回有效图像")
+            return
+        
+        self.cropped_image = result
+        
+        # 将PIL图像直接转换为QPixmap
+        cropped_pixmap = pil_to_qpixmap(self.cropped_image)
+        
+        # 更新预览
+        self.crop_image_preview.set_processed_image(cropped_pixmap)
+        self.crop_save_btn.setEnabled(True)
+        
+        # 完成进度
+        self.crop_progress.complete("证件照裁剪完成")
+    
+    def crop_failed(self, message):
+        """裁剪出错"""
+        self.crop_progress.error(f"处理出错: {message}")
+        QMessageBox.critical(self, "错误", f"证件照裁剪过程中发生错误: {message}")
+    
+    def crop_cancelled(self):
+        """裁剪已取消"""
+        self.crop_progress.error("已取消裁剪")
     
     def save_crop_image(self):
         """保存裁剪后的证件照"""
@@ -859,7 +926,7 @@ class ModernPhotoProcessor(QMainWindow):
             self.cropped_image = Image.open(file_path)
             self.print_upload_widget.load_preview(file_path)
             self.print_image_preview.set_image(QPixmap(file_path))
-            self.print_image = None
+            self.print_sheet = None
             self.print_save_btn.setEnabled(False)
         except Exception as e:
             QMessageBox.critical(self, "错误", f"无法打开图片: {str(e)}")
@@ -881,148 +948,184 @@ class ModernPhotoProcessor(QMainWindow):
         # 获取选中的排版方法
         print_method = self.print_params_selector.get_selected()
         
+        processor = ImageProcessor()
+        
+        if print_method == "mix":
+            # 混合排版 (一寸4张 + 二寸2张)
+            mix_params = {
+                'small_count': 4,  # 一寸照片数量
+                'large_count': 2,  # 二寸照片数量
+                'spacing': 10,     # 间距(像素)
+                'dpi': 300         # 打印DPI
+            }
+            builder = processor.mixed_print_sheet
+            args = (self.cropped_image, mix_params)
+            start_text = "创建混合排版..."
+        
+        elif print_method == "custom":
+            # 自定义排版：参数对话框在界面线程中显示
+            custom_params = self.ask_custom_layout_params()
+            if custom_params is None:
+                # 用户取消了设置
+                return
+            builder = processor.custom_print_sheet
+            args = (self.cropped_image, custom_params)
+            start_text = "创建自定义排版..."
+        
+        else:
+            # 标准排版
+            builder = processor.print_sheet
+            args = (self.cropped_image,)
+            start_text = "创建标准排版..."
+        
         # 显示进度指示器
-        self.print_progress.start("正在生成排版...")
+        self.print_progress.start(start_text)
+        self.job_runner.submit(
+            build_and_preview, builder, *args,
+            on_progress=self.print_progress_updated,
+            on_result=self.print_layout_finished,
+            on_error=self.print_layout_failed,
+            on_cancelled=self.print_layout_cancelled,
+            group="print",
+            source=self.cropped_image
+        )
+    
+    def ask_custom_layout_params(self):
+        """显示自定义排版参数对话框，取消时返回None"""
+        # 创建自定义参数对话框
+        custom_dialog = QDialog(self)
+        custom_dialog.setWindowTitle("自定义排版参数")
+        dialog_layout = QVBoxLayout(custom_dialog)
+        content_layout = QHBoxLayout()
+        
+        # 添加表单布局
+        form_layout = QFormLayout()
+        
+        # 行数选择
+        rows_spin = QSpinBox()
+        rows_spin.setRange(1, 10)
+        rows_spin.setValue(4)
+        rows_spin.setToolTip("排版的行数")
+        form_layout.addRow("行数:", rows_spin)
+        
+        # 列数选择
+        cols_spin = QSpinBox()
+        cols_spin.setRange(1, 10)
+        cols_spin.setValue(3)
+        cols_spin.setToolTip("排版的列数")
+        form_layout.addRow("列数:", cols_spin)
+        
+        # 间距选择
+        spacing_spin = QSpinBox()
+        spacing_spin.setRange(0, 100)
+        spacing_spin.setValue(10)
+        spacing_spin.setSuffix(" px")
+        spacing_spin.setToolTip("照片之间的间距(像素)")
+        form_layout.addRow("间距:", spacing_spin)
+        
+        # DPI选择
+        dpi_spin = QSpinBox()
+        dpi_spin.setRange(72, 600)
+        dpi_spin.setValue(300)
+        dpi_spin.setToolTip("打印分辨率(DPI)")
+        form_layout.addRow("DPI:", dpi_spin)
+        
+        # 预览：从缩小后的照片渲染屏幕分辨率的页面，参数停止变化片刻后更新
+        preview_label = QLabel()
+        preview_label.setFixedSize(300, 424)
+        # 照片在预览中不会超过预览区域，对话框打开时缩小一次，之后每次更新都从小图缩放，不经过排版缓存
+        preview_source = self.cropped_image.convert("RGB")
+        preview_source.thumbnail((preview_label.width(), preview_label.height()), Image.BILINEAR)
+        preview_label.setAlignment(Qt.AlignCenter)
+        preview_label.setStyleSheet(f"background-color: {Colors.BACKGROUND}; border: 1px solid {Colors.BORDER};")
+        preview_info = QLabel()
+        preview_info.setAlignment(Qt.AlignCenter)
+        
+        def current_params():
+            return {
+                'rows': rows_spin.value(),        # 行数
+                'columns': cols_spin.value(),     # 列数
+                'spacing': spacing_spin.value(),  # 间距(像素)
+                'dpi': dpi_spin.value()           # 打印DPI
+            }
         
-        # 定义进度回调
-        def update_progress(value, text=None):
-            update_text = text if text else f"处理中...{value}%"
-            self.print_progress.update_progress(value, update_text)
+        def update_preview():
+            try:
+                params = current_params()
+                preview = ImageProcessor.custom_print_preview(
+                    preview_source, self.cropped_image.size, params, preview_label.width(), preview_label.height())
+                preview_label.setPixmap(pil_to_qpixmap(preview))
+                (page_width, page_height), (photo_width, photo_height), _ = ImageProcessor.custom_layout(
+                    self.cropped_image.size, params)
+                preview_info.setText(f"页面 {page_width}x{page_height} px，照片 {photo_width}x{photo_height} px")
+            except Exception as e:
+                print(f"更新排版预览出错: {str(e)}")
+        
+        # 连续调整（按住箭头、滚轮）时只在最后一次变化后更新
+        preview_timer = QTimer(custom_dialog)
+        preview_timer.setSingleShot(True)
+        preview_timer.setInterval(120)
+        preview_timer.timeout.connect(update_preview)
+        for spin in (rows_spin, cols_spin, spacing_spin, dpi_spin):
+            spin.valueChanged.connect(preview_timer.start)
+        update_preview()
+        
+        preview_layout = QVBoxLayout()
+        preview_layout.addWidget(preview_label)
+        preview_layout.addWidget(preview_info)
+        
+        # 添加表单和预览到对话框
+        content_layout.addLayout(form_layout)
+        content_layout.addLayout(preview_layout)
+        dialog_layout.addLayout(content_layout)
+        
+        # 添加按钮
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.accepted.connect(custom_dialog.accept)
+        button_box.rejected.connect(custom_dialog.reject)
+        dialog_layout.addWidget(button_box)
+        
+        if not custom_dialog.exec_():
+            return None
+        
+        # 获取用户设置的参数，确定后再按完整DPI渲染
+        return current_params()
+    
+    def print_progress_updated(self, value, text):
+        """更新排版进度"""
+        self.print_progress.update_progress(value, text or f"处理中...{value}%")
+    
+    def print_layout_finished(self, result):
+        """排版完成，显示处理结果"""
+        if result is None:
+            self.print_layout_failed("处理失败，未返回有效图像")
+            return
         
-        # 使用QTimer延迟执行，以便UI能够更新
-        self.print_method = print_method
-        QTimer.singleShot(100, lambda: self.execute_print_layout(update_progress))
+        # 只保留页面描述，界面显示缩小的预览，整页在保存时才按格式写出
+        self.print_sheet, preview = result
+        
+        # 将PIL图像直接转换为QPixmap
+        print_pixmap = pil_to_qpixmap(preview)
+        
+        # 更新预览
+        self.print_image_preview.set_processed_image(print_pixmap)
+        self.print_save_btn.setEnabled(True)
+        
+        # 完成进度
+        self.print_progress.complete("排版生成完成")
     
-    def execute_print_layout(self, progress_callback):
-        """执行照片排版处理"""
-        try:
-            processor = ImageProcessor()
-            
-            if self.print_method == "standard":
-                # 标准排版
-                progress_callback(20, "创建标准排版...")
-                self.print_image = processor.create_print_layout(
-                    self.cropped_image,
-                    progress_callback=progress_callback
-                )
-            
-            elif self.print_method == "mix":
-                # 混合排版 (一寸4张 + 二寸2张)
-                progress_callback(20, "创建混合排版...")
-                mix_params = {
-                    'small_count': 4,  # 一寸照片数量
-                    'large_count': 2,  # 二寸照片数量
-                    'spacing': 10,     # 间距(像素)
-                    'dpi': 300         # 打印DPI
-                }
-                self.print_image = processor.create_mixed_print_layout(
-                    self.cropped_image,
-                    mix_params,
-                    progress_callback=progress_callback
-                )
-            
-            elif self.print_method == "custom":
-                # 自定义排版
-                progress_callback(20, "准备自定义排版...")
-                
-                # 导入对话框避免循环引用
-                from PySide6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QSpinBox, QDialogButtonBox, QLabel
-                
-                # 创建自定义参数对话框
-                custom_dialog = QDialog(self)
-                custom_dialog.setWindowTitle("自定义排版参数")
-                dialog_layout = QVBoxLayout(custom_dialog)
-                
-                # 添加表单布局
-                form_layout = QFormLayout()
-                
-                # 行数选择
-                rows_spin = QSpinBox()
-                rows_spin.setRange(1, 10)
-                rows_spin.setValue(4)
-                rows_spin.setToolTip("排版的行数")
-                form_layout.addRow("行数:", rows_spin)
-                
-                # 列数选择
-                cols_spin = QSpinBox()
-                cols_spin.setRange(1, 10)
-                cols_spin.setValue(3)
-                cols_spin.setToolTip("排版的列数")
-                form_layout.addRow("列数:", cols_spin)
-                
-                # 间距选择
-                spacing_spin = QSpinBox()
-                spacing_spin.setRange(0, 100)
-                spacing_spin.setValue(10)
-                spacing_spin.setSuffix(" px")
-                spacing_spin.setToolTip("照片之间的间距(像素)")
-                form_layout.addRow("间距:", spacing_spin)
-                
-                # DPI选择
-                dpi_spin = QSpinBox()
-                dpi_spin.setRange(72, 600)
-                dpi_spin.setValue(300)
-                dpi_spin.setToolTip("打印分辨率(DPI)")
-                form_layout.addRow("DPI:", dpi_spin)
-                
-                # 添加表单到对话框
-                dialog_layout.addLayout(form_layout)
-                
-                # 添加按钮
-                button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
-                button_box.accepted.connect(custom_dialog.accept)
-                button_box.rejected.connect(custom_dialog.reject)
-                dialog_layout.addWidget(button_box)
-                
-                # 暂时隐藏进度条，显示对话框
-                self.print_progress.hide_animation()
-                
-                # 如果用户接受设置
-                if custom_dialog.exec_():
-                    # 显示进度条
-                    self.print_progress.start("创建自定义排版...")
-                    
-                    # 获取用户设置的参数
-                    custom_params = {
-                        'rows': rows_spin.value(),        # 行数
-                        'columns': cols_spin.value(),     # 列数
-                        'spacing': spacing_spin.value(),  # 间距(像素)
-                        'dpi': dpi_spin.value()           # 打印DPI
-                    }
-                    
-                    # 创建自定义排版
-                    self.print_image = processor.create_custom_print_layout(
-                        self.cropped_image,
-                        custom_params,
-                        progress_callback=progress_callback
-                    )
-                else:
-                    # 用户取消了设置
-                    self.print_progress.error("已取消自定义排版")
-                    return
-            
-            # 显示处理结果
-            if self.print_image:
-                # 将PIL图像转换为QPixmap
-                self.print_image.save("temp/print_layout.png", "PNG")
-                print_pixmap = QPixmap("temp/print_layout.png")
-                
-                # 更新预览
-                self.print_image_preview.set_processed_image(print_pixmap)
-                self.print_save_btn.setEnabled(True)
-                
-                # 完成进度
-                self.print_progress.complete("排版生成完成")
-            else:
-                raise Exception("处理失败，未返回有效图像")
-                
-        except Exception as e:
-            self.print_progress.error(f"处理出错: {str(e)}")
-            QMessageBox.critical(self, "错误", f"证件照排版过程中发生错误: {str(e)}")
+    def print_layout_failed(self, message):
+        """排版出错"""
+        self.print_progress.error(f"处理出错: {message}")
+        QMessageBox.critical(self, "错误", f"证件照排版过程中发生错误: {message}")
+    
+    def print_layout_cancelled(self):
+        """排版已取消"""
+        self.print_progress.error("已取消排版")
     
     def save_print_image(self):
         """保存排版后的打印文件"""
-        if self.print_image is None:
+        if self.print_sheet is None:
             return
             
         file_path, file_type = QFileDialog.getSaveFileName(
@@ -1033,21 +1136,22 @@ class ModernPhotoProcessor(QMainWindow):
         if file_path:
             try:
                 # 从选择的过滤器提取格式
-                if "PDF" in file_type:
-                    # 保存为PDF
-                    self.print_image.convert('RGB').save(file_path, "PDF", resolution=300.0)
-                else:
-                    # 保存为其他格式
-                    format_mapping = {
-                        "PNG (*.png)": "PNG",
-                        "JPEG (*.jpg *.jpeg)": "JPEG",
-                        "TIFF (*.tif *.tiff)": "TIFF"
-                    }
-                    
-                    # 默认为PNG
-                    format = format_mapping.get(file_type, "PNG")
-                    self.print_image.save(file_path, format)
+                format_mapping = {
+                    "PNG (*.png)": "PNG",
+                    "JPEG (*.jpg *.jpeg)": "JPEG",
+                    "TIFF (*.tif *.tiff)": "TIFF",
+                    "PDF (*.pdf)": "PDF"
+                }
+                
+                # 默认为PNG；PNG按条带编码，PDF每种照片只嵌入一次，其他格式在此时才渲染整页
+                format = format_mapping.get(file_type, "PNG")
+                self.print_sheet.save(file_path, format)
                     
                 QMessageBox.information(self, "成功", "打印文件已成功保存！")
             except Exception as e:
-                QMessageBox.critical(self, "错误", f"保存打印文件时出错: {str(e)}")
\ No newline at end of file
+                QMessageBox.critical(self, "错误", f"保存打印文件时出错: {str(e)}")
+    
+    def closeEvent(self, event):
+        """关闭窗口前清空排队的任务并等待正在执行的任务"""
+        self.job_runner.shutdown()
+        super().closeEvent(event)
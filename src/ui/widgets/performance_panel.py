@@ -0,0 +1,95 @@
+"""
+旅行证照片处理 - 性能面板
+显示各处理阶段的次数、平均和最大耗时，以及最近的阶段记录
+"""
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTableWidget, QTableWidgetItem,
+                               QHeaderView, QPushButton)
+from PySide6.QtCore import Qt, QTimer
+from src.utils.theme import Colors, set_secondary_button_style
+from src.core.profiling import StatsSink, profiler
+
+
+class PerformancePanel(QWidget):
+    """性能面板
+
+    创建时向全局剖析器添加一个StatsSink（启用剖析），关闭时移除；
+    阶段记录可能来自后台线程，面板按固定间隔在界面线程中刷新。
+    """
+
+    REFRESH_INTERVAL_MS = 500
+    RECENT_ROWS = 30
+
+    def __init__(self, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.setWindowTitle("性能面板")
+        self.resize(560, 520)
+
+        self.sink = profiler.add_sink(StatsSink())
+
+        layout = QVBoxLayout(self)
+
+        title = QLabel("各阶段耗时")
+        title.setStyleSheet(f"color: {Colors.PRIMARY_DARK}; font-size: 16px; font-weight: bold;")
+        layout.addWidget(title)
+
+        self.stats_table = self._create_table(["阶段", "次数", "平均ms", "最大ms", "最近ms"])
+        layout.addWidget(self.stats_table, 1)
+
+        recent_title = QLabel("最近记录")
+        recent_title.setStyleSheet(f"color: {Colors.PRIMARY_DARK}; font-size: 16px; font-weight: bold;")
+        layout.addWidget(recent_title)
+
+        self.recent_table = self._create_table(["阶段", "耗时ms", "线程", "附加信息"])
+        layout.addWidget(self.recent_table, 1)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        clear_btn = QPushButton("清空")
+        set_secondary_button_style(clear_btn)
+        clear_btn.clicked.connect(self.clear)
+        button_layout.addWidget(clear_btn)
+        layout.addLayout(button_layout)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(self.REFRESH_INTERVAL_MS)
+
+    @staticmethod
+    def _create_table(headers):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.verticalHeader().setVisible(False)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        return table
+
+    @staticmethod
+    def _fill(table, rows):
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                text = f"{value:.1f}" if isinstance(value, float) else str(value)
+                item = QTableWidgetItem(text)
+                if not isinstance(value, str):
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                table.setItem(row, column, item)
+
+    def refresh(self):
+        """从StatsSink读取最新数据"""
+        self._fill(self.stats_table, self.sink.snapshot())
+        recent = self.sink.recent()[-self.RECENT_ROWS:]
+        self._fill(self.recent_table, [
+            (record.name, record.duration_ns / 1e6, record.thread_name,
+             ", ".join(f"{key}={value}" for key, value in (record.args or {}).items()))
+            for record in reversed(recent)
+        ])
+
+    def clear(self):
+        self.sink.clear()
+        self.refresh()
+
+    def closeEvent(self, event):
+        """关闭面板时停止剖析（没有其他输出时）"""
+        self.timer.stop()
+        profiler.remove_sink(self.sink)
+        super().closeEvent(event)
@@ -2,10 +2,10 @@
 旅行证照片处理 - 进度指示器
 提供现代化的进度显示组件
 """
-from PySide6.QtWidgets import QWidget, QLabel, QVBoxLayout, QProgressBar, QGraphicsOpacityEffect
-from PySide6.QtCore import Qt, QPropertyAnimation, QTimer, QSize, Property, QEasingCurve
+from PySide6.QtWidgets import QWidget, QLabel, QVBoxLayout, QProgressBar, QGraphicsOpacityEffect, QPushButton
+from PySide6.QtCore import Qt, QPropertyAnimation, QTimer, QSize, Property, QEasingCurve, Signal
 from PySide6.QtGui import QPainter, QColor, QPen
-from src.utils.theme import Colors
+from src.utils.theme import Colors, set_secondary_button_style
 
 class CircleProgressBar(QWidget):
     """圆形进度条"""
@@ -62,6 +62,9 @@ class CircleProgressBar(QWidget):
 class ModernProgressIndicator(QWidget):
     """现代风格进度指示器"""
     
+    # 点击取消按钮
+    cancel_requested = Signal()
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         
@@ -86,6 +89,12 @@ class ModernProgressIndicator(QWidget):
         self.percent_label.setStyleSheet(f"color: {Colors.PRIMARY}; font-size: 16px; font-weight: bold;")
         layout.addWidget(self.percent_label)
         
+        # 取消按钮
+        self.cancel_btn = QPushButton("取消")
+        set_secondary_button_style(self.cancel_btn)
+        self.cancel_btn.clicked.connect(self._on_cancel_clicked)
+        layout.addWidget(self.cancel_btn, 0, Qt.AlignCenter)
+        
         self.setLayout(layout)
         
         # 不使用时初始隐藏
@@ -106,6 +115,8 @@ class ModernProgressIndicator(QWidget):
         self.label.setText(text)
         self.percent_label.setText("0%")
         self.circle_progress.set_progress(0)
+        self.cancel_btn.setEnabled(True)
+        self.cancel_btn.setVisible(True)
         
         # 淡入显示
         self.setWindowOpacity(0)
@@ -138,6 +149,7 @@ class ModernProgressIndicator(QWidget):
         # 更新百分比和文本
         self.percent_label.setText("100%")
         self.label.setText(text)
+        self.cancel_btn.setVisible(False)
         
         # 自动隐藏
         if auto_hide:
@@ -152,11 +164,18 @@ class ModernProgressIndicator(QWidget):
         # 更新文本
         self.label.setText(text)
         self.label.setStyleSheet(f"color: {Colors.ERROR}; font-size: 14px;")
+        self.cancel_btn.setVisible(False)
         
         # 自动隐藏
         if auto_hide:
             QTimer.singleShot(delay, self.hide_animation)
     
+    def _on_cancel_clicked(self):
+        """请求取消当前处理"""
+        self.cancel_btn.setEnabled(False)
+        self.label.setText("正在取消...")
+        self.cancel_requested.emit()
+    
     def hide_animation(self):
         """动画方式隐藏"""
         self.fade_animation.setStartValue(1)
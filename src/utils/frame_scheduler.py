@@ -0,0 +1,91 @@
+"""
+证件照处理系统 - 界面刷新调度
+合并短时间内的多次更新请求，每帧最多刷新一次
+"""
+import time
+
+from PySide6.QtCore import QObject, QTimer
+
+from src.core.profiling import profiler
+
+
+class FrameScheduler(QObject):
+    """按目标帧率合并刷新请求的调度器
+
+    每次状态变化调用request()，调度器保证两次刷新之间至少间隔一帧，
+    期间到达的请求会被合并为一次刷新。
+    每次刷新记录为名为name的剖析区间（附带合并的请求数），显示在性能面板中。
+    """
+
+    def __init__(self, callback, target_fps=60, parent=None, name="frame"):
+        super().__init__(parent)
+        self._callback = callback
+        self.name = name
+        self._interval = 1.0 / target_fps
+        self._last_render = 0.0
+        self._requests_since_render = 0
+
+        # 单次定时器，到期时执行一次刷新
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._render)
+
+        # 统计信息
+        self.events_received = 0
+        self.frames_rendered = 0
+        self.render_time_total = 0.0
+
+    @property
+    def target_fps(self):
+        return 1.0 / self._interval
+
+    def set_target_fps(self, target_fps):
+        """设置目标帧率"""
+        self._interval = 1.0 / target_fps
+
+    def request(self):
+        """请求一次刷新，已有待执行的刷新时直接合并"""
+        self.events_received += 1
+        self._requests_since_render += 1
+        if self._timer.isActive():
+            return
+
+        # 距上次刷新不足一帧时推迟到下一帧
+        elapsed = time.perf_counter() - self._last_render
+        delay = max(0.0, self._interval - elapsed)
+        self._timer.start(int(delay * 1000))
+
+    def flush(self):
+        """立即执行待处理的刷新（如拖动结束时）"""
+        if self._timer.isActive():
+            self._timer.stop()
+            self._render()
+
+    def is_pending(self):
+        """是否有待执行的刷新"""
+        return self._timer.isActive()
+
+    def _render(self):
+        start_time = time.perf_counter()
+        with profiler.span(self.name, requests=self._requests_since_render):
+            self._callback()
+        self._requests_since_render = 0
+        self._last_render = time.perf_counter()
+        self.frames_rendered += 1
+        self.render_time_total += self._last_render - start_time
+
+    def stats(self):
+        """返回收到的请求数、实际刷新次数和平均刷新耗时（毫秒）"""
+        average = self.render_time_total / self.frames_rendered * 1000 if self.frames_rendered else 0.0
+        return {
+            "events_received": self.events_received,
+            "frames_rendered": self.frames_rendered,
+            "coalesced": self.events_received - self.frames_rendered,
+            "average_render_ms": average,
+        }
+
+    def reset_stats(self):
+        """清零统计信息"""
+        self.events_received = 0
+        self.frames_rendered = 0
+        self.render_time_total = 0.0
@@ -0,0 +1,48 @@
+"""
+证件照处理系统 - 图像格式转换
+在PIL图像、NumPy数组和QImage/QPixmap之间转换，不经过临时文件
+"""
+import numpy as np
+from PySide6.QtGui import QImage, QPixmap
+
+# NumPy通道数对应的QImage格式
+_CHANNEL_FORMATS = {
+    1: QImage.Format_Grayscale8,
+    3: QImage.Format_RGB888,
+    4: QImage.Format_RGBA8888,
+}
+
+
+def numpy_to_qimage(array):
+    """将uint8数组（HxW、HxWx3 RGB或HxWx4 RGBA）包装为QImage
+
+    QImage直接引用数组内存而不复制，数组保存在QImage的属性上，
+    保证在QImage使用期间不会被释放。
+    """
+    if array.dtype != np.uint8:
+        raise ValueError(f"不支持的数组类型: {array.dtype}")
+
+    channels = 1 if array.ndim == 2 else array.shape[2]
+    if channels not in _CHANNEL_FORMATS:
+        raise ValueError(f"不支持的通道数: {channels}")
+
+    # 行内像素必须连续，行间可以有间隔（使用strides作为每行字节数）
+    if array.strides[-1] != 1 or (array.ndim == 3 and array.strides[1] != channels):
+        array = np.ascontiguousarray(array)
+
+    height, width = array.shape[:2]
+    qimage = QImage(array.data, width, height, array.strides[0], _CHANNEL_FORMATS[channels])
+    qimage._buffer = array
+    return qimage
+
+
+def pil_to_qimage(image):
+    """将PIL图像转换为QImage（只有PIL到NumPy的一次复制）"""
+    if image.mode not in ("RGB", "RGBA", "L"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    return numpy_to_qimage(np.asarray(image))
+
+
+def pil_to_qpixmap(image):
+    """将PIL图像转换为用于显示的QPixmap"""
+    return QPixmap.fromImage(pil_to_qimage(image))
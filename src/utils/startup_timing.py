@@ -0,0 +1,98 @@
+"""
+旅行证照片处理 - 启动耗时统计
+记录启动各阶段耗时和各模块的导入耗时（类似python -X importtime），用于排查启动慢的问题
+"""
+import builtins
+import sys
+import threading
+import time
+
+
+class StartupTimer:
+    """启动计时器
+
+    mark()记录从上一个阶段结束到现在的耗时；trace_imports()开始后，
+    主线程中每个首次导入的模块都记录自身耗时和包含子模块的累计耗时。
+    """
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self._last_mark = self.start_time
+        self.phases = []
+        self.imports = []
+
+        self._original_import = None
+        self._stack = []
+
+    def mark(self, name):
+        """记录一个阶段，返回该阶段耗时（秒）"""
+        now = time.perf_counter()
+        duration = now - self._last_mark
+        self.phases.append((name, duration))
+        self._last_mark = now
+        return duration
+
+    def elapsed(self):
+        """从创建计时器到现在的总耗时（秒）"""
+        return time.perf_counter() - self.start_time
+
+    def trace_imports(self):
+        """开始记录模块导入耗时"""
+        if self._original_import is not None:
+            return
+        self._original_import = builtins.__import__
+        main_thread = threading.main_thread()
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            # 只统计主线程中的首次绝对导入，已导入的模块直接交给原函数
+            if level or name in sys.modules or threading.current_thread() is not main_thread:
+                return self._original_import(name, globals, locals, fromlist, level)
+
+            self._stack.append(0.0)
+            start_time = time.perf_counter()
+            try:
+                return self._original_import(name, globals, locals, fromlist, level)
+            finally:
+                cumulative = time.perf_counter() - start_time
+                children = self._stack.pop()
+                if self._stack:
+                    self._stack[-1] += cumulative
+                self.imports.append((name, cumulative - children, cumulative, len(self._stack)))
+
+        builtins.__import__ = timed_import
+
+    def stop_tracing_imports(self):
+        """停止记录模块导入耗时"""
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def slowest_imports(self, count=15):
+        """自身耗时最长的导入（不含其中首次导入的其他模块）"""
+        return sorted(self.imports, key=lambda record: record[1], reverse=True)[:count]
+
+    def to_dict(self):
+        """以毫秒为单位导出全部记录，便于保存为JSON"""
+        return {
+            "total_ms": round(self.elapsed() * 1000, 1),
+            "phases": {name: round(duration * 1000, 1) for name, duration in self.phases},
+            "imports": [
+                {"module": name, "self_ms": round(own * 1000, 1), "cumulative_ms": round(cumulative * 1000, 1),
+                 "depth": depth}
+                for name, own, cumulative, depth in self.imports
+            ],
+        }
+
+    def report(self, count=15, file=None):
+        """输出各阶段耗时和最慢的导入"""
+        file = file or sys.stderr
+        print("启动耗时:", file=file)
+        for name, duration in self.phases:
+            print(f"  {duration * 1000:>9.1f} ms  {name}", file=file)
+        print(f"  {sum(duration for _, duration in self.phases) * 1000:>9.1f} ms  合计", file=file)
+
+        if self.imports:
+            print("最慢的导入（自身 / 累计）:", file=file)
+            for name, own, cumulative, _ in self.slowest_imports(count):
+                print(f"  {own * 1000:>9.1f} ms {cumulative * 1000:>9.1f} ms  {name}", file=file)
+        file.flush()
@@ -0,0 +1,46 @@
+"""
+多进程批量执行器测试
+用替换的处理函数模拟卡在原生代码中、无法响应取消的照片，不加载模型
+"""
+import os
+import time
+
+import pytest
+
+from src.core import batch_executor
+from src.core.batch_executor import BatchExecutor
+
+
+def fake_process_item(path, output_dir, name, timeout, options):
+    """名字里带stuck的照片永远不返回，其他照片稍等后成功"""
+    if "stuck" in path:
+        while True:
+            time.sleep(1)
+    time.sleep(0.2)
+    return {"input": path, "status": "ok", "worker": os.getpid()}
+
+
+@pytest.fixture
+def fake_worker(monkeypatch):
+    # 工作进程由fork创建，继承替换后的处理函数；跳过模型预加载
+    monkeypatch.setattr(batch_executor, "_process_item", fake_process_item)
+    monkeypatch.setattr(batch_executor, "_init_worker", lambda *args: None)
+
+
+def test_stuck_item_is_terminated_and_others_finish(fake_worker, tmp_path):
+    # 照片足够多，终止工作进程时另一个进程还在处理其他照片，它们应当重新处理而不是记为失败
+    files = ["stuck.jpg"] + [f"{index}.jpg" for index in range(20)]
+    executor = BatchExecutor(workers=2, item_timeout=2)
+
+    start = time.monotonic()
+    records = executor.run(files, str(tmp_path))
+
+    assert time.monotonic() - start < 30
+    assert [record["input"] for record in records] == files
+    assert records[0]["status"] == "error"
+    assert "已终止工作进程" in records[0]["error"]
+    assert all(record["status"] == "ok" for record in records[1:])
+
+
+def test_item_timeout_can_be_disabled():
+    assert BatchExecutor(workers=1, item_timeout=0).item_timeout is None
@@ -0,0 +1,119 @@
+"""
+裁剪窗口重采样的回归测试
+_resample_window只对裁剪窗口做warpAffine，与原来"整张图cv2.resize后切片"的结果比较
+"""
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+import src.core.image_processor as image_processor
+from src.core.image_processor import ImageProcessor
+
+# warpAffine把采样坐标量化到1/32像素，cv2.resize的权重精度更高，
+# 高对比度边缘上两者的差异因此可达数个灰度级：3像素黑白棋盘格实测最大为8，真实照片最大为4
+RESIZE_TOLERANCE = 8
+
+TARGET_WIDTH = 390
+TARGET_HEIGHT = 567
+
+
+def high_contrast_images(height, width):
+    """随机噪声、细棋盘格和大块黑白格，都是重采样误差最大的情形"""
+    rng = np.random.default_rng(0)
+    yy, xx = np.mgrid[:height, :width]
+    return {
+        "noise": rng.integers(0, 256, (height, width, 3), dtype=np.uint8),
+        "checker": np.repeat(((yy // 3 + xx // 3) % 2 * 255).astype(np.uint8)[..., np.newaxis], 3, axis=2),
+        "blocks": np.repeat(((yy // 37 + xx // 53) % 2 * 255).astype(np.uint8)[..., np.newaxis], 3, axis=2),
+    }
+
+
+def crop_windows(width, height, face_height):
+    """与auto/manual裁剪相同的算法得到缩放尺寸，并给出四角和中间的裁剪位置（包括超出边界被截断的情形）"""
+    scale = int(TARGET_HEIGHT * 0.635) / face_height
+    new_width, new_height = int(width * scale), int(height * scale)
+    for crop_x, crop_y in ((0, 0), (new_width // 3, new_height // 4), (new_width, new_height)):
+        crop_x = max(0, min(crop_x, new_width - TARGET_WIDTH))
+        crop_y = max(0, min(crop_y, new_height - TARGET_HEIGHT))
+        yield new_width, new_height, crop_x, crop_y
+
+
+def old_resize_and_slice(image, new_width, new_height, crop_x, crop_y):
+    """原来的实现：整张图缩放后切片"""
+    resized = cv2.resize(image, (new_width, new_height))
+    return resized[crop_y:crop_y + TARGET_HEIGHT, crop_x:crop_x + TARGET_WIDTH]
+
+
+def max_difference(a, b):
+    return int(np.abs(a.astype(np.int16) - b.astype(np.int16)).max())
+
+
+@pytest.mark.parametrize("height, width", [(3000, 4000), (800, 600), (300, 200)])
+@pytest.mark.parametrize("face_height", [50, 120, 333, 900])
+def test_resample_window_matches_resize_and_slice(height, width, face_height):
+    if face_height > height:
+        pytest.skip("人脸高度超过图像高度")
+    for name, image in high_contrast_images(height, width).items():
+        for new_width, new_height, crop_x, crop_y in crop_windows(width, height, face_height):
+            expected = old_resize_and_slice(image, new_width, new_height, crop_x, crop_y)
+            actual = ImageProcessor._resample_window(
+                image, (width, height), (new_width, new_height), crop_x, crop_y,
+                min(TARGET_WIDTH, new_width - crop_x), min(TARGET_HEIGHT, new_height - crop_y))
+
+            assert actual.shape == expected.shape, name
+            assert max_difference(actual, expected) <= RESIZE_TOLERANCE, name
+
+
+def test_resample_window_offset_matches_full_image():
+    """只传入覆盖裁剪窗口的一部分原图（带offset）时，结果与传入整张图相同"""
+    image = high_contrast_images(1500, 1200)["noise"]
+    new_width, new_height, crop_x, crop_y = 2100, 2625, 800, 900
+    full = ImageProcessor._resample_window(
+        image, (1200, 1500), (new_width, new_height), crop_x, crop_y, TARGET_WIDTH, TARGET_HEIGHT)
+
+    left, top, right, bottom = 440, 500, 700, 850
+    region = ImageProcessor._resample_window(
+        image[top:bottom, left:right], (1200, 1500), (new_width, new_height), crop_x, crop_y,
+        TARGET_WIDTH, TARGET_HEIGHT, offset=(left, top))
+
+    assert max_difference(region, full) <= 1
+
+
+def test_manual_crop_matches_resize_and_slice():
+    image = high_contrast_images(1500, 1200)["checker"]
+    face_position, face_size = (600, 700), (300, 300)
+    result = np.asarray(ImageProcessor.manual_crop_id_photo(Image.fromarray(image), face_position, face_size))
+
+    scale = int(TARGET_HEIGHT * 0.635) / face_size[1]
+    new_width, new_height = int(1200 * scale), int(1500 * scale)
+    crop_x = max(0, min(int(face_position[0] * scale) - TARGET_WIDTH // 2, new_width - TARGET_WIDTH))
+    crop_y = max(0, min(int(face_position[1] * scale) - int(TARGET_HEIGHT * 0.45), new_height - TARGET_HEIGHT))
+    expected = old_resize_and_slice(image, new_width, new_height, crop_x, crop_y)
+
+    assert result.shape == expected.shape
+    assert max_difference(result, expected) <= RESIZE_TOLERANCE
+
+
+@pytest.fixture
+def fixed_face(monkeypatch):
+    """固定人脸检测结果，背景去除改为原样返回，只比较裁剪窗口"""
+    face = {}
+    monkeypatch.setattr(image_processor, "detect_faces", lambda cascade, gray: [face["rect"]])
+    monkeypatch.setattr(ImageProcessor, "_load_face_cascade", staticmethod(lambda *args: object()))
+    monkeypatch.setattr(ImageProcessor, "remove_background", staticmethod(lambda image, **kwargs: image.convert("RGB")))
+    return face
+
+
+@pytest.mark.parametrize("rect", [(100, 100, 80, 80), (500, 400, 300, 300), (1000, 1300, 150, 150),
+                                  (0, 0, 1200, 1400), (300, 200, 700, 700)])
+def test_crop_first_frames_like_auto_crop(fixed_face, rect):
+    """人脸位置相同时，先裁剪再去背景与auto_crop_id_photo取同一窗口"""
+    fixed_face["rect"] = rect
+    for name, image in high_contrast_images(1500, 1200).items():
+        image = Image.fromarray(image)
+        auto = np.asarray(ImageProcessor.auto_crop_id_photo(image))
+        crop_first = np.asarray(ImageProcessor.remove_background_and_crop(image))
+
+        assert crop_first.shape == auto.shape, name
+        assert max_difference(crop_first, auto) <= 1, name
@@ -0,0 +1,127 @@
+"""
+Remove.bg客户端测试
+重试判断和退避时间用本地模拟服务（benchmarks/removebg_mock_server.py）验证，不访问真实API
+"""
+import email.utils
+import io
+
+import pytest
+from PIL import Image
+
+from benchmarks.removebg_mock_server import MockRemoveBgServer
+from src.core.removebg_client import RemoveBgClient, RemoveBgError, parse_retry_after
+
+
+def png_bytes(width=40, height=30):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 100, 50)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def server_factory():
+    servers = []
+
+    def start(**kwargs):
+        server = MockRemoveBgServer(**kwargs).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after(" 0 ") == 0.0
+
+
+def test_parse_retry_after_http_date():
+    now = 1_700_000_000.0
+    assert parse_retry_after(email.utils.formatdate(now + 30, usegmt=True), now=now) == pytest.approx(30.0)
+    # 已经过去的时间不需要等待
+    assert parse_retry_after(email.utils.formatdate(now - 30, usegmt=True), now=now) == 0.0
+
+
+@pytest.mark.parametrize("value", [None, "", "soon", "-1", "1.5"])
+def test_parse_retry_after_invalid(value):
+    assert parse_retry_after(value) is None
+
+
+def test_backoff_delay_doubles_with_jitter():
+    client = RemoveBgClient("http://127.0.0.1:9", backoff_base=1.0, backoff_max=30.0)
+    for attempt in range(4):
+        delay = 2 ** attempt
+        for _ in range(50):
+            assert delay / 2 <= client.backoff_delay(attempt) <= delay
+
+
+def test_backoff_delay_is_capped():
+    client = RemoveBgClient("http://127.0.0.1:9", backoff_base=1.0, backoff_max=5.0)
+    assert all(client.backoff_delay(10) <= 5.0 for _ in range(50))
+    # Retry-After优先于指数退避，但同样不超过上限
+    assert client.backoff_delay(0, retry_after=3.0) == 3.0
+    assert client.backoff_delay(0, retry_after=120.0) == 5.0
+
+
+def test_success(server_factory):
+    server = server_factory()
+    client = RemoveBgClient(server.url)
+    try:
+        content = client.remove_background(png_bytes(), "key")
+    finally:
+        client.close()
+
+    with Image.open(io.BytesIO(content)) as result:
+        assert result.mode == "RGBA"
+        assert result.size == (40, 30)
+    assert client.requests_sent == 1
+    assert client.retries == 0
+
+
+def test_client_error_is_not_retried(server_factory):
+    server = server_factory(api_key="right-key")
+    client = RemoveBgClient(server.url, max_retries=3, backoff_base=0.01)
+    try:
+        with pytest.raises(RemoveBgError) as excinfo:
+            client.remove_background(png_bytes(), "wrong-key")
+    finally:
+        client.close()
+
+    assert excinfo.value.status_code == 403
+    assert "invalid API key" in str(excinfo.value)
+    assert client.requests_sent == 1
+    assert client.retries == 0
+    assert server.stats["requests"] == 1
+
+
+def test_rate_limit_is_retried_after_retry_after(server_factory, capsys):
+    server = server_factory(rate_limit=1)
+    client = RemoveBgClient(server.url, max_retries=2, backoff_base=0.01, backoff_max=1.5)
+    try:
+        client.remove_background(png_bytes(), "key")
+        # 同一秒内的第二个请求收到429和Retry-After: 1，等待1秒后重试成功
+        client.remove_background(png_bytes(), "key")
+    finally:
+        client.close()
+
+    assert server.stats["rate_limited"] == 1
+    assert server.stats["ok"] == 2
+    assert client.retries == 1
+    assert "429" in capsys.readouterr().out
+
+
+def test_server_errors_exhaust_retries(server_factory):
+    server = server_factory(fail_rate=1.0)
+    client = RemoveBgClient(server.url, max_retries=2, backoff_base=0.01)
+    try:
+        with pytest.raises(RemoveBgError) as excinfo:
+            client.remove_background(png_bytes(), "key")
+    finally:
+        client.close()
+
+    assert excinfo.value.status_code == 503
+    assert client.requests_sent == 3
+    assert client.retries == 2
+    assert server.stats["failed"] == 3